@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+付款到代理延迟的压力测试
+
+启动本地模拟TRON节点（tools/fake_tron_node.py）和一个连接该节点的 trx-monitor 进程，
+按指定速率生成付款，统计每笔付款从上链到节点收到代理交易的延迟分位数和吞吐量。
+数据库使用临时SQLite文件。
+
+用法：
+    python benchmarks/bench_payment_latency.py --rate 20 --duration 60 --latency 0.02
+    python benchmarks/bench_payment_latency.py --rate 50 --error-rate 0.05 --json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / 'tools'))
+
+from tronpy.keys import PrivateKey
+
+from fake_tron_node import FakeChain, FakeTronNode, PaymentGenerator, random_address
+
+MONITOR_COMMAND = 'from trx_energy_rental.blockchain.energy_service import monitor_main; monitor_main()'
+
+
+def monitor_env(node_url, db_path, args):
+    """trx-monitor 进程的环境变量：所有请求发往模拟节点"""
+    agent_key = PrivateKey.random()
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f'sqlite:///{db_path}',
+        'SECRET_KEY': 'benchmark',
+        'TELEGRAM_BOT_TOKEN': 'benchmark',
+        'TRON_FULL_NODE_API': node_url,
+        'TRON_GRID_API': node_url,
+        'OWNER_ADDRESS': args.owner_address,
+        'AGENT_ADDRESS': agent_key.public_key.to_base58check_address(),
+        'AGENT_PRIVATE_KEY': agent_key.hex(),
+        'MONITOR_ADDRESS': args.monitor_address,
+        'RENTAL_PRICE': '0.1',
+        'EVENT_BUS_BACKEND': 'memory',
+        'PAYMENT_POLL_INTERVAL': str(args.block_interval),
+        'BLOCK_SCAN_INTERVAL': str(args.block_interval),
+        'TRON_RATE_LIMIT': str(args.rate_limit),
+        'PYTHONPATH': str(project_root),
+    })
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description='付款到代理延迟的压力测试')
+    parser.add_argument('--rate', type=float, default=10, help='每秒生成的付款数量')
+    parser.add_argument('--duration', type=float, default=30, help='生成付款的时长（秒）')
+    parser.add_argument('--drain', type=float, default=60, help='停止生成后等待代理完成的最长时间（秒）')
+    parser.add_argument('--block-interval', type=float, default=3.0, help='出块间隔（秒）')
+    parser.add_argument('--latency', type=float, default=0.0, help='模拟节点每个请求的延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='模拟节点额外的随机延迟上限（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='模拟节点返回HTTP 500的比例')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='模拟节点返回HTTP 429的比例')
+    parser.add_argument('--usage-probability', type=float, default=0.0, help='代理后用户进行TRC20转账的概率')
+    parser.add_argument('--rate-limit', type=float, default=0, help='trx-monitor 的 TRON_RATE_LIMIT，0为不限流')
+    parser.add_argument('--warmup', type=float, default=5, help='启动 trx-monitor 后开始付款前的等待时间（秒）')
+    parser.add_argument('--json', action='store_true', help='以JSON输出结果')
+    args = parser.parse_args()
+
+    from tronpy.keys import to_base58check_address
+    args.owner_address = to_base58check_address(random_address())
+    args.monitor_address = to_base58check_address(random_address())
+
+    chain = FakeChain(args.monitor_address, args.block_interval, {args.owner_address: 10 ** 12},
+                      usage_probability=args.usage_probability)
+    node = FakeTronNode(chain, latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, throttle_rate=args.throttle_rate).start()
+
+    workdir = tempfile.mkdtemp()
+    log_path = os.path.join(workdir, 'monitor.log')
+    with open(log_path, 'w') as log:
+        monitor = subprocess.Popen(
+            [sys.executable, '-c', MONITOR_COMMAND],
+            env=monitor_env(node.url, os.path.join(workdir, 'bench.db'), args),
+            cwd=str(project_root), stdout=log, stderr=subprocess.STDOUT
+        )
+    try:
+        time.sleep(args.warmup)
+        if monitor.poll() is not None:
+            raise SystemExit(f"trx-monitor 启动失败，日志: {log_path}")
+
+        generator = PaymentGenerator(chain, args.rate)
+        started = time.monotonic()
+        generator.start()
+        time.sleep(args.duration)
+        generator.stop()
+        sent = chain.stats().get('payments_sent', 0)
+
+        # 等待剩余的付款上链并完成代理
+        deadline = time.monotonic() + args.drain
+        while time.monotonic() < deadline:
+            stats = chain.stats()
+            if stats.get('delegations', 0) >= sent:
+                break
+            time.sleep(0.5)
+        elapsed = time.monotonic() - started
+        stats = node.stats()
+    finally:
+        monitor.terminate()
+        monitor.wait(timeout=10)
+        node.stop()
+
+    result = {
+        'config': {key: value for key, value in vars(args).items() if key != 'json'},
+        'payments_sent': sent,
+        'payments_confirmed': stats.get('payments_confirmed', 0),
+        'delegations': stats.get('delegations', 0),
+        'undelegations': stats.get('undelegations', 0),
+        'delegations_per_second': stats.get('delegations', 0) / elapsed,
+        'delegation_latency': stats['delegation_latency'],
+        'node_requests': stats['requests'],
+        'monitor_log': log_path,
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+
+    latency = result['delegation_latency']
+    print(f"付款 {result['payments_sent']}，上链 {result['payments_confirmed']}，"
+          f"代理 {result['delegations']}（{result['delegations_per_second']:.1f} 次/秒）")
+    if latency['count']:
+        print(f"付款到代理延迟: p50 {latency['p50']:.2f}s  p90 {latency['p90']:.2f}s  "
+              f"p99 {latency['p99']:.2f}s  最大 {latency['max']:.2f}s")
+    print(f"节点请求: {json.dumps(result['node_requests'], ensure_ascii=False)}")
+    print(f"trx-monitor 日志: {log_path}")
+
+
+if __name__ == '__main__':
+    main()
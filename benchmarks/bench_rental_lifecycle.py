@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+租赁全流程基准测试
+
+在临时SQLite数据库和本地模拟TRON节点（tools/fake_tron_node.py，与本进程同在一个进程内）上
+依次测量：
+
+- ingest：付款摄取吞吐量（_monitor_payments 每轮执行的 PaymentIngestor.poll_once，
+  含认领、能量检查和容量预留）和批量代理队列完成全部代理的吞吐量
+- expiry：活跃租赁为 10k / 100k 行时 _check_expired_rentals 的耗时（默认其中10%已过期）
+- check_payment：Flask测试客户端上 /api/check_payment 的每秒请求数和延迟分位数
+- bot：机器人各处理函数的延迟（不经过Telegram，回复写入内存）
+
+结果以JSON输出，--output 同时写入文件；--baseline 指定上一次的结果文件时，
+在标准错误输出中列出各指标的变化，便于逐次比较。
+
+用法：
+    python benchmarks/bench_rental_lifecycle.py --output results.json
+    python benchmarks/bench_rental_lifecycle.py --only ingest expiry --baseline results.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / 'tools'))
+sys.path.append(str(Path(__file__).parent))
+
+import sqlalchemy as sa
+from tronpy.keys import to_base58check_address
+
+from fake_tron_node import FakeChain, FakeTronNode, percentiles, random_address
+from bench_payment_latency import monitor_env
+
+STAGES = ['ingest', 'expiry', 'check_payment', 'bot']
+RENTAL_STATUSES = ['completed'] * 90 + ['failed'] * 5 + ['active'] * 4 + ['pending']
+
+
+def latency_summary(samples):
+    """延迟样本（秒）的均值和分位数，单位毫秒"""
+    summary = {key: value * 1000 for key, value in percentiles(samples).items()}
+    summary['mean'] = sum(samples) / len(samples) * 1000 if samples else None
+    summary['count'] = len(samples)
+    return summary
+
+
+def git_commit():
+    """当前提交，不在git仓库中时返回None"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=str(project_root), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def seed_rentals(engine, rows, addresses, owner_address, status_of, expiry_of, batch_size=20000):
+    """批量写入租赁记录，status_of(i) / expiry_of(i) 给出第 i 行的状态和到期时间"""
+    from trx_energy_rental.database.models import EnergyRental
+    table = EnergyRental.__table__
+    now = datetime.utcnow()
+    prefix = random.getrandbits(32)
+    with engine.begin() as conn:
+        for start in range(0, rows, batch_size):
+            conn.execute(table.insert(), [{
+                'rental_address': addresses[i % len(addresses)],
+                'owner_address': owner_address,
+                'energy_amount': 32000,
+                'payment_txid': f'{prefix:08x}{i:056x}',
+                'delegate_txid': f'{i:064x}',
+                'status': status_of(i),
+                'expiry_time': expiry_of(i),
+                'created_at': now,
+                'updated_at': now,
+            } for i in range(start, min(start + batch_size, rows))])
+
+
+def clear_rentals(engine):
+    """清空租赁表，各阶段互不影响"""
+    from trx_energy_rental.database.models import EnergyRental
+    with engine.begin() as conn:
+        conn.execute(EnergyRental.__table__.delete())
+
+
+def wait_for(condition, timeout):
+    """等待条件成立，返回是否成立"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+
+def count_rentals(engine, status):
+    """指定状态的租赁数量"""
+    from trx_energy_rental.database.models import EnergyRental
+    table = EnergyRental.__table__
+    with engine.connect() as conn:
+        return conn.execute(
+            sa.select(sa.func.count()).select_from(table).where(table.c.status == status)
+        ).scalar()
+
+
+def bench_ingest(service, engine, chain, payments, timeout):
+    """付款摄取和批量代理的吞吐量，代理以租赁写入 active 状态为完成"""
+    for _ in range(payments):
+        chain.add_payment()
+    chain.produce_block()
+    delegated_before = chain.stats().get('delegations', 0)
+
+    started = time.perf_counter()
+    with service.sessions.session_scope():
+        service.ingestion_lease.acquire()
+        handled = service.payment_ingestor.poll_once()
+    ingest_seconds = time.perf_counter() - started
+
+    def delegated():
+        return chain.stats().get('delegations', 0) - delegated_before
+    wait_for(lambda: count_rentals(engine, 'active') >= handled, timeout)
+    delegate_seconds = time.perf_counter() - started
+    active = count_rentals(engine, 'active')
+
+    return {
+        'payments': payments,
+        'ingested': handled,
+        'ingest_seconds': ingest_seconds,
+        'payments_per_second': handled / ingest_seconds if ingest_seconds else None,
+        'broadcast': delegated(),
+        'delegated': active,
+        'delegate_seconds': delegate_seconds,
+        'delegations_per_second': active / delegate_seconds if delegate_seconds else None,
+    }
+
+
+def bench_expiry(service, engine, owner_address, rows, expired_ratio):
+    """活跃租赁为 rows 行时一次过期检查的耗时"""
+    clear_rentals(engine)
+    addresses = [to_base58check_address(random_address()) for _ in range(min(rows, 50000))]
+    now = datetime.utcnow()
+    expired_every = max(1, int(round(1 / expired_ratio))) if expired_ratio > 0 else None
+
+    def expiry_of(i):
+        if expired_every and i % expired_every == 0:
+            return now - timedelta(minutes=1)
+        return now + timedelta(minutes=30)
+
+    seed_rentals(engine, rows, addresses, owner_address, lambda i: 'active', expiry_of)
+
+    started = time.perf_counter()
+    service._check_expired_rentals()
+    seconds = time.perf_counter() - started
+    stats = service.expiry_recovery.stats
+    return {
+        'active_rows': rows,
+        'expired': stats.get('scanned', 0),
+        'recovered': stats.get('recovered', 0),
+        'failed': stats.get('failed', 0),
+        'seconds': seconds,
+        'recovered_per_second': stats.get('recovered', 0) / seconds if seconds else None,
+    }
+
+
+def bench_check_payment(app, engine, owner_address, rows, requests):
+    """/api/check_payment 的吞吐量和延迟"""
+    clear_rentals(engine)
+    addresses = [to_base58check_address(random_address()) for _ in range(max(1, rows // 5))]
+    now = datetime.utcnow()
+    seed_rentals(engine, rows, addresses, owner_address,
+                 lambda i: random.choice(RENTAL_STATUSES), lambda i: now + timedelta(minutes=10))
+
+    # 九成查询已有租赁的地址，其余查询没有租赁的地址
+    unknown = [to_base58check_address(random_address()) for _ in range(100)]
+    targets = [random.choice(addresses) if random.random() < 0.9 else random.choice(unknown)
+               for _ in range(requests)]
+
+    samples = []
+    client = app.test_client()
+    started = time.perf_counter()
+    for address in targets:
+        request_started = time.perf_counter()
+        response = client.get(f'/api/check_payment/{address}')
+        samples.append(time.perf_counter() - request_started)
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/check_payment 返回 {response.status_code}")
+    seconds = time.perf_counter() - started
+
+    return {
+        'rental_rows': rows,
+        'requests': requests,
+        'requests_per_second': requests / seconds,
+        'latency_ms': latency_summary(samples),
+    }
+
+
+class FakeMessage:
+    """记录回复内容的消息"""
+
+    def __init__(self, chat_id, message_id, text=''):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.text = text
+        self.replies = []
+
+    def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+        return self
+
+
+class FakeCallbackQuery:
+    """记录编辑内容的回调查询"""
+
+    def __init__(self, data, message):
+        self.data = data
+        self.message = message
+
+    def answer(self, *args, **kwargs):
+        return True
+
+    def edit_message_text(self, text=None, **kwargs):
+        self.message.text = text
+        return self.message
+
+
+def bench_bot(bot, engine, owner_address, iterations):
+    """机器人各处理函数的延迟"""
+    from trx_energy_rental.database.models import User, db
+
+    clear_rentals(engine)
+    addresses = [to_base58check_address(random_address()) for _ in range(100)]
+    now = datetime.utcnow()
+    seed_rentals(engine, len(addresses) * 5, addresses, owner_address,
+                 lambda i: random.choice(RENTAL_STATUSES), lambda i: now + timedelta(minutes=10))
+
+    # 一半用户绑定了有租赁记录的地址
+    telegram_ids = list(range(1000, 1000 + len(addresses) // 2))
+    with bot.sessions.session_scope():
+        User.query.filter(User.telegram_id.in_([str(i) for i in telegram_ids])).delete(synchronize_session=False)
+        db.session.commit()
+        for telegram_id, address in zip(telegram_ids, addresses):
+            bot._associate_telegram_user(telegram_id, address)
+    bot.tron_client.refresh_pool_capacity()
+
+    scoped = bot.sessions.scoped
+    handlers = {
+        'start': (bot.start_command, lambda address: None),
+        'help': (bot.help_command, lambda address: None),
+        'address': (bot.address_command, lambda address: None),
+        'rent': (bot.rent_command, lambda address: [address]),
+        'status': (scoped(bot.status_command), lambda address: None),
+        'check_payment': (scoped(bot.button_callback), lambda address: None),
+    }
+
+    results = {}
+    for name, (handler, args_of) in handlers.items():
+        samples = []
+        for n in range(iterations):
+            address = random.choice(addresses)
+            message = FakeMessage(chat_id=n, message_id=n, text=address)
+            update = SimpleNamespace(
+                effective_user=SimpleNamespace(id=random.choice(telegram_ids), first_name='bench'),
+                message=message,
+                callback_query=FakeCallbackQuery(f'check_payment:{address}', message),
+            )
+            context = SimpleNamespace(args=args_of(address))
+            started = time.perf_counter()
+            handler(update, context)
+            samples.append(time.perf_counter() - started)
+        results[name] = latency_summary(samples)
+    return results
+
+
+def flatten(result, prefix=''):
+    """把嵌套结果展开为 {'a.b.c': 数值}"""
+    values = {}
+    for key, value in result.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            values.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+def compare(baseline, current):
+    """列出两次结果中共有指标的变化"""
+    before = flatten(baseline.get('results', {}))
+    after = flatten(current['results'])
+    lines = [f"{'指标':<48} {'基线':>14} {'本次':>14} {'变化':>9}"]
+    for name in sorted(set(before) & set(after)):
+        old, new = before[name], after[name]
+        change = f'{(new - old) / old * 100:+8.1f}%' if old else '        -'
+        lines.append(f"{name:<48} {old:>14.3f} {new:>14.3f} {change}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='租赁全流程基准测试')
+    parser.add_argument('--only', nargs='+', choices=STAGES, default=STAGES, help='只运行指定阶段')
+    parser.add_argument('--payments', type=int, default=2000, help='ingest：一次摄取的付款数量')
+    parser.add_argument('--delegate-timeout', type=float, default=300, help='ingest：等待代理完成的最长时间（秒）')
+    parser.add_argument('--expiry-rows', type=int, nargs='+', default=[10_000, 100_000],
+                        help='expiry：活跃租赁的行数')
+    parser.add_argument('--expired-ratio', type=float, default=0.1, help='expiry：已过期租赁的比例')
+    parser.add_argument('--api-rows', type=int, default=100_000, help='check_payment：租赁记录的行数')
+    parser.add_argument('--api-requests', type=int, default=5000, help='check_payment：请求数量')
+    parser.add_argument('--bot-iterations', type=int, default=500, help='bot：每个处理函数的调用次数')
+    parser.add_argument('--latency', type=float, default=0.0, help='模拟节点每个请求的延迟（秒）')
+    parser.add_argument('--seed', type=int, default=1, help='随机数种子')
+    parser.add_argument('--output', help='结果同时写入该文件')
+    parser.add_argument('--baseline', help='与该结果文件比较')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp()
+
+    # 设置必须在导入项目模块之前完成（配置在导入时读取环境变量）
+    args.owner_address = to_base58check_address(random_address())
+    args.monitor_address = to_base58check_address(random_address())
+    args.block_interval = 3.0
+    args.rate_limit = 0
+    chain = FakeChain(args.monitor_address, args.block_interval, {args.owner_address: 10 ** 15})
+    node = FakeTronNode(chain, latency=args.latency).start()
+    os.environ.update(monitor_env(node.url, os.path.join(workdir, 'bench.db'), args))
+
+    from trx_energy_rental.app import create_app
+    from trx_energy_rental.blockchain.energy_service import EnergyRentalService
+    from trx_energy_rental.database.models import db
+
+    logging.getLogger('trx_energy_rental').setLevel(logging.WARNING)
+
+    app = create_app()
+    results = {}
+    try:
+        with app.app_context():
+            engine = db.engine
+            service = EnergyRentalService(db.session)
+            service.is_running = True
+            service.tron_client.refresh_pool_capacity()
+            service.tron_client.start_signing_pipeline()
+            service.delegation_queue.start()
+            try:
+                if 'ingest' in args.only:
+                    print(f"ingest: {args.payments} 笔付款", file=sys.stderr)
+                    clear_rentals(engine)
+                    results['ingest'] = bench_ingest(service, engine, chain, args.payments, args.delegate_timeout)
+
+                if 'expiry' in args.only:
+                    results['expiry'] = {}
+                    for rows in args.expiry_rows:
+                        print(f"expiry: {rows} 行活跃租赁", file=sys.stderr)
+                        results['expiry'][str(rows)] = bench_expiry(
+                            service, engine, args.owner_address, rows, args.expired_ratio
+                        )
+            finally:
+                service.is_running = False
+                service.delegation_queue.stop()
+                service.tron_client.stop_signing_pipeline()
+
+            if 'check_payment' in args.only:
+                print(f"check_payment: {args.api_requests} 次请求", file=sys.stderr)
+                results['check_payment'] = bench_check_payment(
+                    app, engine, args.owner_address, args.api_rows, args.api_requests
+                )
+
+            if 'bot' in args.only:
+                from trx_energy_rental.bot.telegram_bot import TelegramBot
+                print(f"bot: 每个处理函数 {args.bot_iterations} 次", file=sys.stderr)
+                bot = TelegramBot(db.session)
+                results['bot'] = bench_bot(bot, engine, args.owner_address, args.bot_iterations)
+    finally:
+        node.stop()
+
+    output = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': 'sqlite',
+            'node_latency': args.latency,
+            'stages': args.only,
+        },
+        'results': results,
+    }
+    text = json.dumps(output, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            print(compare(json.load(f), output), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+EnergyRental 热点查询基准测试
+
+在SQLite中写入指定数量的租赁记录（默认100万条），然后测量应用中各热点查询路径的平均耗时：
+
+- EnergyRental.resolve_latest：/api/check_payment、付款状态推送、机器人状态查询
+- 按 payment_txid 查询：claim_payment 认领付款
+- expired_rentals_query：ExpiryRecovery 过期租赁检查
+
+活跃租赁的到期时间分布在最近一分钟到 RENTAL_TIME 之后，与线上一致，过期检查每次只返回
+刚到期的少量记录，测量的是索引查找而不是大量结果的读取。每个查询的执行计划必须使用索引，
+否则以非零状态退出。
+
+用法：
+    python benchmarks/bench_rental_queries.py --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import sqlalchemy as sa
+from flask import Flask
+
+from trx_energy_rental.blockchain.expiry_recovery import expired_rentals_query
+from trx_energy_rental.config import settings
+from trx_energy_rental.database.models import db, EnergyRental
+
+STATUSES = ['completed'] * 90 + ['failed'] * 5 + ['active'] * 4 + ['pending']
+INDEX_PLAN = re.compile(r'USING (COVERING )?INDEX')
+
+
+def seed(engine, rows, addresses, batch_size=50000):
+    """批量写入租赁记录"""
+    table = EnergyRental.__table__
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for start in range(0, rows, batch_size):
+            batch = []
+            for i in range(start, min(start + batch_size, rows)):
+                status = random.choice(STATUSES)
+                if status == 'active':
+                    # 活跃租赁在租期内，最近一分钟内到期的等待回收
+                    expiry_time = now + timedelta(seconds=random.randint(-60, settings.RENTAL_TIME * 60))
+                else:
+                    expiry_time = now - timedelta(seconds=random.randint(0, 86400))
+                batch.append({
+                    'rental_address': random.choice(addresses),
+                    'energy_amount': 11800,
+                    'payment_txid': f'{i:064x}',
+                    'status': status,
+                    'expiry_time': expiry_time,
+                    'created_at': now,
+                    'updated_at': now,
+                })
+            conn.execute(table.insert(), batch)
+
+
+def explain(run, params):
+    """执行一次查询路径，返回其实际发出的SQL的执行计划（EXPLAIN QUERY PLAN 各行的说明）"""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    sa.event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        run(params)
+    finally:
+        sa.event.remove(db.engine, 'before_cursor_execute', capture)
+
+    statement, parameters = captured[-1]
+    cursor = db.session.connection().connection.cursor()
+    try:
+        return [row[-1] for row in cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()]
+    finally:
+        cursor.close()
+
+
+def measure(run, params_list):
+    """执行一组查询，返回平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for params in params_list:
+        run(params)
+    return (time.perf_counter() - start) * 1000 / len(params_list)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EnergyRental 热点查询基准测试')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='写入的租赁记录数量')
+    parser.add_argument('--addresses', type=int, default=200_000, help='不同租赁地址的数量')
+    parser.add_argument('--queries', type=int, default=2000, help='每类查询的执行次数')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    addresses = [f'T{i:033d}' for i in range(args.addresses)]
+    with app.app_context():
+        db.create_all()
+        print(f"写入 {args.rows} 条租赁记录...")
+        start = time.perf_counter()
+        seed(db.engine, args.rows, addresses)
+        print(f"写入完成，耗时 {time.perf_counter() - start:.1f} 秒\n")
+
+        now = datetime.utcnow()
+        cases = [
+            ('resolve_latest',
+             EnergyRental.resolve_latest,
+             [random.choice(addresses) for _ in range(args.queries)]),
+            ('payment_txid',
+             lambda txid: EnergyRental.query.filter_by(payment_txid=txid).first(),
+             [f'{random.randrange(args.rows * 2):064x}' for _ in range(args.queries)]),
+            ('expired_rentals_query',
+             lambda at: db.session.execute(expired_rentals_query(at)).fetchall(),
+             [now - timedelta(seconds=random.randint(0, 60)) for _ in range(max(1, args.queries // 10))]),
+        ]
+
+        unindexed = []
+        for name, run, params_list in cases:
+            plan = explain(run, params_list[0])
+            avg_ms = measure(run, params_list)
+            print(f"{name:<24} 平均 {avg_ms:.3f} ms  计划: {' / '.join(plan)}")
+            if not any(INDEX_PLAN.search(step) for step in plan):
+                unindexed.append(name)
+            db.session.rollback()
+
+        expired = len(db.session.execute(expired_rentals_query(now)).fetchall())
+        print(f"\n过期检查每次返回约 {expired} 行")
+
+    os.remove(db_path)
+    if unindexed:
+        print(f"以下查询未使用索引: {', '.join(unindexed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
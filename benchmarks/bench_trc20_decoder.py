@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+TRC20调用数据解码基准测试
+
+生成指定数量的 TriggerSmartContract 调用（90% transfer、5% transferFrom、5% 其他方法），
+按区块（默认每块300笔）测量：
+
+- decode_calldata：只解码方法、地址（十六进制）和金额，分别使用纯Python和NumPy路径
+- decode_block：完整解码为 Trc20Transfer（含base58check地址转换及其缓存）
+
+用法：
+    python benchmarks/bench_trc20_decoder.py --calls 100000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from trx_energy_rental.blockchain import trc20_decoder
+from trx_energy_rental.blockchain.trc20_decoder import decode_block, decode_calldata, to_base58
+
+
+def random_address(rng):
+    """随机的十六进制地址（41开头）"""
+    return '41' + '%040x' % rng.getrandbits(160)
+
+
+def make_calldata(rng, addresses):
+    """随机生成一笔合约调用的数据"""
+    roll = rng.random()
+    to_word = '0' * 24 + rng.choice(addresses)[2:]
+    amount_word = '%064x' % rng.randrange(1, 10 ** 12)
+    if roll < 0.90:
+        return 'a9059cbb' + to_word + amount_word
+    if roll < 0.95:
+        from_word = '0' * 24 + rng.choice(addresses)[2:]
+        return '23b872dd' + from_word + to_word + amount_word
+    return '095ea7b3' + to_word + amount_word
+
+
+def make_blocks(rng, calls, per_block, addresses, contracts):
+    """把调用按区块分组"""
+    blocks = []
+    for start in range(0, calls, per_block):
+        transactions = []
+        for i in range(start, min(start + per_block, calls)):
+            transactions.append({
+                'txID': '%064x' % i,
+                'raw_data': {'contract': [{
+                    'type': 'TriggerSmartContract',
+                    'parameter': {'value': {
+                        'owner_address': rng.choice(addresses),
+                        'contract_address': rng.choice(contracts),
+                        'data': make_calldata(rng, addresses),
+                    }},
+                }]},
+            })
+        blocks.append({'transactions': transactions})
+    return blocks
+
+
+def measure(name, calls, func):
+    """执行一次解码，打印每秒解码的调用数"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<36} {elapsed * 1000:8.1f} ms  {calls / elapsed:12,.0f} 次/秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TRC20调用数据解码基准测试')
+    parser.add_argument('--calls', type=int, default=100_000, help='合约调用数量')
+    parser.add_argument('--per-block', type=int, default=300, help='每个区块的调用数量')
+    parser.add_argument('--addresses', type=int, default=20_000, help='不同地址的数量')
+    parser.add_argument('--seed', type=int, default=1, help='随机数种子')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    addresses = [random_address(rng) for _ in range(args.addresses)]
+    contracts = [random_address(rng) for _ in range(5)]
+    blocks = make_blocks(rng, args.calls, args.per_block, addresses, contracts)
+    block_datas = [[tx['raw_data']['contract'][0]['parameter']['value']['data'] for tx in block['transactions']]
+                   for block in blocks]
+
+    print(f"{args.calls} 笔调用，{len(blocks)} 个区块，NumPy: {'可用' if trc20_decoder.np is not None else '未安装'}\n")
+
+    measure('decode_calldata（纯Python）', args.calls,
+            lambda: [decode_calldata(datas, use_numpy=False) for datas in block_datas])
+    if trc20_decoder.np is not None:
+        measure('decode_calldata（NumPy）', args.calls,
+                lambda: [decode_calldata(datas, use_numpy=True) for datas in block_datas])
+
+    to_base58.cache_clear()
+    measure('decode_block（地址缓存未命中）', args.calls, lambda: [decode_block(block) for block in blocks])
+    measure('decode_block（地址缓存命中）', args.calls, lambda: [decode_block(block) for block in blocks])
+    print(f"\n地址缓存: {to_base58.cache_info()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -58,8 +58,6 @@ pip install -e .
 # 数据库迁移
 print_yellow "初始化数据库..."
 export FLASK_APP=trx_energy_rental.app
-flask db init
-flask db migrate -m "initial migration"
 flask db upgrade
 
 print_green "===== 部署完成 ====="
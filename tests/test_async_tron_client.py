@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""AsyncTronClient 对本地模拟节点的请求、节点重试和限流"""
+
+import sys
+import unittest
+from pathlib import Path
+
+# 添加项目根目录和工具目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / 'tools'))
+
+from tronpy.keys import PrivateKey, to_base58check_address
+
+from fake_tron_node import FakeChain, FakeTronNode, random_address
+from trx_energy_rental.blockchain.async_tron_client import AsyncTronClient
+from trx_energy_rental.blockchain.rate_limiter import RateLimiter
+
+
+class AsyncTronClientTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.agent_key = PrivateKey(bytes.fromhex('33' * 32))
+        self.agent_address = self.agent_key.public_key.to_base58check_address()
+        self.monitor_address = to_base58check_address(random_address())
+        self.chain = FakeChain(self.monitor_address, block_interval=3600,
+                               accounts={self.agent_address: 5000000})
+        self.healthy = FakeTronNode(self.chain).start()
+        # 所有请求都返回HTTP 500的节点
+        self.failing = FakeTronNode(FakeChain(None, block_interval=3600), error_rate=1.0).start()
+        self.limiter = RateLimiter(rate=1000, burst=100)
+
+    def tearDown(self):
+        self.healthy.stop()
+        self.failing.stop()
+
+    def client(self, *nodes):
+        urls = ','.join(node.url for node in nodes)
+        client = AsyncTronClient(full_node_api=urls, grid_api=urls, limiter=self.limiter, timeout=5)
+        client.agent_address = self.agent_address
+        client.agent_priv_key = self.agent_key
+        return client
+
+    async def test_account_energy(self):
+        async with self.client(self.healthy) as client:
+            self.assertEqual(await client.get_account_energy(self.agent_address), 5000000)
+            self.assertTrue(await client.check_enough_energy(self.agent_address))
+        self.assertEqual(self.limiter.stats()['priorities']['user']['requests'], 2)
+
+    async def test_transactions_page(self):
+        payment = self.chain.add_payment()
+        self.chain.produce_block()
+        async with self.client(self.healthy) as client:
+            transactions, _ = await client.get_transactions_page(self.monitor_address, only_to=True)
+        self.assertEqual([tx['txID'] for tx in transactions], [payment['txID']])
+
+    async def test_delegate_and_undelegate(self):
+        receiver = to_base58check_address(random_address())
+        async with self.client(self.healthy) as client:
+            self.assertTrue(await client.delegate_resource(receiver, 32000))
+            self.assertEqual(await client.get_account_energy(receiver), 32000)
+            self.assertTrue(await client.undelegate_resource(receiver))
+        stats = self.chain.stats()
+        self.assertEqual(stats['delegations'], 1)
+        self.assertEqual(stats['undelegations'], 1)
+        self.assertEqual(self.limiter.stats()['priorities']['broadcast']['requests'], 2)
+
+    async def test_reads_fail_over(self):
+        async with self.client(self.failing, self.healthy) as client:
+            self.assertEqual(await client.get_account_energy(self.agent_address), 5000000)
+            stats = client.node_pool.stats()
+        self.assertEqual(self.failing.stats()['requests'].get('wallet/getaccountresource'), 1)
+        self.assertEqual(self.healthy.stats()['requests'].get('wallet/getaccountresource'), 1)
+        self.assertEqual([endpoint['errors'] for endpoint in stats], [1, 0])
+
+    async def test_broadcast_is_not_retried(self):
+        receiver = to_base58check_address(random_address())
+        async with self.client(self.failing, self.healthy) as client:
+            self.assertIsNone(await client.delegate_resource(receiver, 32000))
+        self.assertEqual(self.failing.stats()['requests'].get('wallet/broadcasttransaction'), 1)
+        self.assertNotIn('wallet/broadcasttransaction', self.healthy.stats()['requests'])
+        self.assertEqual(self.chain.stats().get('delegations', 0), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
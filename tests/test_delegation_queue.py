@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+"""批量代理队列的结果写入和处理租约续约"""
+
+import os
+import sys
+import tempfile
+import unittest
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from flask import Flask
+
+from trx_energy_rental.blockchain.delegation_queue import DelegationQueue
+from trx_energy_rental.database.models import db, EnergyRental
+from trx_energy_rental.database.session import SessionManager
+
+HOLDER = 'worker-1'
+
+
+class FakeTronClient:
+    """同步执行代理的客户端，failing 中的地址抛出异常"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.broadcasts = []
+        self.released = []
+
+    def get_ref_block_id(self):
+        return None
+
+    def delegate_resource(self, address, energy_amount, ref_block_id=None, owner_address=None):
+        if address in self.failing:
+            raise RuntimeError('签名失败')
+        self.broadcasts.append(address)
+        return 'tx_' + address
+
+    def release_pool_energy(self, energy_amount, owner_address=None):
+        self.released.append(energy_amount)
+
+    def submit(self, owner_address, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class DelegationQueueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{self.db_path}'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+        os.unlink(self.db_path)
+
+    def queue(self, tron_client, **kwargs):
+        return DelegationQueue(tron_client, db_session=db.session, sessions=SessionManager(self.app),
+                               max_wait=0, **kwargs)
+
+    def submit_rentals(self, queue, count, lease_seconds=None):
+        """认领付款并提交到队列，返回取出的一批"""
+        for i in range(count):
+            queue.submit(EnergyRental.claim_payment(f'pay{i}', f'addr{i}', HOLDER, energy_amount=1000,
+                                                    lease_seconds=lease_seconds))
+        return [queue._queue.get_nowait() for _ in range(count)]
+
+    def rental(self, address):
+        db.session.expire_all()
+        return EnergyRental.query.filter_by(rental_address=address).one()
+
+
+class SaveResultsTest(DelegationQueueTestCase):
+
+    def test_error_keeps_other_results(self):
+        tron_client = FakeTronClient(failing={'addr1'})
+        queue = self.queue(tron_client)
+        batch = self.submit_rentals(queue, 3)
+
+        delegated = queue.process_batch(batch)
+
+        self.assertEqual(sorted(rental.rental_address for rental in delegated), ['addr0', 'addr2'])
+        self.assertEqual(tron_client.released, [1000])
+        self.assertEqual(self.rental('addr0').delegate_txid, 'tx_addr0')
+        self.assertEqual(self.rental('addr2').status, 'active')
+        self.assertEqual(self.rental('addr1').status, 'failed')
+
+    def test_failed_batch_commit_saves_each_txid(self):
+        queue = self.queue(FakeTronClient())
+        batch = self.submit_rentals(queue, 2)
+        commit = db.session.commit
+        calls = []
+
+        def fail_first_commit():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError('提交失败')
+            commit()
+
+        with mock.patch.object(db.session, 'commit', side_effect=fail_first_commit):
+            delegated = queue._save_results(batch, ['tx_addr0', 'tx_addr1'])
+
+        self.assertEqual(len(delegated), 2)
+        db.session.expire_all()
+        self.assertEqual(sorted(rental.delegate_txid for rental in EnergyRental.query.all()),
+                         ['tx_addr0', 'tx_addr1'])
+
+
+class ClaimLeaseTest(DelegationQueueTestCase):
+
+    def test_queued_leases_are_renewed(self):
+        queue = self.queue(FakeTronClient(), renew_interval=0)
+        self.submit_rentals(queue, 1, lease_seconds=1)
+        db.session.query(EnergyRental).update({EnergyRental.claim_expires_at: datetime.utcnow()})
+        db.session.commit()
+
+        queue._maintain()
+
+        self.assertGreater(self.rental('addr0').claim_expires_at, datetime.utcnow() + timedelta(seconds=60))
+        self.assertEqual(EnergyRental.query.filter(EnergyRental.claim_available()).count(), 0)
+
+    def test_taken_over_rental_is_not_delegated(self):
+        tron_client = FakeTronClient()
+        queue = self.queue(tron_client)
+        batch = self.submit_rentals(queue, 2)
+        # 租约过期后被其他进程接管
+        db.session.query(EnergyRental).filter_by(rental_address='addr1').update({
+            EnergyRental.claimed_by: 'worker-2'
+        })
+        db.session.commit()
+
+        queue.process_batch(batch)
+
+        self.assertEqual(tron_client.broadcasts, ['addr0'])
+        self.assertEqual(tron_client.released, [1000])
+        self.assertEqual(self.rental('addr1').claimed_by, 'worker-2')
+        self.assertEqual(queue._holders, {})
+
+    def test_unsaved_txid_keeps_lease_until_written(self):
+        queue = self.queue(FakeTronClient(), renew_interval=0)
+        batch = self.submit_rentals(queue, 1)
+        rental_id = batch[0][0]
+
+        with mock.patch.object(db.session, 'commit', side_effect=RuntimeError('数据库不可用')):
+            self.assertEqual(queue._save_results(batch, ['tx_addr0']), [])
+        queue._untrack([rental_id])
+        self.assertEqual(queue._unsaved, {rental_id: 'tx_addr0'})
+        self.assertIn(rental_id, queue._holders)
+
+        queue._maintain()
+
+        rental = self.rental('addr0')
+        self.assertEqual((rental.status, rental.delegate_txid), ('active', 'tx_addr0'))
+        self.assertEqual((queue._unsaved, queue._holders), ({}, {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
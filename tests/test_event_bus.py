@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""事件总线数据库后端：成批写入、跳过本进程的事件、只由租约持有者清理"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import sqlalchemy as sa
+from flask import Flask
+
+from trx_energy_rental.database.models import db, RentalEvent
+from trx_energy_rental.utils.event_bus import DatabaseBackend
+
+
+class DatabaseBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{self.db_path}'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        with self.app.app_context():
+            db.create_all()
+            self.engine = db.engine
+        self.backends = []
+
+    def tearDown(self):
+        for backend in self.backends:
+            backend.stop()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        os.unlink(self.db_path)
+
+    def backend(self, holder):
+        """创建并启动一个后端（模拟一个进程），返回后端和收到的事件列表"""
+        backend = DatabaseBackend(engine=self.engine, poll_interval=3600, purge_interval=3600)
+        backend.purge_lease.holder = holder
+        received = []
+        backend.start(received.append)
+        self.backends.append(backend)
+        return backend, received
+
+    def event_count(self):
+        with self.engine.connect() as conn:
+            return conn.execute(sa.select(sa.func.count()).select_from(RentalEvent.__table__)).scalar()
+
+    def test_buffered_events_are_written_in_one_batch(self):
+        sender, sender_received = self.backend('web-1')
+        receiver, received = self.backend('web-2')
+        events = [{'type': 'delegated', 'rental_id': i, 'rental_address': f'addr{i}', 'status': 'active'}
+                  for i in range(3)]
+
+        for event in events:
+            sender.send(event)
+        sender.stop()
+
+        self.assertEqual(self.event_count(), 3)
+        self.assertEqual(receiver.poll_once(), 3)
+        self.assertEqual([event['rental_id'] for event in received], [0, 1, 2])
+        # 本进程写入的事件不再重复投递
+        self.assertEqual(sender.poll_once(), 3)
+        self.assertEqual(sender_received, [])
+
+    def test_only_lease_holder_purges(self):
+        first, _ = self.backend('monitor-1')
+        second, _ = self.backend('monitor-2')
+        first.flush([{'type': 'recovered', 'rental_id': 1}])
+        with self.engine.begin() as conn:
+            conn.execute(RentalEvent.__table__.update().values(created_at=datetime.utcnow() - timedelta(days=1)))
+
+        self.assertTrue(first._purge_if_held())
+        first.flush([{'type': 'recovered', 'rental_id': 2}])
+        with self.engine.begin() as conn:
+            conn.execute(RentalEvent.__table__.update().values(created_at=datetime.utcnow() - timedelta(days=1)))
+
+        self.assertEqual(self.event_count(), 1)
+        self.assertFalse(second._purge_if_held())
+        self.assertEqual(self.event_count(), 1)
+        self.assertTrue(first._purge_if_held())
+        self.assertEqual(self.event_count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""到期调度器与按ID回收：同一批处理窗口内到期的租赁一并回收"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from flask import Flask
+
+from trx_energy_rental.blockchain.expiry_recovery import ExpiryRecovery
+from trx_energy_rental.blockchain.expiry_scheduler import ExpiryScheduler
+from trx_energy_rental.database.models import db, EnergyRental
+
+
+class FakeTronClient:
+    """同步回收能量的客户端"""
+
+    def __init__(self):
+        self.undelegated = []
+
+    def get_ref_block_id(self):
+        return None
+
+    def undelegate_resource(self, address, ref_block_id=None, energy_amount=None, owner_address=None):
+        self.undelegated.append(address)
+        return 'recover_' + address
+
+    def submit(self, owner_address, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+class ExpiryBatchWindowTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{self.db_path}'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        with self.app.app_context():
+            db.create_all()
+            self.engine = db.engine
+
+        self.tron_client = FakeTronClient()
+        self.recovery = ExpiryRecovery(self.tron_client, engine=self.engine)
+        self.calls = []
+        self.done = threading.Event()
+        self.scheduler = ExpiryScheduler(on_due=self.on_due, batch_window=0.5)
+
+    def tearDown(self):
+        self.scheduler.stop()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        os.unlink(self.db_path)
+
+    def on_due(self, rental_ids, due_before):
+        self.calls.append(sorted(rental_ids))
+        self.result = self.recovery.recover_ids(rental_ids, now=due_before)
+        self.done.set()
+
+    def add_rental(self, address, expiry_time):
+        with self.app.app_context():
+            rental = EnergyRental(rental_address=address, energy_amount=1000, payment_txid='pay_' + address,
+                                  status='active', expiry_time=expiry_time, delegate_txid='tx_' + address)
+            db.session.add(rental)
+            db.session.commit()
+            return rental.id
+
+    def status(self, rental_id):
+        with self.app.app_context():
+            return db.session.get(EnergyRental, rental_id).status
+
+    def test_rentals_in_one_window_are_recovered_together(self):
+        now = datetime.utcnow()
+        first = self.add_rental('addr0', now + timedelta(seconds=0.2))
+        second = self.add_rental('addr1', now + timedelta(seconds=0.5))
+        self.scheduler.schedule(first, now + timedelta(seconds=0.2))
+        self.scheduler.schedule(second, now + timedelta(seconds=0.5))
+
+        self.scheduler.start()
+        self.assertTrue(self.done.wait(5))
+
+        self.assertEqual(self.calls, [sorted([first, second])])
+        self.assertEqual(self.result, ([], {}))
+        self.assertEqual(sorted(self.tron_client.undelegated), ['addr0', 'addr1'])
+        self.assertEqual((self.status(first), self.status(second)), ('completed', 'completed'))
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_extended_rental_is_returned_as_not_due(self):
+        now = datetime.utcnow()
+        rental_id = self.add_rental('addr0', now + timedelta(minutes=5))
+
+        failed, not_due = self.recovery.recover_ids([rental_id], now=now)
+
+        self.assertEqual(failed, [])
+        self.assertEqual(list(not_due), [rental_id])
+        self.assertEqual(self.tron_client.undelegated, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""指标接口的访问控制：关闭时不提供，设置令牌后需携带令牌"""
+
+import sys
+import unittest
+import urllib.error
+import urllib.request
+from pathlib import Path
+from unittest import mock
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from flask import Flask
+
+from trx_energy_rental.app import routes
+from trx_energy_rental.utils.metrics import MetricsExporter, authorized
+
+
+class MetricsEndpointTest(unittest.TestCase):
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.register_blueprint(routes.main)
+        self.client = app.test_client()
+
+    def get(self, **headers):
+        return self.client.get('/metrics', headers=headers).status_code
+
+    def test_disabled(self):
+        with mock.patch.object(routes.settings, 'METRICS_ENABLED', False):
+            self.assertEqual(self.get(), 404)
+
+    def test_token_required(self):
+        with mock.patch.multiple(routes.settings, METRICS_ENABLED=True, METRICS_TOKEN='secret'):
+            self.assertEqual(self.get(), 401)
+            self.assertEqual(self.get(Authorization='Bearer wrong'), 401)
+            self.assertEqual(self.get(Authorization='Bearer secret'), 200)
+
+
+class MetricsExporterTest(unittest.TestCase):
+
+    def test_token_required(self):
+        exporter = MetricsExporter(0, token='secret')
+        self.assertTrue(exporter.start())
+        self.addCleanup(exporter.stop)
+        url = f'http://127.0.0.1:{exporter.server.server_address[1]}/metrics'
+
+        with self.assertRaises(urllib.error.HTTPError) as caught:
+            urllib.request.urlopen(url, timeout=5)
+        self.assertEqual(caught.exception.code, 401)
+
+        request = urllib.request.Request(url, headers={'Authorization': 'Bearer secret'})
+        with urllib.request.urlopen(request, timeout=5) as response:
+            self.assertEqual(response.status, 200)
+
+    def test_no_token_allows_access(self):
+        self.assertTrue(authorized(None, ''))
+        self.assertFalse(authorized(None, 'secret'))
+
+
+if __name__ == '__main__':
+    unittest.main()
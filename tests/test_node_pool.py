@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+"""节点连接池在节点故障时的重试行为"""
+
+import sys
+import unittest
+from pathlib import Path
+
+# 添加项目根目录和工具目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / 'tools'))
+
+import requests
+
+from fake_tron_node import FakeChain, FakeTronNode
+from trx_energy_rental.blockchain.node_pool import NodePool
+
+
+class NodePoolFailoverTest(unittest.TestCase):
+
+    def setUp(self):
+        # 第一个节点所有请求都返回HTTP 500，第二个节点正常
+        self.failing = FakeTronNode(FakeChain(None, block_interval=3600), error_rate=1.0).start()
+        self.healthy = FakeTronNode(FakeChain(None, block_interval=3600)).start()
+        self.pool = NodePool([self.failing.url, self.healthy.url], timeout=5, max_attempts=2,
+                             failure_threshold=100)
+
+    def tearDown(self):
+        self.failing.stop()
+        self.healthy.stop()
+
+    def test_read_fails_over(self):
+        block = self.pool.make_request('/wallet/getnowblock')
+        self.assertIn('blockID', block)
+        self.assertEqual(self.failing.stats()['requests'].get('wallet/getnowblock'), 1)
+        self.assertEqual(self.healthy.stats()['requests'].get('wallet/getnowblock'), 1)
+
+    def test_broadcast_is_not_retried(self):
+        # tronpy发送广播时路径以斜杠开头
+        for method in ('/wallet/broadcasttransaction', 'wallet/broadcasttransaction',
+                       '/wallet/broadcasthex', 'wallet/broadcasthex'):
+            with self.assertRaises(requests.HTTPError):
+                self.pool.make_request(method, {'transaction': ''})
+
+        failing = self.failing.stats()['requests']
+        healthy = self.healthy.stats()['requests']
+        self.assertEqual(failing.get('wallet/broadcasttransaction'), 2)
+        self.assertEqual(failing.get('wallet/broadcasthex'), 2)
+        self.assertNotIn('wallet/broadcasttransaction', healthy)
+        self.assertNotIn('wallet/broadcasthex', healthy)
+
+
+if __name__ == '__main__':
+    unittest.main()
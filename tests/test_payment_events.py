@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""支付状态推送：只推送跟踪的租赁的状态，连接数有上限"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from flask import Flask
+
+from trx_energy_rental.app import routes
+from trx_energy_rental.database.models import db, EnergyRental
+from trx_energy_rental.utils.rental_notifier import rental_notifier, rental_snapshot
+
+ADDRESS = 'TAddr'
+
+
+class PaymentEventsTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{self.db_path}'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.app.register_blueprint(routes.api, url_prefix='/api')
+        with self.app.app_context():
+            db.create_all()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        os.unlink(self.db_path)
+
+    def add_rental(self, payment_txid, status):
+        with self.app.app_context():
+            rental = EnergyRental(rental_address=ADDRESS, energy_amount=1000, payment_txid=payment_txid,
+                                  status=status, expiry_time=datetime.utcnow() + timedelta(hours=1))
+            db.session.add(rental)
+            db.session.commit()
+            return rental_snapshot(rental)
+
+    def stream(self, query=''):
+        """打开推送连接，返回逐条读取状态的函数"""
+        response = self.client.get(f'/api/payment_events/{ADDRESS}{query}', buffered=False)
+        self.addCleanup(response.close)
+        chunks = iter(response.response)
+
+        def next_status():
+            for chunk in chunks:
+                chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+                if chunk.startswith('data: '):
+                    return json.loads(chunk[len('data: '):])['status']
+            return None
+        return response, next_status
+
+    def publish_later(self, *snapshots):
+        """订阅建立后依次发布状态快照"""
+        def publish():
+            while not rental_notifier.subscriber_count():
+                threading.Event().wait(0.01)
+            for snapshot in snapshots:
+                rental_notifier.publish_snapshot(snapshot)
+        threading.Thread(target=publish, daemon=True).start()
+
+    def test_older_rental_events_do_not_change_status(self):
+        old = self.add_rental('pay_old', 'active')
+        new = self.add_rental('pay_new', 'pending')
+        _, next_status = self.stream('?payment_txid=pay_new')
+        self.assertEqual(next_status(), 'pending')
+
+        # 较早租赁的回收事件不影响新付款的状态
+        self.publish_later(dict(old, status='completed'), dict(new, status='active'))
+
+        self.assertEqual(next_status(), 'success')
+
+    def test_unpinned_stream_follows_new_payment(self):
+        old = self.add_rental('pay_old', 'active')
+        new = self.add_rental('pay_new', 'pending')
+
+        self.assertFalse(routes._is_tracked(dict(old, status='completed'), new, pinned=False))
+        self.assertTrue(routes._is_tracked(dict(new, status='active'), new, pinned=False))
+        self.assertTrue(routes._is_tracked(new, old, pinned=False))
+        self.assertFalse(routes._is_tracked(new, old, pinned=True))
+
+    def test_streams_are_capped(self):
+        self.add_rental('pay_new', 'pending')
+        with mock.patch.object(routes, '_payment_streams', threading.BoundedSemaphore(1)):
+            response, next_status = self.stream()
+            self.assertEqual(next_status(), 'pending')
+
+            self.assertEqual(self.client.get(f'/api/payment_events/{ADDRESS}').status_code, 503)
+
+            response.close()
+            self.assertTrue(routes._payment_streams.acquire(blocking=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""付款摄取游标在处理失败时不越过付款"""
+
+import sys
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from trx_energy_rental.blockchain.payment_ingestor import PaymentIngestor
+
+MONITOR = 'TMonitorAddress000000000000000000'
+
+
+def payment(txid, timestamp):
+    return {'txID': txid, 'type': 'TransferContract', 'from': 'T' + txid, 'to': MONITOR,
+            'amount': 10 ** 6, 'timestamp': timestamp, 'block_number': timestamp}
+
+
+class FakeClient:
+    monitor_address = MONITOR
+
+    def __init__(self, transactions):
+        self.transactions = transactions
+
+    def get_transactions_page(self, address, min_timestamp=0, fingerprint=None, limit=200, only_to=False):
+        return [tx for tx in self.transactions if tx['timestamp'] >= min_timestamp], None
+
+
+class PaymentIngestorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient([payment('a', 1000), payment('b', 1000), payment('c', 2000)])
+        self.calls = []
+        self.failing = {'b'}
+
+    def handler(self, sender, txid):
+        self.calls.append(txid)
+        if txid in self.failing:
+            raise RuntimeError('数据库不可用')
+        return True
+
+    def test_failed_payment_is_retried(self):
+        ingestor = PaymentIngestor(self.client, self.handler)
+        ingestor.block_timestamp = 1000
+        ingestor._loaded = True
+
+        self.assertEqual(ingestor.poll_once(), 1)
+        self.assertEqual(self.calls, ['a', 'b'])
+
+        self.failing.clear()
+        self.assertEqual(ingestor.poll_once(), 2)
+        self.assertEqual(self.calls, ['a', 'b', 'b', 'c'])
+
+        self.assertEqual(ingestor.poll_once(), 0)
+        self.assertEqual(ingestor.last_txid, 'c')
+
+    def test_handler_returning_false_stops_cursor(self):
+        ingestor = PaymentIngestor(self.client, lambda sender, txid: txid != 'c')
+        ingestor.block_timestamp = 1000
+        ingestor._loaded = True
+
+        self.assertEqual(ingestor.poll_once(), 2)
+        self.assertEqual(ingestor.block_timestamp, 1000)
+        self.assertEqual(ingestor.last_txid, 'b')
+
+
+if __name__ == '__main__':
+    unittest.main()
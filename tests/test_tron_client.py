@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+"""账户资源信息的能量计算"""
+
+import sys
+import unittest
+from pathlib import Path
+
+# 添加项目根目录和工具目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / 'tools'))
+
+from fake_tron_node import FakeChain, random_address
+from trx_energy_rental.blockchain.tron_client import available_energy
+
+
+class AvailableEnergyTest(unittest.TestCase):
+
+    def test_full_node_keys(self):
+        self.assertEqual(available_energy({'EnergyLimit': 100000, 'EnergyUsed': 30000}), 70000)
+
+    def test_omitted_zero_fields(self):
+        # 全节点省略值为0的字段
+        self.assertEqual(available_energy({'EnergyLimit': 100000}), 100000)
+        self.assertEqual(available_energy({'freeNetLimit': 600}), 0)
+
+    def test_used_above_limit(self):
+        self.assertEqual(available_energy({'EnergyLimit': 100, 'EnergyUsed': 200}), 0)
+
+    def test_fake_node_account(self):
+        owner = random_address()
+        chain = FakeChain(None, accounts={owner: 5000000})
+        self.assertEqual(available_energy(chain.account_resource(owner)), 5000000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+"""本地签名交易与模拟节点解析结果的往返测试"""
+
+import sys
+import unittest
+from pathlib import Path
+
+# 添加项目根目录和工具目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / 'tools'))
+
+from tronpy.keys import PrivateKey, to_hex_address
+
+from fake_tron_node import FREEZE_BALANCE, UNFREEZE_BALANCE, parse_transaction_hex
+from trx_energy_rental.blockchain.tx_signer import SigningPipeline
+
+
+class SigningPipelineRoundTripTest(unittest.TestCase):
+
+    def setUp(self):
+        self.priv_key = PrivateKey(bytes.fromhex('11' * 32))
+        self.owner = self.priv_key.public_key.to_base58check_address()
+        self.receiver = PrivateKey(bytes.fromhex('22' * 32)).public_key.to_base58check_address()
+        block_id = '0000000000abcdef' + 'ab' * 24
+        self.pipeline = SigningPipeline(lambda: block_id, self.owner, self.priv_key)
+
+    def test_delegate_round_trip(self):
+        txid, tx_hex = self.pipeline.sign_delegate(self.receiver, 32000)
+        self.assertEqual(
+            parse_transaction_hex(tx_hex),
+            (txid, FREEZE_BALANCE, to_hex_address(self.owner), to_hex_address(self.receiver), 32000)
+        )
+
+    def test_undelegate_round_trip(self):
+        txid, tx_hex = self.pipeline.sign_undelegate(self.receiver)
+        self.assertEqual(
+            parse_transaction_hex(tx_hex),
+            (txid, UNFREEZE_BALANCE, to_hex_address(self.owner), to_hex_address(self.receiver), 0)
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
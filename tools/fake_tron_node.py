@@ -0,0 +1,582 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地模拟TRON节点
+
+在本地提供 TronClient、AsyncTronClient、付款摄取和区块扫描用到的全节点/TronGrid接口，
+用于在不连接Nile或主网的情况下进行压力测试：
+
+- 账户和资源查询：wallet/getaccount、wallet/getaccountresource
+- 交易历史：GET v1/accounts/<地址>/transactions（分页、only_to、min_timestamp、排序）
+- 构建和广播：wallet/freezebalance、wallet/unfreezebalance、wallet/getsignweight、
+  wallet/broadcasttransaction、wallet/broadcasthex
+- 区块：wallet/getnodeinfo、wallet/getnowblock、wallet/getblockbynum、wallet/getblockbylimitnext
+
+可以配置每个请求的延迟、错误（HTTP 500）和限流（HTTP 429）比例，并按指定速率生成付款。
+节点记录每笔付款从上链到收到对应代理交易的时间，通过 GET /_fake/stats 查看：
+
+- GET  /_fake/stats     请求、付款、代理统计和付款到代理的延迟分位数
+- POST /_fake/payments  立即生成付款，请求体 {"count": 10, "amount": 0.1}
+
+用法：
+    python tools/fake_tron_node.py --port 8090 --monitor-address T... --owner-energy T...=100000000
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from tronpy.keys import to_hex_address
+
+# protocol.Transaction.Contract.ContractType
+FREEZE_BALANCE = 11
+UNFREEZE_BALANCE = 12
+
+CONTRACT_TYPE_NAMES = {
+    FREEZE_BALANCE: 'FreezeBalanceContract',
+    UNFREEZE_BALANCE: 'UnfreezeBalanceContract',
+}
+
+# 模拟的USDT合约地址和 transfer(address,uint256) 选择器
+USDT_CONTRACT = '41a614f803b6fd780986a42c78ec9c7f77e6ded13c'
+TRANSFER_SELECTOR = 'a9059cbb'
+
+
+def random_address():
+    """随机的十六进制地址（41开头）"""
+    return '41' + '%040x' % random.getrandbits(160)
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """计算分位数，没有数据时返回None"""
+    if not values:
+        return {f'p{point}': None for point in points}
+    ordered = sorted(values)
+    result = {}
+    for point in points:
+        index = min(len(ordered) - 1, int(round(point / 100 * (len(ordered) - 1))))
+        result[f'p{point}'] = ordered[index]
+    return result
+
+
+def _read_varint(data, i):
+    """读取protobuf varint，返回 (值, 下一个位置)"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[i]
+        i += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, i
+        shift += 7
+
+
+def _read_fields(data):
+    """解析一层protobuf消息，返回 {字段号: [值, ...]}"""
+    fields = defaultdict(list)
+    i = 0
+    while i < len(data):
+        key, i = _read_varint(data, i)
+        field, wire = key >> 3, key & 7
+        if wire == 0:
+            value, i = _read_varint(data, i)
+        elif wire == 2:
+            length, i = _read_varint(data, i)
+            value = data[i:i + length]
+            i += length
+        elif wire == 1:
+            value = data[i:i + 8]
+            i += 8
+        elif wire == 5:
+            value = data[i:i + 4]
+            i += 4
+        else:
+            raise ValueError(f"不支持的protobuf类型 {wire}")
+        fields[field].append(value)
+    return fields
+
+
+def parse_transaction_hex(tx_hex):
+    """解析本地签名的代理/回收交易，返回 (txid, 合约类型, 发起地址, 接收者地址, 数量)"""
+    tx = _read_fields(bytes.fromhex(tx_hex))
+    raw = tx[1][0]
+    contract = _read_fields(_read_fields(raw)[11][0])
+    contract_type = contract[1][0]
+    value = _read_fields(_read_fields(contract[2][0])[2][0])
+    if contract_type == FREEZE_BALANCE:
+        receiver = value[15][0].hex() if value.get(15) else None
+        amount = value[2][0] if value.get(2) else 0
+    else:
+        receiver = value[13][0].hex() if value.get(13) else None
+        amount = 0
+    return hashlib.sha256(raw).hexdigest(), contract_type, value[1][0].hex(), receiver, amount
+
+
+class FakeChain:
+    """模拟链状态：出块、账户能量、交易索引和付款到代理的延迟统计"""
+
+    def __init__(self, monitor_address, block_interval=3.0, accounts=None,
+                 usage_probability=0.0, usage_delay=5.0, keep_blocks=10000):
+        self.monitor_address = to_hex_address(monitor_address) if monitor_address else None
+        self.block_interval = block_interval
+        self.usage_probability = usage_probability  # 代理后用户进行TRC20转账的概率
+        self.usage_delay = usage_delay
+        self.keep_blocks = keep_blocks
+
+        self.energy = defaultdict(int)  # 十六进制地址 -> 能量上限
+        self.energy_used = defaultdict(int)
+        for address, energy in (accounts or {}).items():
+            self.energy[to_hex_address(address)] = energy
+
+        self.blocks = []
+        self.number = 0
+        self.pending = []
+        self.account_txs = defaultdict(list)  # 十六进制地址 -> 已上链的交易（按区块顺序）
+        self.paid_at = {}  # 付款者 -> 付款上链时间
+        self.delegation_latencies = []
+        self.counters = Counter()
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.produce_block()
+
+    def start(self):
+        """启动出块线程"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='fake-block-producer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """停止出块"""
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.wait(self.block_interval):
+            self.produce_block()
+
+    def _block_id(self, number):
+        return '%016x' % number + hashlib.sha256(str(number).encode()).hexdigest()[16:]
+
+    def produce_block(self):
+        """把待上链的交易打包为新区块"""
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            self.number += 1
+            transactions, self.pending = self.pending, []
+            block = {
+                'blockID': self._block_id(self.number),
+                'block_header': {'raw_data': {'number': self.number, 'timestamp': now_ms}},
+                'transactions': transactions,
+            }
+            self.blocks.append(block)
+            if len(self.blocks) > self.keep_blocks:
+                del self.blocks[:len(self.blocks) - self.keep_blocks]
+
+            for tx in transactions:
+                tx['blockNumber'] = self.number
+                tx['block_timestamp'] = now_ms
+                value = tx['raw_data']['contract'][0]['parameter']['value']
+                for key in ('owner_address', 'to_address'):
+                    if value.get(key):
+                        self.account_txs[value[key]].append(tx)
+                if tx['raw_data']['contract'][0]['type'] == 'TransferContract' \
+                        and value.get('to_address') == self.monitor_address:
+                    self.paid_at.setdefault(value['owner_address'], time.time())
+                    self.counters['payments_confirmed'] += 1
+            return block
+
+    def _submit(self, contract_type, value, txid=None):
+        """加入待上链交易"""
+        raw_data = {
+            'contract': [{'type': contract_type, 'parameter': {'value': value}}],
+            'timestamp': int(time.time() * 1000),
+        }
+        tx = {
+            'txID': txid or hashlib.sha256(json.dumps(raw_data, sort_keys=True).encode()
+                                           + random.getrandbits(64).to_bytes(8, 'big')).hexdigest(),
+            'raw_data': raw_data,
+            'ret': [{'contractRet': 'SUCCESS'}],
+        }
+        with self._lock:
+            self.pending.append(tx)
+        return tx
+
+    def add_payment(self, sender=None, amount_sun=100000):
+        """生成一笔向监听地址的付款"""
+        self.counters['payments_sent'] += 1
+        return self._submit('TransferContract', {
+            'owner_address': sender or random_address(),
+            'to_address': self.monitor_address,
+            'amount': amount_sun,
+        })
+
+    def add_trc20_transfer(self, sender):
+        """生成一笔由 sender 发起的TRC20转账"""
+        data = TRANSFER_SELECTOR + '0' * 24 + random_address()[2:] + '%064x' % 1000000
+        return self._submit('TriggerSmartContract', {
+            'owner_address': sender,
+            'contract_address': USDT_CONTRACT,
+            'data': data,
+        })
+
+    def apply_broadcast(self, txid, contract_type, owner, receiver, amount):
+        """处理广播的代理/回收交易"""
+        with self._lock:
+            if contract_type == FREEZE_BALANCE:
+                self.energy[receiver] += amount
+                self.energy_used[owner] += amount
+                self.counters['delegations'] += 1
+                paid_at = self.paid_at.pop(receiver, None)
+                if paid_at is not None:
+                    self.delegation_latencies.append(time.time() - paid_at)
+            elif contract_type == UNFREEZE_BALANCE:
+                self.energy[receiver] = 0
+                self.counters['undelegations'] += 1
+            else:
+                self.counters['other_broadcasts'] += 1
+
+        if contract_type == FREEZE_BALANCE and random.random() < self.usage_probability:
+            timer = threading.Timer(self.usage_delay, self.add_trc20_transfer, args=(receiver,))
+            timer.daemon = True
+            timer.start()
+
+        self._submit(CONTRACT_TYPE_NAMES.get(contract_type, 'UnknownContract'), {
+            'owner_address': owner,
+            'receiver_address': receiver,
+            'frozen_balance': amount,
+        }, txid=txid)
+
+    def account_resource(self, address):
+        """与全节点一致，值为0的字段省略；所有地址都视为已激活账户"""
+        address = to_hex_address(address)
+        with self._lock:
+            resource = {
+                'freeNetLimit': 600,
+                'EnergyLimit': self.energy[address],
+                'EnergyUsed': self.energy_used[address],
+            }
+        return {key: value for key, value in resource.items() if value}
+
+    def transactions(self, address, params):
+        """TronGrid v1 交易历史"""
+        address = to_hex_address(address)
+        with self._lock:
+            transactions = list(self.account_txs.get(address, []))
+
+        if params.get('only_to') == 'true':
+            transactions = [tx for tx in transactions
+                            if tx['raw_data']['contract'][0]['parameter']['value'].get('to_address') == address]
+        if params.get('min_timestamp'):
+            min_timestamp = int(params['min_timestamp'])
+            transactions = [tx for tx in transactions if tx['block_timestamp'] >= min_timestamp]
+        if not params.get('order_by', '').endswith(',asc'):
+            transactions.reverse()
+
+        offset = int(params.get('fingerprint') or 0)
+        limit = int(params.get('limit') or 20)
+        page = transactions[offset:offset + limit]
+        meta = {'page_size': len(page)}
+        if offset + limit < len(transactions):
+            meta['fingerprint'] = str(offset + limit)
+        return {'data': page, 'success': True, 'meta': meta}
+
+    def get_block(self, number=None):
+        """按区块号获取区块，未指定时返回最新区块"""
+        with self._lock:
+            if number is None:
+                return self.blocks[-1]
+            first = self.blocks[0]['block_header']['raw_data']['number']
+            index = number - first
+            return self.blocks[index] if 0 <= index < len(self.blocks) else {}
+
+    def get_blocks(self, start, end):
+        """区块号在 [start, end) 内的区块，最多100个"""
+        with self._lock:
+            first = self.blocks[0]['block_header']['raw_data']['number']
+            lo = max(0, start - first)
+            hi = max(lo, min(len(self.blocks), end - first, lo + 100))
+            return self.blocks[lo:hi]
+
+    def node_info(self):
+        with self._lock:
+            block = f"Num:{self.number},ID:{self._block_id(self.number)}"
+        return {'block': block, 'solidityBlock': block}
+
+    def stats(self):
+        """付款和代理统计"""
+        with self._lock:
+            latencies = list(self.delegation_latencies)
+            stats = dict(self.counters)
+            stats['block_number'] = self.number
+            stats['awaiting_delegation'] = len(self.paid_at)
+        stats['delegation_latency'] = dict(
+            percentiles(latencies),
+            count=len(latencies),
+            max=max(latencies) if latencies else None,
+            mean=sum(latencies) / len(latencies) if latencies else None,
+        )
+        return stats
+
+
+class PaymentGenerator:
+    """按固定速率生成付款"""
+
+    def __init__(self, chain, rate, amount_sun=100000):
+        self.chain = chain
+        self.rate = rate
+        self.amount_sun = amount_sun
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='fake-payment-generator')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        interval = 1.0 / self.rate
+        next_at = time.monotonic()
+        while not self._stop_event.is_set():
+            self.chain.add_payment(amount_sun=self.amount_sun)
+            next_at += interval
+            self._stop_event.wait(max(0.0, next_at - time.monotonic()))
+
+
+class FakeTronNode:
+    """模拟节点的HTTP服务"""
+
+    def __init__(self, chain, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, throttle_rate=0.0):
+        self.chain = chain
+        self.latency = latency  # 每个请求的基础延迟（秒）
+        self.jitter = jitter  # 额外的随机延迟上限（秒）
+        self.error_rate = error_rate  # 返回HTTP 500的比例
+        self.throttle_rate = throttle_rate  # 返回HTTP 429的比例
+        self.requests = Counter()
+        self._requests_lock = threading.Lock()
+
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # 响应头和响应体分两次写入，关闭Nagle避免与客户端的延迟确认叠加出约40毫秒的等待
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                node.handle(self, 'GET')
+
+            def do_POST(self):
+                node.handle(self, 'POST')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self):
+        """启动出块和HTTP服务"""
+        self.chain.start()
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-tron-node')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.chain.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        """链上统计和按接口统计的请求数量"""
+        stats = self.chain.stats()
+        with self._requests_lock:
+            stats['requests'] = dict(self.requests)
+        return stats
+
+    def handle(self, request, method):
+        """分发请求，注入延迟和错误"""
+        url = urlparse(request.path)
+        path = url.path.strip('/')
+        length = int(request.headers.get('Content-Length') or 0)
+        body = request.rfile.read(length) if length else b''
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if body:
+            try:
+                params.update(json.loads(body))
+            except ValueError:
+                pass
+
+        if not path.startswith('_fake/'):
+            with self._requests_lock:
+                self.requests[path.split('/')[0] if path.startswith('v1/') else path] += 1
+            if self.latency or self.jitter:
+                time.sleep(self.latency + random.random() * self.jitter)
+            roll = random.random()
+            if roll < self.throttle_rate:
+                return self._reply(request, 429, {'Error': 'rate limited'}, {'Retry-After': '1'})
+            if roll < self.throttle_rate + self.error_rate:
+                return self._reply(request, 500, {'Error': 'injected error'})
+
+        try:
+            status, payload = 200, self.route(method, path, params)
+        except KeyError:
+            status, payload = 404, {'Error': f'unknown path {path}'}
+        except Exception as e:
+            status, payload = 400, {'Error': str(e)}
+        self._reply(request, status, payload)
+
+    def _reply(self, request, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            request.send_header(key, value)
+        request.end_headers()
+        request.wfile.write(data)
+
+    def route(self, method, path, params):
+        """模拟接口"""
+        chain = self.chain
+
+        if path == '_fake/stats':
+            return self.stats()
+        if path == '_fake/payments':
+            amount_sun = int(float(params.get('amount', 0.1)) * 1e6)
+            txs = [chain.add_payment(amount_sun=amount_sun) for _ in range(int(params.get('count', 1)))]
+            return {'txids': [tx['txID'] for tx in txs]}
+
+        if path.startswith('v1/accounts/') and path.endswith('/transactions'):
+            return chain.transactions(path.split('/')[2], params)
+
+        if path == 'wallet/getnodeinfo':
+            return chain.node_info()
+        if path in ('wallet/getnowblock', 'walletsolidity/getnowblock'):
+            return chain.get_block()
+        if path == 'wallet/getblockbynum':
+            return chain.get_block(int(params['num']))
+        if path == 'wallet/getblockbylimitnext':
+            return {'block': chain.get_blocks(int(params['startNum']), int(params['endNum']))}
+        if path == 'wallet/getaccount':
+            address = params['address']
+            return {'address': address if params.get('visible') else to_hex_address(address), 'balance': 0}
+        if path == 'wallet/getaccountresource':
+            return chain.account_resource(params['address'])
+
+        if path in ('wallet/freezebalance', 'wallet/unfreezebalance'):
+            # 节点构建交易（AsyncTronClient使用）
+            contract_type = FREEZE_BALANCE if path == 'wallet/freezebalance' else UNFREEZE_BALANCE
+            value = {
+                'owner_address': to_hex_address(params['owner_address']),
+                'receiver_address': to_hex_address(params['receiver_address']),
+                'frozen_balance': params.get('frozen_balance', 0),
+            }
+            raw_data = {'contract': [{'type': CONTRACT_TYPE_NAMES[contract_type], 'parameter': {'value': value}}]}
+            return {'txID': _json_txid(raw_data), 'raw_data': raw_data, 'visible': False}
+        if path == 'wallet/getsignweight':
+            # tronpy构建交易时用于计算txID
+            return {'transaction': {'transaction': {'txID': _json_txid(params['raw_data'])}}}
+        if path == 'wallet/broadcasttransaction':
+            contract = params['raw_data']['contract'][0]
+            value = contract['parameter']['value']
+            contract_type = {name: code for code, name in CONTRACT_TYPE_NAMES.items()}.get(contract['type'])
+            chain.apply_broadcast(
+                params.get('txID') or _json_txid(params['raw_data']),
+                contract_type,
+                to_hex_address(value['owner_address']),
+                to_hex_address(value['receiver_address']) if value.get('receiver_address') else None,
+                value.get('frozen_balance', 0),
+            )
+            return {'result': True, 'txid': params.get('txID')}
+        if path == 'wallet/broadcasthex':
+            txid, contract_type, owner, receiver, amount = parse_transaction_hex(params['transaction'])
+            chain.apply_broadcast(txid, contract_type, owner, receiver, amount)
+            return {'result': True, 'txid': txid}
+
+        raise KeyError(path)
+
+
+def _json_txid(raw_data):
+    """按raw_data内容计算的交易ID（模拟节点不编码protobuf）"""
+    return hashlib.sha256(json.dumps(raw_data, sort_keys=True).encode()).hexdigest()
+
+
+def parse_energy(values):
+    """解析 --owner-energy 地址=能量"""
+    accounts = {}
+    for value in values or []:
+        address, energy = value.split('=', 1)
+        accounts[address] = int(energy)
+    return accounts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟TRON节点')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--monitor-address', required=True, help='监听付款的C地址')
+    parser.add_argument('--owner-energy', action='append', help='账户的初始能量，格式为 地址=能量，可重复')
+    parser.add_argument('--block-interval', type=float, default=3.0, help='出块间隔（秒）')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的基础延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='额外的随机延迟上限（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回HTTP 500的比例')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='返回HTTP 429的比例')
+    parser.add_argument('--payments-per-second', type=float, default=0.0, help='自动生成付款的速率')
+    parser.add_argument('--payment-amount', type=float, default=0.1, help='每笔付款的金额（TRX）')
+    parser.add_argument('--usage-probability', type=float, default=0.0, help='代理后用户进行TRC20转账的概率')
+    args = parser.parse_args()
+
+    chain = FakeChain(args.monitor_address, args.block_interval, parse_energy(args.owner_energy),
+                      usage_probability=args.usage_probability)
+    node = FakeTronNode(chain, args.host, args.port, args.latency, args.jitter,
+                        args.error_rate, args.throttle_rate).start()
+    print(f"模拟节点已启动: {node.url}")
+
+    generator = None
+    if args.payments_per_second > 0:
+        generator = PaymentGenerator(chain, args.payments_per_second, int(args.payment_amount * 1e6))
+        generator.start()
+
+    try:
+        while True:
+            time.sleep(10)
+            stats = chain.stats()
+            print(f"区块 {stats['block_number']}  付款 {stats.get('payments_confirmed', 0)}  "
+                  f"代理 {stats.get('delegations', 0)}  延迟 {stats['delegation_latency']}")
+    except KeyboardInterrupt:
+        if generator:
+            generator.stop()
+        node.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,4 +2,136 @@
 Web应用模块
 
 包含Flask应用的路由、表单和视图等组件。
-""" 
\ No newline at end of file
+""" 
+
+import os
+from flask import Flask
+from flask_login import LoginManager
+from flask_migrate import Migrate
+
+from ..database.models import db, User
+from ..database.session import engine_options
+from .routes import main as main_blueprint, auth, api
+from ..blockchain.energy_service import EnergyRentalService
+from ..utils.event_bus import event_bus
+from ..utils.metrics import start_exporter
+from ..config import settings, validate_config
+
+def create_app(test_config=None, role='web'):
+    """创建并配置Flask应用
+    
+    role 为进程角色：bot 和 monitor 立即启动事件总线；web 在处理第一个请求时启动，
+    flask db upgrade 等只加载应用的命令行不会启动事件总线的拉取线程。
+    """
+    # 创建应用实例
+    # 静态文件和模板位于包的上一级目录
+    app = Flask(__name__,
+                static_folder='../static',
+                template_folder='../templates')
+    
+    # 加载配置
+    app.config['SECRET_KEY'] = settings.SECRET_KEY
+    app.config['SQLALCHEMY_DATABASE_URI'] = settings.DATABASE_URL
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    
+    # 如果是测试配置
+    if test_config:
+        app.config.update(test_config)
+    
+    # 连接池：Web请求、机器人和后台工作线程共享
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'],
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW
+    ))
+    
+    # 确保实例文件夹存在
+    try:
+        os.makedirs(app.instance_path)
+    except OSError:
+        pass
+    
+    # 初始化数据库
+    db.init_app(app)
+    migrate = Migrate(app, db, directory=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations'))
+    
+    # 初始化登录管理器
+    login_manager = LoginManager()
+    login_manager.login_view = 'auth.login'
+    login_manager.login_message = '请先登录'
+    login_manager.login_message_category = 'info'
+    login_manager.init_app(app)
+    
+    # 用户加载回调
+    @login_manager.user_loader
+    def load_user(user_id):
+        return User.query.get(int(user_id))
+    
+    # 注册蓝图
+    app.register_blueprint(main_blueprint)
+    app.register_blueprint(auth, url_prefix='/auth')
+    app.register_blueprint(api, url_prefix='/api')
+    
+    # 创建数据库表（如果不存在）
+    with app.app_context():
+        db.create_all()
+        if role in ('bot', 'monitor'):
+            event_bus.start()
+    
+    if role == 'web':
+        @app.before_request
+        def start_event_bus():
+            event_bus.start()
+    
+    return app
+
+def run_bot():
+    """运行Telegram机器人"""
+    from ..bot.telegram_bot import TelegramBot
+    
+    # 验证配置
+    validate_config()
+    
+    # 创建应用以获取数据库会话
+    app = create_app(role='bot')
+    start_exporter(settings.BOT_METRICS_PORT, settings.METRICS_HOST, settings.METRICS_TOKEN)
+    
+    # 在应用上下文中运行机器人
+    with app.app_context():
+        bot = TelegramBot(db.session)
+        bot.start()
+
+def run_energy_service():
+    """运行能量监控服务（不含Web应用和机器人）"""
+    # 验证配置
+    validate_config()
+    
+    # 创建应用以获取数据库会话
+    app = create_app(role='monitor')
+    start_exporter(settings.MONITOR_METRICS_PORT, settings.METRICS_HOST, settings.METRICS_TOKEN)
+    
+    # 在应用上下文中运行能量服务
+    with app.app_context():
+        service = EnergyRentalService(db.session)
+        service.start_monitoring()
+        
+        # 保持服务运行
+        import time
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            service.stop_monitoring()
+            print("能量监控服务已停止")
+
+def main():
+    """命令行入口点，启动Web应用"""
+    try:
+        validate_config()
+    except ValueError as e:
+        print(f"配置错误: {str(e)}")
+        import sys
+        sys.exit(1)
+    
+    app = create_app()
+    app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,28 @@
+import sys
+
+from . import main, run_bot, run_energy_service, validate_config
+
+if __name__ == '__main__':
+    # 验证配置
+    try:
+        validate_config()
+    except ValueError as e:
+        print(f"配置错误: {str(e)}")
+        sys.exit(1)
+    
+    # 解析命令行参数
+    if len(sys.argv) > 1:
+        if sys.argv[1] == 'bot':
+            print("启动Telegram机器人...")
+            run_bot()
+        elif sys.argv[1] == 'service':
+            print("启动能量监控服务...")
+            run_energy_service()
+        else:
+            print("未知的命令行参数，使用方法：")
+            print("python -m trx_energy_rental.app                 # 启动Web应用")
+            print("python -m trx_energy_rental.app bot             # 启动Telegram机器人")
+            print("python -m trx_energy_rental.app service         # 启动能量监控服务")
+    else:
+        # 默认启动Web应用
+        main() 
@@ -1,4 +1,7 @@
-from flask import Blueprint, render_template, flash, redirect, url_for, request, jsonify
+import json
+import threading
+import time
+from flask import Blueprint, render_template, flash, redirect, url_for, request, jsonify, Response, stream_with_context, g, abort
 from flask_login import login_user, current_user, logout_user, login_required
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
@@ -6,6 +9,9 @@ from datetime import datetime, timedelta
 from ..database.models import db, User, EnergyRental, SystemStatus
 from ..blockchain.energy_service import EnergyRentalService
 from ..blockchain.tron_client import TronClient
+from ..utils.rental_notifier import rental_notifier, rental_snapshot
+from ..utils.event_bus import event_bus, ALL_EVENTS
+from ..utils import metrics
 from .forms import LoginForm, RegisterForm, RentEnergyForm, RecoverEnergyForm
 from ..config import settings
 
@@ -16,7 +22,44 @@ api = Blueprint('api', __name__)
 
 # 初始化服务
 tron_client = TronClient()
-energy_service = EnergyRentalService()
+_energy_service = None
+
+# 租赁事件转给支付状态推送连接
+event_bus.subscribe(ALL_EVENTS, rental_notifier.handle_event)
+
+# 同时保持的支付状态推送连接（每个连接占用一个工作线程）
+_payment_streams = threading.BoundedSemaphore(settings.PAYMENT_EVENTS_MAX_STREAMS)
+
+def get_energy_service():
+    """获取Web进程使用的能量服务（首次使用时在应用上下文中创建）"""
+    global _energy_service
+    if _energy_service is None:
+        _energy_service = EnergyRentalService(db.session)
+    return _energy_service
+
+@api.before_request
+def _start_api_timer():
+    """记录API请求开始时间"""
+    g.api_started = time.perf_counter()
+
+@api.after_request
+def _record_api_metrics(response):
+    """按端点记录API请求数和耗时（推送接口为建立连接的耗时）"""
+    endpoint = request.endpoint or 'unknown'
+    metrics.API_REQUESTS.labels(endpoint, response.status_code).inc()
+    started = g.get('api_started')
+    if started is not None:
+        metrics.API_REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+    return response
+
+@main.route('/metrics')
+def metrics_endpoint():
+    """Prometheus格式的监控指标（METRICS_ENABLED 开启时提供，设置 METRICS_TOKEN 时需携带令牌）"""
+    if not settings.METRICS_ENABLED:
+        abort(404)
+    if not metrics.authorized(request.headers.get('Authorization'), settings.METRICS_TOKEN):
+        return Response(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
 
 # 主页路由
 @main.route('/')
@@ -62,6 +105,11 @@ def rent_energy():
     if form.validate_on_submit():
         tron_address = form.tron_address.data
         
+        # 能量池余量不足时不接受新的租赁，避免用户付款后无法代理
+        if not tron_client.has_pool_capacity():
+            flash('当前可出租的能量不足，请稍后再试', 'warning')
+            return redirect(url_for('main.index'))
+        
         # 检查地址是否有足够能量
         if tron_client.check_enough_energy(tron_address):
             flash(f'地址 {tron_address} 已有足够能量，不需要租赁', 'info')
@@ -104,7 +152,7 @@ def recover_energy():
         tron_address = form.tron_address.data
         
         # 手动回收能量
-        success, message = energy_service.manual_recover(tron_address)
+        success, message = get_energy_service().manual_recover(tron_address)
         
         if success:
             flash(message, 'success')
@@ -179,60 +227,141 @@ def logout():
     return redirect(url_for('main.index'))
 
 # API路由
-@api.route('/check_payment/<tron_address>', methods=['GET'])
-def check_payment(tron_address):
-    """检查支付状态的API"""
-    # 查询该地址的活跃租赁
-    rental = EnergyRental.query.filter_by(
-        rental_address=tron_address,
-        status='active'
-    ).first()
-    
-    if rental:
-        return jsonify({
+def _payment_status(snapshot):
+    """根据租赁状态快照生成支付状态响应"""
+    if snapshot and snapshot['status'] == 'active':
+        return {
             'status': 'success',
             'message': '能量租赁已激活',
             'data': {
-                'rental_id': rental.id,
-                'rental_address': rental.rental_address,
-                'energy_amount': rental.energy_amount,
-                'expiry_time': rental.expiry_time.isoformat(),
-                'remaining_minutes': rental.remaining_time
+                'rental_id': snapshot['rental_id'],
+                'rental_address': snapshot['rental_address'],
+                'energy_amount': snapshot['energy_amount'],
+                'expiry_time': snapshot['expiry_time'],
+                'remaining_minutes': snapshot['remaining_minutes']
             }
-        })
-    
-    # 查询该地址的待处理租赁
-    pending_rental = EnergyRental.query.filter_by(
-        rental_address=tron_address,
-        status='pending'
-    ).first()
+        }
     
-    if pending_rental:
-        return jsonify({
+    if snapshot and snapshot['status'] == 'pending':
+        return {
             'status': 'pending',
             'message': '支付已收到，正在处理中',
             'data': None
-        })
-    
-    # 查询是否有失败的租赁
-    failed_rental = EnergyRental.query.filter_by(
-        rental_address=tron_address,
-        status='failed'
-    ).order_by(EnergyRental.updated_at.desc()).first()
+        }
     
-    if failed_rental:
-        return jsonify({
+    if snapshot and snapshot['status'] == 'failed':
+        return {
             'status': 'failed',
             'message': '租赁处理失败',
             'data': None
-        })
+        }
     
     # 未检测到支付或租赁记录
-    return jsonify({
+    return {
         'status': 'not_found',
         'message': '未检测到支付',
         'data': None
-    })
+    }
+
+def _resolve_payment_status(tron_address):
+    """一次查询获取地址当前的支付状态"""
+    rental = EnergyRental.resolve_latest(tron_address)
+    return _payment_status(rental_snapshot(rental) if rental else None)
+
+@api.route('/check_payment/<tron_address>', methods=['GET'])
+def check_payment(tron_address):
+    """检查支付状态的API"""
+    return jsonify(_resolve_payment_status(tron_address))
+
+@api.route('/payment_events/<tron_address>', methods=['GET'])
+def payment_events(tron_address):
+    """支付状态推送（Server-Sent Events）
+    
+    连接建立后立即推送当前状态，之后在跟踪的租赁状态变化时推送新状态，
+    直到租赁激活或失败、或连接超过 PAYMENT_EVENTS_TIMEOUT。
+    
+    查询参数 rental_id 或 payment_txid 指定跟踪的租赁；未指定时跟踪地址当前最相关的租赁，
+    之后的新付款（更新的待处理租赁）替代它。其他租赁（例如较早租赁的回收或失败）的事件不影响推送的状态。
+    
+    每个连接在推送期间占用一个工作线程，每个进程最多同时保持 PAYMENT_EVENTS_MAX_STREAMS 个连接，
+    超出时返回503，页面改为轮询 /api/check_payment。
+    """
+    if not _payment_streams.acquire(blocking=False):
+        return jsonify({'status': 'error', 'message': '推送连接已满，请改用轮询'}), 503
+    
+    rental_id = request.args.get('rental_id', type=int)
+    payment_txid = request.args.get('payment_txid')
+    pinned = rental_id is not None or bool(payment_txid)
+    
+    def load():
+        """查询跟踪的租赁，返回状态快照"""
+        query = EnergyRental.query.filter_by(rental_address=tron_address)
+        if rental_id is not None:
+            rental = query.filter_by(id=rental_id).first()
+        elif payment_txid:
+            rental = query.filter_by(payment_txid=payment_txid).first()
+        else:
+            rental = EnergyRental.resolve_latest(tron_address)
+        db.session.close()
+        return rental_snapshot(rental) if rental else None
+    
+    def generate():
+        with rental_notifier.subscribe(tron_address) as subscription:
+            deadline = time.monotonic() + settings.PAYMENT_EVENTS_TIMEOUT
+            
+            # 先订阅再查询，避免漏掉查询期间发生的变化
+            tracked = load()
+            status = _payment_status(tracked)
+            yield f"data: {json.dumps(status)}\n\n"
+            
+            while status['status'] not in ('success', 'failed'):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                
+                snapshot = subscription.get(timeout=min(remaining, settings.PAYMENT_EVENTS_RECHECK))
+                if snapshot is None:
+                    # 长时间没有通知时复查一次数据库（租赁可能由其他进程处理）
+                    snapshot = load()
+                
+                if _is_tracked(snapshot, tracked, pinned, payment_txid):
+                    tracked = snapshot
+                    new_status = _payment_status(snapshot)
+                    if new_status['status'] != status['status']:
+                        status = new_status
+                        yield f"data: {json.dumps(status)}\n\n"
+                        continue
+                
+                # 心跳，保持连接并及时发现客户端断开
+                yield ": keepalive\n\n"
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+    response.call_on_close(_payment_streams.release)
+    return response
+
+def _is_tracked(snapshot, tracked, pinned, payment_txid=None):
+    """状态快照是否属于推送连接跟踪的租赁
+    
+    tracked 为当前跟踪的租赁快照（尚无租赁时为None）。未指定租赁（pinned 为False）时，
+    更新的待处理租赁（新付款）替代当前跟踪的租赁。
+    """
+    if not snapshot or not snapshot.get('rental_id'):
+        return False
+    if tracked and snapshot['rental_id'] == tracked['rental_id']:
+        return True
+    if pinned:
+        # 按付款交易ID跟踪、租赁尚未创建时，等待该付款的租赁
+        return not tracked and bool(payment_txid) and snapshot.get('payment_txid') == payment_txid
+    if tracked and snapshot['rental_id'] < tracked['rental_id']:
+        return False
+    return snapshot['status'] in ('pending', 'active')
 
 @api.route('/energy_status/<tron_address>', methods=['GET'])
 def energy_status(tron_address):
@@ -245,6 +374,46 @@ def energy_status(tron_address):
             'energy': energy,
             'has_enough': energy >= settings.MIN_USER_ENERGY
         })
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500 
+
+@api.route('/energy_status', methods=['POST'])
+@login_required
+def energy_status_batch():
+    """批量获取地址能量状态，请求体为 {"addresses": [...]}，未指定时查询所有活跃租赁的地址
+    
+    每次最多发起 ENERGY_BATCH_MAX_ADDRESSES 个节点查询，仅供登录后的管理和状态页面使用。
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        addresses = data.get('addresses')
+        if addresses is None:
+            addresses = [
+                address for (address,) in
+                db.session.query(EnergyRental.rental_address).filter_by(status='active').distinct()
+            ]
+        if not isinstance(addresses, list) or len(addresses) > settings.ENERGY_BATCH_MAX_ADDRESSES:
+            return jsonify({
+                'status': 'error',
+                'message': f'addresses 必须是最多 {settings.ENERGY_BATCH_MAX_ADDRESSES} 个地址的列表'
+            }), 400
+        
+        energies = tron_client.get_accounts_energy(addresses)
+        
+        return jsonify({
+            'status': 'success',
+            'accounts': [
+                {
+                    'address': address,
+                    'energy': energy,
+                    'has_enough': energy is not None and energy >= settings.MIN_USER_ENERGY
+                }
+                for address, energy in zip(addresses, energies)
+            ]
+        })
     except Exception as e:
         return jsonify({
             'status': 'error',
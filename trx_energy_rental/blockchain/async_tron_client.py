@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from urllib.parse import urljoin
+
+import aiohttp
+from tronpy.defaults import conf_for_name
+from tronpy.keys import PrivateKey
+
+from .node_pool import BROADCAST_METHODS, NodeError, NodePool, _retry_after, metric_path, parse_endpoints
+from .rate_limiter import BROADCAST, current_priority, rate_limiter
+from .tron_client import available_energy, normalize_transaction
+from .trc20_decoder import is_trc20_transfer
+from ..config import settings
+from ..utils.metrics import TRON_REQUEST_SECONDS, TRON_REQUESTS
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+class AsyncTronClient:
+    """基于asyncio的TRON区块链客户端
+
+    与 TronClient 提供相同的方法（均为协程），所有请求复用同一个保持连接的HTTP会话，
+    并通过信号量限制同时进行的请求数量。与 TronClient 一样经过节点连接池选择节点、在节点
+    故障时重试读请求（广播只在连接未建立时换节点），并从进程共享的限流器取得令牌。
+    可以传入 TronClient 的 node_pool/grid_pool 共用节点统计，或通过 full_node_api/grid_api
+    （逗号分隔）指向本地的模拟节点。
+
+    用法::
+
+        async with AsyncTronClient() as client:
+            energy = await client.get_account_energy(address)
+    """
+
+    def __init__(self, full_node_api=None, grid_api=None, node_pool=None, grid_pool=None,
+                 limiter=rate_limiter,
+                 max_connections=settings.ASYNC_TRON_MAX_CONNECTIONS,
+                 max_concurrency=settings.ASYNC_TRON_MAX_CONCURRENCY,
+                 timeout=settings.TRON_REQUEST_TIMEOUT):
+        # 节点连接池，未配置节点地址时根据网络选择默认节点
+        if node_pool is None:
+            network = 'mainnet' if settings.TRON_NETWORK.lower() == 'mainnet' else 'nile'
+            full_nodes = (parse_endpoints(full_node_api or settings.TRON_FULL_NODE_API)
+                          or parse_endpoints(conf_for_name(network)['fullnode']))
+            node_pool = NodePool(full_nodes, timeout=timeout, limiter=limiter)
+        if grid_pool is None:
+            grid_nodes = parse_endpoints(grid_api or settings.TRON_GRID_API)
+            grid_pool = NodePool(grid_nodes, timeout=timeout, limiter=limiter) if grid_nodes else node_pool
+        self.node_pool = node_pool
+        self.grid_pool = grid_pool
+
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._session = None
+        self._semaphore = None
+
+        # 设置地址
+        self.owner_address = settings.OWNER_ADDRESS  # A地址
+        self.agent_address = settings.AGENT_ADDRESS  # B地址
+        self.monitor_address = settings.MONITOR_ADDRESS  # C地址
+
+        # 加载B地址私钥
+        if settings.AGENT_PRIVATE_KEY:
+            self.agent_priv_key = PrivateKey(bytes.fromhex(settings.AGENT_PRIVATE_KEY))
+        else:
+            self.agent_priv_key = None
+            logger.warning("代理地址私钥未配置，无法进行签名操作")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """关闭HTTP会话"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _get_session(self):
+        """获取（必要时创建）共享的HTTP会话，需在事件循环中调用"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'User-Agent': 'trx-energy-rental'}
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def _post(self, path, payload=None):
+        """向全节点发送POST请求"""
+        return await self._request(self.node_pool, 'POST', path, payload or {},
+                                   idempotent=path not in BROADCAST_METHODS)
+
+    async def _get(self, path, params=None):
+        """向TronGrid发送GET请求"""
+        return await self._request(self.grid_pool, 'GET', path, params or {})
+
+    async def _request(self, pool, method, path, params, idempotent=True):
+        """按连接池的节点排序发送请求，可重试的失败换下一个节点"""
+        last_error = None
+        for endpoint in pool.candidates():
+            try:
+                return await self._send(pool, endpoint, method, path, params)
+            except aiohttp.ClientConnectorError as e:
+                # 连接未建立，任何请求都可以换节点
+                last_error = e
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                if not idempotent:
+                    raise
+                last_error = e
+            logger.warning(f"节点 {endpoint.uri} 请求 {path} 失败，尝试其他节点: {str(last_error)}")
+        raise last_error
+
+    async def _send(self, pool, endpoint, method, path, params):
+        """向单个节点发送请求，统计写入连接池"""
+        limiter = pool.limiter
+        if limiter and limiter.enabled:
+            # 限流器在线程间共享，等待令牌时不阻塞事件循环
+            priority = BROADCAST if path in BROADCAST_METHODS else current_priority()
+            await asyncio.get_running_loop().run_in_executor(None, limiter.acquire, priority)
+
+        session = self._get_session()
+        url = urljoin(endpoint.uri, path)
+        label = metric_path(path)
+        started = time.monotonic()
+        result = 'error'
+        try:
+            async with self._semaphore:
+                if method == 'GET':
+                    request = session.get(url, params=params)
+                else:
+                    request = session.post(url, json=params)
+                async with request as resp:
+                    if resp.status == 429 or resp.status >= 500:
+                        # 限流或节点故障，降低请求速率后换节点重试
+                        result = 'throttled' if resp.status == 429 else 'error'
+                        if limiter:
+                            limiter.on_throttled(_retry_after(resp))
+                        resp.raise_for_status()
+                    if resp.status >= 400:
+                        # 请求本身有误，其他节点也会拒绝
+                        result = 'rejected'
+                        pool.record(endpoint, time.monotonic() - started)
+                        raise NodeError(f"节点 {endpoint.uri} 拒绝请求 {path}: HTTP {resp.status}")
+                    payload = await resp.json(content_type=None)
+                    result = 'ok'
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            pool.record(endpoint, failed=True)
+            raise
+        finally:
+            TRON_REQUESTS.labels(label, result).inc()
+            TRON_REQUEST_SECONDS.labels(label).observe(time.monotonic() - started)
+
+        pool.record(endpoint, time.monotonic() - started)
+        if limiter:
+            limiter.on_success()
+        return payload
+
+    async def get_account_info(self, address):
+        """获取账户信息"""
+        try:
+            return await self._post('wallet/getaccount', {'address': address, 'visible': True})
+        except Exception as e:
+            logger.error(f"获取账户 {address} 信息失败: {str(e)}")
+            return None
+
+    async def get_account_resource(self, address):
+        """获取账户资源信息"""
+        try:
+            return await self._post('wallet/getaccountresource', {'address': address, 'visible': True})
+        except Exception as e:
+            logger.error(f"获取账户 {address} 资源信息失败: {str(e)}")
+            return None
+
+    async def get_account_energy(self, address):
+        """获取账户可用能量"""
+        try:
+            account_resource = await self._post('wallet/getaccountresource',
+                                                {'address': address, 'visible': True})
+            return available_energy(account_resource)
+        except Exception as e:
+            logger.error(f"获取账户 {address} 能量信息失败: {str(e)}")
+            return 0
+
+    async def check_enough_energy(self, address, required_energy=settings.MIN_USER_ENERGY):
+        """检查账户是否有足够的能量"""
+        available_energy = await self.get_account_energy(address)
+        return available_energy >= required_energy
+
+    async def _sign_and_broadcast(self, transaction):
+        """用B地址私钥签名并广播节点构建的交易，成功返回交易ID"""
+        if 'txID' not in transaction:
+            logger.error(f"构建交易失败: {transaction}")
+            return None
+
+        signature = self.agent_priv_key.sign_msg_hash(bytes.fromhex(transaction['txID']))
+        transaction['signature'] = [signature.hex()]
+
+        result = await self._post('wallet/broadcasttransaction', transaction)
+        if result.get('result', False):
+            return transaction['txID']
+
+        logger.error(f"广播交易失败: {result}")
+        return None
+
+    async def delegate_resource(self, receiver_address, energy_amount=settings.RENTAL_ENERGY):
+        """代理资源给接收者地址"""
+        if not self.agent_priv_key:
+            logger.error("代理地址私钥未配置，无法进行签名操作")
+            return None
+
+        try:
+            # 与 TronClient 一致：B地址作为交易发起者
+            transaction = await self._post('wallet/freezebalance', {
+                'owner_address': self.agent_address,
+                'frozen_balance': energy_amount,
+                'frozen_duration': 3,
+                'resource': 'ENERGY',
+                'receiver_address': receiver_address,
+                'visible': True,
+            })
+
+            txid = await self._sign_and_broadcast(transaction)
+            if txid:
+                logger.info(f"成功代理 {energy_amount} 能量给 {receiver_address}")
+            return txid
+        except Exception as e:
+            logger.error(f"代理能量异常: {str(e)}")
+            return None
+
+    async def undelegate_resource(self, receiver_address):
+        """收回代理给接收者的资源"""
+        if not self.agent_priv_key:
+            logger.error("代理地址私钥未配置，无法进行签名操作")
+            return None
+
+        try:
+            transaction = await self._post('wallet/unfreezebalance', {
+                'owner_address': self.agent_address,
+                'resource': 'ENERGY',
+                'receiver_address': receiver_address,
+                'visible': True,
+            })
+
+            txid = await self._sign_and_broadcast(transaction)
+            if txid:
+                logger.info(f"成功回收代理给 {receiver_address} 的能量")
+            return txid
+        except Exception as e:
+            logger.error(f"回收代理能量异常: {str(e)}")
+            return None
+
+    async def get_transactions_page(self, address, min_timestamp=None, fingerprint=None,
+                                    limit=settings.PAYMENT_PAGE_SIZE, only_to=False):
+        """按区块时间正序分页获取地址的已确认交易，返回 (交易列表, 下一页fingerprint)
+
+        请求失败时抛出异常。
+        """
+        params = {
+            'only_confirmed': 'true',
+            'order_by': 'block_timestamp,asc',
+            'limit': limit,
+        }
+        if only_to:
+            params['only_to'] = 'true'
+        if min_timestamp:
+            params['min_timestamp'] = int(min_timestamp)
+        if fingerprint:
+            params['fingerprint'] = fingerprint
+
+        payload = await self._get(f'v1/accounts/{address}/transactions', params)
+
+        transactions = []
+        for raw_tx in payload.get('data', []):
+            tx = normalize_transaction(raw_tx)
+            if tx:
+                transactions.append(tx)
+
+        return transactions, payload.get('meta', {}).get('fingerprint')
+
+    async def get_transactions(self, address, only_trc20=False, limit=10):
+        """获取地址的交易历史（最新的在前）"""
+        try:
+            payload = await self._get(f'v1/accounts/{address}/transactions', {'limit': limit})
+            transactions = [tx for tx in map(normalize_transaction, payload.get('data', [])) if tx]
+
+            # 如果只需要TRC20交易：按调用数据的函数选择器识别 transfer/transferFrom
+            if only_trc20:
+                return [tx for tx in transactions if is_trc20_transfer(tx)]
+
+            return transactions
+        except Exception as e:
+            logger.error(f"获取地址 {address} 交易历史失败: {str(e)}")
+            return []
+
+    async def check_trc20_transfer(self, address, start_time):
+        """检查地址在起始时间后是否有TRC20转账交易"""
+        try:
+            transactions = await self.get_transactions(address, only_trc20=True, limit=20)
+
+            for tx in transactions:
+                # 判断交易是否在起始时间之后
+                tx_time = datetime.fromtimestamp(tx.get('timestamp', 0) / 1000)
+                if tx_time > start_time:
+                    return tx.get('txID')
+
+            return None
+        except Exception as e:
+            logger.error(f"检查地址 {address} TRC20转账交易失败: {str(e)}")
+            return None
@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from tronpy.keys import to_hex_address
+from .rate_limiter import WATCH, rate_limiter, request_priority
+from .trc20_decoder import TRC20_TRANSFER_SELECTORS
+from ..config import settings
+from ..utils.metrics import WATCHER_LAG
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+class BlockScanner:
+    """基于区块扫描的租赁使用检测
+
+    每个新区块只读取一次（每次请求最多 max_blocks 个区块），从中找出TRC20转账的
+    TriggerSmartContract 调用，按发起地址在内存中的活跃租赁地址表里查找。检测成本随出块速度
+    增长而不是随活跃租赁数量增长，检测延迟约为一个区块。
+
+    与 UsageWatcher 提供相同的 watch/unwatch 接口，检测到使用时回调 on_usage(rental_id, tx_id)。
+    启动时从最新区块开始扫描。
+    """
+
+    def __init__(self, tron_client, on_usage,
+                 poll_interval=settings.BLOCK_SCAN_INTERVAL,
+                 max_blocks=settings.BLOCK_SCAN_MAX_BLOCKS):
+        self.tron_client = tron_client
+        self.on_usage = on_usage
+        self.poll_interval = poll_interval
+        self.max_blocks = max_blocks
+
+        self._addresses = {}  # 十六进制地址 -> {rental_id: 开始监视的时间戳（毫秒）}
+        self._rentals = {}  # rental_id -> 十六进制地址
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.next_block = None  # 下一个要扫描的区块号
+        self.is_running = False
+
+    def start(self):
+        """启动扫描线程"""
+        if self.is_running:
+            return
+
+        self.is_running = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='block-scanner')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """停止扫描线程"""
+        self.is_running = False
+        self._stop_event.set()
+
+    def watch(self, rental_id, address, start_time, expiry_time=None):
+        """开始监视一个租赁，早于 start_time 的区块中的交易不计入；到期由到期调度器处理"""
+        try:
+            hex_address = to_hex_address(address)
+        except Exception as e:
+            logger.error(f"无效的租赁地址 {address}: {str(e)}")
+            return
+
+        start_ms = int(_to_timestamp(start_time) * 1000)
+        with self._lock:
+            self._remove(rental_id)
+            self._rentals[rental_id] = hex_address
+            self._addresses.setdefault(hex_address, {})[rental_id] = start_ms
+
+    def unwatch(self, rental_id):
+        """停止监视一个租赁"""
+        with self._lock:
+            self._remove(rental_id)
+
+    def _remove(self, rental_id):
+        """移除租赁（需持有锁）"""
+        hex_address = self._rentals.pop(rental_id, None)
+        if hex_address is None:
+            return
+        rentals = self._addresses.get(hex_address)
+        if rentals is not None:
+            rentals.pop(rental_id, None)
+            if not rentals:
+                del self._addresses[hex_address]
+
+    def is_watching(self, rental_id):
+        """检查租赁是否在监视中"""
+        return rental_id in self._rentals
+
+    def __len__(self):
+        return len(self._rentals)
+
+    def _run(self):
+        """扫描循环"""
+        while self.is_running:
+            try:
+                self.scan_once()
+                delay = self.poll_interval
+            except Exception as e:
+                logger.error(f"扫描区块时出错: {str(e)}")
+                delay = max(self.poll_interval, rate_limiter.retry_after())
+            self._stop_event.wait(delay)
+
+    def scan_once(self):
+        """扫描到最新区块，返回扫描的区块数量"""
+        with request_priority(WATCH):
+            head = self.tron_client.get_latest_block_number()
+            if self.next_block is None:
+                self.next_block = head
+
+            scanned = 0
+            while self.is_running and self.next_block <= head:
+                end = min(head + 1, self.next_block + self.max_blocks)
+                blocks = self.tron_client.get_blocks(self.next_block, end)
+                for block in blocks:
+                    self.scan_block(block)
+                    scanned += 1
+                # 节点返回的区块不完整时，下次从缺少的区块继续
+                next_block = _next_block_number(blocks, self.next_block)
+                if next_block == self.next_block:
+                    break
+                self.next_block = next_block
+            return scanned
+
+    def scan_block(self, block):
+        """从区块中找出活跃租赁地址发起的TRC20转账并回调"""
+        raw_header = block.get('block_header', {}).get('raw_data', {})
+        block_ts = raw_header.get('timestamp', 0)
+        WATCHER_LAG.set(max(0.0, time.time() - block_ts / 1000))
+
+        hits = []
+        with self._lock:
+            if not self._addresses:
+                return
+            for tx in block.get('transactions', []):
+                contracts = tx.get('raw_data', {}).get('contract') or [{}]
+                contract = contracts[0]
+                if contract.get('type') != 'TriggerSmartContract':
+                    continue
+                value = contract.get('parameter', {}).get('value', {})
+                rentals = self._addresses.get(value.get('owner_address'))
+                if not rentals or value.get('data', '')[:8] not in TRC20_TRANSFER_SELECTORS:
+                    continue
+                for rental_id, start_ms in list(rentals.items()):
+                    if block_ts >= start_ms:
+                        hits.append((rental_id, tx.get('txID')))
+                        self._remove(rental_id)
+
+        for rental_id, tx_id in hits:
+            logger.info(f"检测到租赁 {rental_id} 的地址进行了TRC20转账，交易ID: {tx_id}")
+            try:
+                self.on_usage(rental_id, tx_id)
+            except Exception as e:
+                logger.error(f"处理租赁 {rental_id} 的使用事件时出错: {str(e)}")
+
+
+def _next_block_number(blocks, start):
+    """从 start 开始连续返回的区块之后的区块号"""
+    expected = start
+    for block in blocks:
+        if block['block_header']['raw_data'].get('number', 0) != expected:
+            break
+        expected += 1
+    return expected
+
+
+def _to_timestamp(dt):
+    """将UTC datetime转换为时间戳（秒）"""
+    if isinstance(dt, (int, float)):
+        return float(dt)
+    return (dt - _EPOCH).total_seconds()
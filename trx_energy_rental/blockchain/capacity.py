@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+from ..config import settings
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+class CapacityTracker:
+    """能量池账户的容量跟踪
+
+    在内存中维护一个A地址可代理的能量：每隔 refresh_interval 秒从链上刷新一次，两次刷新之间
+    按本进程的代理（reserve）和回收/代理失败（release）在本地调整。准入检查只读内存，
+    不产生RPC。链上余量从未成功读取时不做限制，保持原有行为。
+    """
+
+    def __init__(self, refresh_interval=settings.CAPACITY_REFRESH_INTERVAL,
+                 reserve_energy=settings.CAPACITY_RESERVE_ENERGY):
+        self.refresh_interval = refresh_interval
+        self.reserve_energy = reserve_energy  # 保留不出租的能量
+
+        self._chain_energy = None  # 最近一次从链上读取的可代理能量
+        self._adjustment = 0  # 刷新后本地代理和回收的累计调整
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, loader):
+        """从链上刷新可代理能量，读取失败时保留原值"""
+        try:
+            energy = loader()
+        except Exception as e:
+            logger.error(f"刷新能量池容量失败: {str(e)}")
+            energy = None
+
+        with self._lock:
+            # 失败时也记录刷新时间，避免每次准入检查都重试RPC
+            self._refreshed_at = time.monotonic()
+            if energy is None:
+                return self._available()
+            self._chain_energy = energy
+            self._adjustment = 0
+            return self._available()
+
+    def _ensure_fresh(self, loader):
+        """超过刷新间隔时刷新"""
+        if time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            self.refresh(loader)
+
+    def _available(self):
+        """可出租的能量（需持有锁），未知时返回None"""
+        if self._chain_energy is None:
+            return None
+        return max(0, self._chain_energy + self._adjustment - self.reserve_energy)
+
+    def available(self, loader):
+        """可出租的能量，未知时返回None"""
+        self._ensure_fresh(loader)
+        with self._lock:
+            return self._available()
+
+    def has_capacity(self, energy_amount, loader):
+        """是否有足够的能量接受一笔租赁（不占用容量）"""
+        available = self.available(loader)
+        return available is None or available >= energy_amount
+
+    def reserve(self, energy_amount, loader):
+        """为即将进行的代理占用容量，余量不足时返回False"""
+        self._ensure_fresh(loader)
+        with self._lock:
+            available = self._available()
+            if available is not None and available < energy_amount:
+                return False
+            self._adjustment -= energy_amount
+            return True
+
+    def release(self, energy_amount):
+        """代理失败或能量已回收，归还容量"""
+        if not energy_amount:
+            return
+        with self._lock:
+            self._adjustment += energy_amount
+
+
+# 同一进程内的Web、机器人和监控服务按A地址共享容量跟踪器
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+def get_capacity_tracker(owner_address):
+    """获取A地址的容量跟踪器"""
+    with _trackers_lock:
+        tracker = _trackers.get(owner_address)
+        if tracker is None:
+            tracker = _trackers[owner_address] = CapacityTracker()
+        return tracker
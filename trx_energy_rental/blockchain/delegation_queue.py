@@ -0,0 +1,315 @@
+import logging
+import queue
+import threading
+import time
+from ..database.models import db, EnergyRental
+from ..database.session import SessionManager
+from ..utils.event_bus import event_bus, DELEGATED, FAILED
+from ..utils.metrics import DELEGATIONS
+from ..config import settings
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+class DelegationQueue:
+    """批量代理队列
+
+    收集待代理的租赁，凑满一批（或等待超时）后统一处理：整批只获取一次引用区块，
+    交给各租赁所属能量池账户的交易队列并行构建、签名并广播交易，最后在一次数据库提交中
+    写入整批的 delegate_txid 和状态。处理完成后以成功代理的租赁列表回调 on_complete。
+
+    队列中、代理中以及已广播但结果尚未写入的租赁，其处理租约每 renew_interval 秒续约一次，
+    取出处理前再续约一次，租约不会在处理期间过期而被 _admit_deferred_rentals 重新接纳。
+    取出时租约已被其他进程接管的租赁不再代理。
+    """
+
+    def __init__(self, tron_client, on_complete=None, db_session=None, sessions=None,
+                 batch_size=settings.DELEGATION_BATCH_SIZE,
+                 max_wait=settings.DELEGATION_BATCH_WAIT,
+                 renew_interval=settings.CLAIM_LEASE_SECONDS / 3):
+        self.tron_client = tron_client
+        self.on_complete = on_complete
+        self.db_session = db_session
+        self.sessions = sessions or SessionManager()
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.renew_interval = renew_interval
+
+        self._queue = queue.Queue()
+        self._holders = {}  # 队列中和处理中的租赁ID -> 处理租约持有者
+        self._unsaved = {}  # 已广播但未能写入数据库的租赁ID -> 代理交易ID
+        self._lock = threading.Lock()
+        self._renewed_at = time.monotonic()
+        self._thread = None
+        self.is_running = False
+
+    def start(self):
+        """启动批处理线程"""
+        if self.is_running:
+            return
+
+        self.is_running = True
+        self._thread = threading.Thread(target=self._run, name='delegation-queue')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """停止批处理线程，队列中尚未处理的租赁归还容量并释放租约"""
+        self.is_running = False
+        self._release_pending()
+        if self._unsaved:
+            logger.error(f"代理队列停止时仍有未写入数据库的代理交易: {self._unsaved}")
+
+    def submit(self, rental):
+        """提交一个待代理的租赁（提交前需已占用所选账户的容量并持有处理租约）"""
+        with self._lock:
+            self._holders[rental.id] = rental.claimed_by
+        self._queue.put((rental.id, rental.rental_address, rental.energy_amount, rental.owner_address))
+
+    def pending_count(self):
+        """队列中等待处理的租赁数量"""
+        return self._queue.qsize()
+
+    def _run(self):
+        """批处理循环"""
+        while self.is_running:
+            self._maintain()
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            if not self.is_running:
+                # 等待期间已停止，不再代理
+                self._release(batch)
+                break
+
+            try:
+                self.process_batch(batch)
+            except Exception as e:
+                logger.error(f"批量代理能量时出错: {str(e)}")
+
+    def _maintain(self):
+        """按间隔续约处理租约，并重新写入未保存的代理结果"""
+        try:
+            if time.monotonic() - self._renewed_at >= self.renew_interval:
+                with self._lock:
+                    rental_ids = list(self._holders)
+                self._renew(rental_ids)
+                self._renewed_at = time.monotonic()
+            if self._unsaved:
+                self._retry_unsaved()
+        except Exception as e:
+            logger.error(f"续约代理队列的处理租约时出错: {str(e)}")
+
+    def _renew(self, rental_ids):
+        """按持有者批量续约，返回仍由本进程持有租约的租赁ID"""
+        by_holder = {}
+        with self._lock:
+            for rental_id in rental_ids:
+                by_holder.setdefault(self._holders.get(rental_id), []).append(rental_id)
+
+        held = set()
+        with self.sessions.session_scope():
+            for holder, ids in by_holder.items():
+                if holder:
+                    held |= EnergyRental.renew_claims(ids, holder)
+        return held
+
+    def _untrack(self, rental_ids):
+        """处理结束，不再续约（结果尚未写入的除外）"""
+        with self._lock:
+            for rental_id in rental_ids:
+                if rental_id not in self._unsaved:
+                    self._holders.pop(rental_id, None)
+
+    def _retry_unsaved(self):
+        """重新写入已广播但未能保存的代理结果"""
+        with self._lock:
+            results = dict(self._unsaved)
+        with self.sessions.session_scope():
+            delegated = self._save_each(results)
+            if self.on_complete and delegated:
+                self.on_complete(delegated)
+
+    def _collect_batch(self):
+        """等待第一个任务，然后在 max_wait 内尽量凑满一批"""
+        try:
+            first = self._queue.get(timeout=1)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _release_pending(self):
+        """取出队列中全部未处理的租赁并归还"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._release(batch)
+
+    def _release(self, batch):
+        """归还未代理租赁占用的账户容量并释放其处理租约，由 _admit_deferred_rentals 重新接纳"""
+        for _, _, energy_amount, owner_address in batch:
+            self.tron_client.release_pool_energy(energy_amount, owner_address)
+        with self._lock:
+            holders = {self._holders.get(item[0]) for item in batch} - {None}
+        self._untrack([item[0] for item in batch])
+
+        try:
+            with self.sessions.session_scope():
+                # 只释放本进程持有的租约，已被其他进程接管的不受影响
+                EnergyRental.query.filter(
+                    EnergyRental.id.in_([item[0] for item in batch]),
+                    EnergyRental.status == 'pending',
+                    EnergyRental.delegate_txid.is_(None),
+                    EnergyRental.claimed_by.in_(holders)
+                ).update({
+                    EnergyRental.claimed_by: None,
+                    EnergyRental.claim_expires_at: None
+                }, synchronize_session=False)
+            logger.info(f"归还 {len(batch)} 笔未代理的租赁")
+        except Exception as e:
+            logger.error(f"释放未处理租赁的租约时出错: {str(e)}")
+
+    def process_batch(self, batch):
+        """处理一批代理请求，batch 为 (rental_id, 地址, 能量数量, A地址) 列表"""
+        try:
+            return self._process(batch)
+        finally:
+            self._untrack([item[0] for item in batch])
+
+    def _process(self, batch):
+        """续约后代理并写入结果"""
+        # 广播前续约；租约已被其他进程接管的租赁由接管者代理，归还本进程占用的容量
+        try:
+            held = self._renew([item[0] for item in batch])
+        except Exception as e:
+            logger.error(f"续约处理租约失败，本批租赁不再代理: {str(e)}")
+            self._release(batch)
+            return []
+        for item in batch:
+            if item[0] not in held:
+                logger.warning(f"租赁 {item[0]} 的处理租约已被接管，不再代理")
+                self.tron_client.release_pool_energy(item[2], item[3])
+        batch = [item for item in batch if item[0] in held]
+        if not batch:
+            return []
+
+        # 整批共用一个引用区块，获取失败时由每笔交易各自获取
+        try:
+            ref_block_id = self.tron_client.get_ref_block_id()
+        except Exception as e:
+            logger.error(f"获取引用区块失败: {str(e)}")
+            ref_block_id = None
+
+        def delegate(item):
+            _, address, energy_amount, owner_address = item
+            txid = self.tron_client.delegate_resource(
+                address, energy_amount, ref_block_id=ref_block_id, owner_address=owner_address
+            )
+            if not txid:
+                # 代理失败，归还提交前占用的账户容量
+                self.tron_client.release_pool_energy(energy_amount, owner_address)
+            return txid
+
+        # 按账户分到各自的交易队列，不同账户并行签名和广播
+        futures = [self.tron_client.submit(item[3], delegate, item) for item in batch]
+        # 逐个取结果，一笔出错不影响同批其他已广播的交易
+        txids = []
+        for item, future in zip(batch, futures):
+            try:
+                txids.append(future.result())
+            except Exception as e:
+                logger.error(f"代理租赁 {item[0]} 时出错: {str(e)}")
+                self.tron_client.release_pool_energy(item[2], item[3])
+                txids.append(None)
+
+        # 结果写入和回调在批处理线程自己的会话中完成
+        with self.sessions.session_scope():
+            delegated = self._save_results(batch, txids)
+            logger.info(f"批量代理完成，共 {len(batch)} 笔，成功 {len(delegated)} 笔")
+
+            if self.on_complete and delegated:
+                self.on_complete(delegated)
+        return delegated
+
+    def _save_results(self, batch, txids):
+        """一次提交写入整批的代理结果，返回代理成功的租赁"""
+        if not self.db_session:
+            logger.error("数据库会话未初始化")
+            return []
+
+        results = {rental_id: txid for (rental_id, _, _, _), txid in zip(batch, txids)}
+        try:
+            rentals = EnergyRental.query.filter(EnergyRental.id.in_(list(results))).all()
+
+            delegated = []
+            for rental in rentals:
+                txid = results.get(rental.id)
+                if txid:
+                    rental.delegate_txid = txid
+                    rental.status = 'active'
+                    delegated.append(rental)
+                else:
+                    rental.status = 'failed'
+                    logger.error(f"代理能量失败，租赁ID: {rental.id}")
+                rental.release_claim()
+
+            db.session.commit()
+            DELEGATIONS.labels('success').inc(len(delegated))
+            DELEGATIONS.labels('failed').inc(len(rentals) - len(delegated))
+            for rental in rentals:
+                event_bus.publish(DELEGATED if rental.status == 'active' else FAILED, rental)
+            return delegated
+        except Exception as e:
+            logger.error(f"保存批量代理结果时出错，逐个写入已广播的交易: {str(e)}")
+            self.db_session.rollback()
+            return self._save_each(results)
+
+    def _save_each(self, results):
+        """逐个提交已广播的代理交易，整批提交失败时使用
+
+        代理失败的租赁不在此标记，处理租约过期后重新接纳。写入失败的交易ID记入错误日志，
+        并在批处理循环中继续续约和重试，写入前不会被重新接纳。
+        """
+        delegated = []
+        for rental_id, txid in results.items():
+            if not txid:
+                continue
+            try:
+                rental = EnergyRental.query.get(rental_id)
+                rental.delegate_txid = txid
+                rental.status = 'active'
+                rental.release_claim()
+                db.session.commit()
+            except Exception as e:
+                self.db_session.rollback()
+                logger.error(f"租赁 {rental_id} 的代理交易 {txid} 已广播，但写入数据库失败: {str(e)}")
+                with self._lock:
+                    self._unsaved[rental_id] = txid
+                continue
+
+            with self._lock:
+                self._unsaved.pop(rental_id, None)
+                self._holders.pop(rental_id, None)
+            delegated.append(rental)
+            DELEGATIONS.labels('success').inc()
+            event_bus.publish(DELEGATED, rental)
+        return delegated
@@ -2,9 +2,21 @@ import logging
 import threading
 import time
 import schedule
+import uuid
 from datetime import datetime, timedelta
 from .tron_client import TronClient
-from ..database.models import db, EnergyRental
+from .payment_ingestor import PaymentIngestor
+from .usage_watcher import UsageWatcher
+from .block_scanner import BlockScanner
+from .delegation_queue import DelegationQueue
+from .sharding import ShardAssignment, Lease
+from .expiry_recovery import ExpiryRecovery
+from .expiry_scheduler import ExpiryScheduler
+from .rate_limiter import PAYMENT, request_priority
+from ..database.models import db, EnergyRental, SystemStatus
+from ..database.session import SessionManager
+from ..utils.event_bus import event_bus, PAYMENT_SEEN, DELEGATED, USAGE_DETECTED, RECOVERED, FAILED
+from ..utils import metrics
 from ..config import settings
 
 # 配置日志
@@ -20,7 +32,32 @@ class EnergyRentalService:
     def __init__(self, db_session=None):
         self.tron_client = TronClient()
         self.db_session = db_session
-        self.monitoring_tasks = {}  # 用于存储监控任务
+        # 后台线程各自使用独立的短生命周期会话
+        self.sessions = SessionManager()
+        self.event_bus = event_bus
+        self.payment_ingestor = PaymentIngestor(self.tron_client, self._handle_payment, db_session)
+        # 到期回收由到期调度器负责，监视器只检测使用
+        # 使用检测：扫描新区块（每个区块读取一次），或逐个地址轮询交易历史
+        usage_detector = BlockScanner if settings.USAGE_BLOCK_SCANNER else UsageWatcher
+        self.usage_watcher = usage_detector(
+            self.tron_client,
+            on_usage=self.sessions.scoped(self._on_usage_detected)
+        )
+        self.delegation_queue = DelegationQueue(
+            self.tron_client,
+            on_complete=self._on_batch_delegated,
+            db_session=db_session,
+            sessions=self.sessions
+        )
+        # 分片：只监视和回收属于本进程的租赁；付款摄取由持有租约的进程执行
+        self.shard = ShardAssignment()
+        self.ingestion_lease = Lease('payment_ingestion')
+        self.expiry_recovery = ExpiryRecovery(
+            self.tron_client,
+            shard=self.shard,
+            on_recovered=self._on_rental_recovered
+        )
+        self.expiry_scheduler = ExpiryScheduler(on_due=self._on_rentals_due)
         self.scheduler_thread = None
         self.is_running = False
     
@@ -32,6 +69,23 @@ class EnergyRentalService:
         
         self.is_running = True
         
+        # 启动节点健康检查、签名流水线、租赁使用监视器和批量代理队列
+        self.tron_client.start_health_checks()
+        self.tron_client.start_signing_pipeline()
+        self.usage_watcher.start()
+        self.delegation_queue.start()
+        self.expiry_scheduler.start()
+        
+        # 队列长度等指标在读取时取值
+        metrics.DELEGATION_QUEUE_DEPTH.set_function(self.delegation_queue.pending_count)
+        metrics.WATCHED_RENTALS.set_function(lambda: len(self.usage_watcher))
+        metrics.SCHEDULED_EXPIRIES.set_function(lambda: len(self.expiry_scheduler))
+        metrics.RATE_LIMITER_QUEUED.set_function(lambda: self.tron_client.rate_limiter.stats()['queued'])
+        
+        # 由其他进程（或机器人的手动代理）代理的租赁通过事件交给所属分片监视和调度到期
+        self.event_bus.subscribe(DELEGATED, self._on_rental_delegated)
+        self._resume_active_rentals()
+        
         # 启动监控C地址的进程
         monitor_thread = threading.Thread(target=self._monitor_payments)
         monitor_thread.daemon = True
@@ -42,17 +96,26 @@ class EnergyRentalService:
         self.scheduler_thread.daemon = True
         self.scheduler_thread.start()
         
-        logger.info("能量租赁监控服务已启动")
+        logger.info(f"能量租赁监控服务已启动，分片 {self.shard.index + 1}/{self.shard.count}")
     
     def stop_monitoring(self):
         """停止监控服务"""
         self.is_running = False
+        self.event_bus.unsubscribe(DELEGATED, self._on_rental_delegated)
+        self.ingestion_lease.release()
+        self.usage_watcher.stop()
+        self.delegation_queue.stop()
+        self.expiry_scheduler.stop()
+        self.tron_client.stop_signing_pipeline()
+        self.tron_client.stop_health_checks()
         logger.info("能量租赁监控服务已停止")
     
     def _run_scheduler(self):
         """运行调度任务"""
-        # 每分钟检查一次过期的租赁
-        schedule.every(1).minutes.do(self._check_expired_rentals)
+        # 到期回收由到期调度器准时触发，全表扫描只作为兜底
+        schedule.every(settings.EXPIRY_SWEEP_MINUTES).minutes.do(self._check_expired_rentals)
+        # 定期刷新能量池容量，接纳等待容量的租赁并更新系统状态
+        schedule.every(max(1, int(settings.CAPACITY_REFRESH_INTERVAL))).seconds.do(self._refresh_capacity)
         
         while self.is_running:
             schedule.run_pending()
@@ -65,114 +128,187 @@ class EnergyRentalService:
             return
             
         try:
-            # 查询所有状态为active但已过期的租赁
-            now = datetime.utcnow()
-            expired_rentals = EnergyRental.query.filter(
-                EnergyRental.status == 'active',
-                EnergyRental.expiry_time <= now
-            ).all()
-            
-            for rental in expired_rentals:
-                logger.info(f"处理过期租赁 ID: {rental.id}, 地址: {rental.rental_address}")
-                self._recover_energy(rental)
-                
+            # 分块流式读取，并发回收，每块一次批量更新
+            with self.sessions.session_scope():
+                self.expiry_recovery.run()
         except Exception as e:
             logger.error(f"检查过期租赁失败: {str(e)}")
     
+    def _refresh_capacity(self):
+        """刷新能量池容量；付款摄取进程同时接纳等待容量的租赁并更新系统状态"""
+        try:
+            available = self.tron_client.refresh_pool_capacity()
+            if available is not None:
+                metrics.POOL_ENERGY_AVAILABLE.set(available)
+            if not self.ingestion_lease.is_held:
+                return
+            
+            with self.sessions.session_scope():
+                self._admit_deferred_rentals()
+                self._update_system_status(available)
+        except Exception as e:
+            logger.error(f"刷新能量池容量失败: {str(e)}")
+    
+    def _update_system_status(self, available):
+        """写入能量池余量和活跃租赁数"""
+        system_status = SystemStatus.query.first()
+        if not system_status:
+            system_status = SystemStatus(
+                total_energy_available=0,
+                total_energy_used=0,
+                active_rentals=0,
+                total_revenue=0,
+                is_active=True
+            )
+            db.session.add(system_status)
+        
+        if available is not None:
+            system_status.total_energy_available = available
+        # 走 (status, expiry_time) 索引的计数查询
+        system_status.active_rentals = db.session.query(db.func.count(EnergyRental.id)).filter(
+            EnergyRental.status == 'active'
+        ).scalar()
+        db.session.commit()
+        metrics.ACTIVE_RENTALS.set(system_status.active_rentals)
+    
     def _monitor_payments(self):
         """监控C地址收到的付款"""
         while self.is_running:
             try:
-                # 获取监听地址的交易历史
-                transactions = self.tron_client.get_transactions(
-                    self.tron_client.monitor_address,
-                    limit=10
-                )
+                # 每轮轮询使用一个新会话，不在等待期间持有连接和ORM对象
+                with self.sessions.session_scope():
+                    # 只有持有付款摄取租约的进程读取付款，租约在每轮轮询时续期
+                    if self.ingestion_lease.acquire():
+                        # 从游标处向前读取所有新交易，逐笔交给付款处理
+                        self.payment_ingestor.poll_once()
                 
-                for tx in transactions:
-                    # 检查是否是向监听地址转账的交易
-                    if (tx.get('to') == self.tron_client.monitor_address and 
-                        float(tx.get('amount', 0)) / 1e6 >= settings.RENTAL_PRICE):
-                        
-                        # 获取支付者地址
-                        sender_address = tx.get('from')
-                        tx_id = tx.get('txID')
-                        
-                        # 验证交易是否在近期发生（防止处理旧交易）
-                        tx_time = datetime.fromtimestamp(tx.get('timestamp', 0) / 1000)
-                        if datetime.now() - tx_time > timedelta(minutes=5):
-                            continue
-                            
-                        # 检查是否已处理过该交易
-                        if self._is_transaction_processed(tx_id):
-                            continue
-                        
-                        # 处理新付款
-                        self._process_new_payment(sender_address, tx_id)
-                
-                # 每3秒检查一次
-                time.sleep(3)
+                # 等待下一个区块
+                time.sleep(settings.PAYMENT_POLL_INTERVAL)
                 
             except Exception as e:
                 logger.error(f"监控付款时出错: {str(e)}")
-                time.sleep(5)  # 出错后等待较长时间
+                # 出错后等待较长时间，节点限流时等到暂停结束
+                time.sleep(max(5, self.tron_client.rate_limiter.retry_after()))
     
-    def _is_transaction_processed(self, tx_id):
-        """检查交易是否已被处理"""
-        if not self.db_session:
-            return False
-            
-        try:
-            rental = EnergyRental.query.filter_by(payment_txid=tx_id).first()
-            return rental is not None
-        except Exception as e:
-            logger.error(f"检查交易处理状态时出错: {str(e)}")
-            return False
+    def _handle_payment(self, sender_address, tx_id):
+        """处理摄取到的付款交易，重复的付款在认领时被拒绝"""
+        metrics.PAYMENTS_SEEN.inc()
+        # 付款处理中的能量查询和准入检查优先于使用监视和用户查询
+        with request_priority(PAYMENT):
+            return self._process_new_payment(sender_address, tx_id)
     
     def _process_new_payment(self, sender_address, tx_id):
-        """处理新支付，为用户代理能量"""
+        """处理新支付，为用户代理能量
+        
+        付款已处理（已创建租赁、已被认领或用户能量充足）时返回True；认领付款前出错时返回False，
+        付款摄取停在该付款之前，下次轮询重试。认领之后出错的租赁在处理租约过期后由
+        _admit_deferred_rentals 重新接纳。
+        """
         try:
             logger.info(f"收到来自 {sender_address} 的新支付，交易ID: {tx_id}")
             
             # 检查用户是否已有足够能量
             if self.tron_client.check_enough_energy(sender_address):
                 logger.info(f"用户 {sender_address} 已有足够能量，不提供租赁服务")
-                return
-                
+                return True
+            
             # 创建租赁记录
             rental = self._create_rental_record(sender_address, tx_id)
+        except Exception as e:
+            logger.error(f"处理新支付 {tx_id} 时出错，下次轮询重试: {str(e)}")
+            return False
+        
+        if not rental:
+            return True
+        
+        owner = None
+        try:
+            # 选择可出租能量最多的账户；能量池余量不足时不广播必然失败的代理，租赁等待容量
+            owner = self.tron_client.reserve_pool_energy(rental.energy_amount)
+            if not owner:
+                self._defer_rental(rental)
+                return True
             
-            # 代理能量给用户
-            success = self._delegate_energy(rental)
-            
-            if success:
-                # 启动监控用户TRC20转账的任务
-                self._start_monitoring_user_tx(rental)
+            rental.owner_address = owner.owner_address
+            db.session.commit()
         except Exception as e:
-            logger.error(f"处理新支付时出错: {str(e)}")
+            logger.error(f"处理租赁 {rental.id} 时出错，处理租约过期后重新接纳: {str(e)}")
+            db.session.rollback()
+            if owner:
+                owner.capacity.release(rental.energy_amount)
+            return True
+        
+        try:
+            self._dispatch_rental(rental)
+        except Exception as e:
+            logger.error(f"代理租赁 {rental.id} 时出错: {str(e)}")
+        return True
+    
+    def _dispatch_rental(self, rental):
+        """代理已占用容量的租赁"""
+        if self.delegation_queue.is_running:
+            # 加入批量代理队列，代理成功后开始监控
+            self.delegation_queue.submit(rental)
+        elif self._delegate_energy(rental):
+            # 启动监控用户TRC20转账的任务
+            self._start_monitoring_user_tx(rental)
+    
+    def _defer_rental(self, rental):
+        """能量池余量不足，释放处理租约，租赁保持待处理状态等待容量"""
+        rental.release_claim()
+        db.session.commit()
+        logger.warning(f"能量池余量不足，租赁 {rental.id} 等待容量后再代理")
+    
+    def _admit_deferred_rentals(self):
+        """按付款顺序接纳等待容量的租赁，等待超时的标记为失败
+        
+        处理租约已过期的待处理租赁（处理进程在代理前中断）同样在此重新接纳，
+        其付款已被摄取游标越过，不会再经 claim_payment 接管。
+        """
+        deferred = EnergyRental.query.filter(
+            EnergyRental.status == 'pending',
+            EnergyRental.delegate_txid.is_(None),
+            EnergyRental.claim_available()
+        ).order_by(EnergyRental.created_at).limit(settings.DELEGATION_BATCH_SIZE).all()
+        
+        cutoff = datetime.utcnow() - timedelta(minutes=settings.CAPACITY_QUEUE_MINUTES)
+        for rental in deferred:
+            if rental.created_at < cutoff:
+                rental.status = 'failed'
+                db.session.commit()
+                self.event_bus.publish(FAILED, rental)
+                logger.error(f"租赁 {rental.id} 等待能量池容量超时，标记为失败")
+                continue
+            
+            owner = self.tron_client.reserve_pool_energy(rental.energy_amount)
+            if not owner:
+                break
+            if not rental.claim(self.ingestion_lease.holder):
+                owner.capacity.release(rental.energy_amount)
+                continue
+            
+            # 租赁时长从实际代理时开始计算
+            db.session.refresh(rental)
+            rental.owner_address = owner.owner_address
+            rental.expiry_time = datetime.utcnow() + timedelta(minutes=settings.RENTAL_TIME)
+            db.session.commit()
+            logger.info(f"能量池容量已恢复，开始代理租赁 {rental.id}")
+            self._dispatch_rental(rental)
     
     def _create_rental_record(self, address, tx_id):
-        """创建租赁记录"""
+        """认领付款并创建租赁记录，付款已被其他线程或进程认领时返回None，数据库出错时抛出异常"""
         if not self.db_session:
             logger.error("数据库会话未初始化")
             return None
             
         try:
-            # 计算到期时间
-            expiry_time = datetime.utcnow() + timedelta(minutes=settings.RENTAL_TIME)
-            
-            # 创建新的租赁记录
-            rental = EnergyRental(
-                rental_address=address,
-                energy_amount=settings.RENTAL_ENERGY,
-                payment_txid=tx_id,
-                status='pending',
-                expiry_time=expiry_time
-            )
+            rental = EnergyRental.claim_payment(tx_id, address, self.ingestion_lease.holder)
+            if not rental:
+                logger.info(f"付款 {tx_id} 已被处理，跳过")
+                return None
             
-            # 保存到数据库
-            db.session.add(rental)
-            db.session.commit()
+            self.event_bus.publish(PAYMENT_SEEN, rental)
+            metrics.PAYMENTS_CLAIMED.inc()
             
             logger.info(f"已创建租赁记录，ID: {rental.id}, 地址: {address}")
             return rental
@@ -181,7 +317,7 @@ class EnergyRentalService:
             logger.error(f"创建租赁记录时出错: {str(e)}")
             if self.db_session:
                 self.db_session.rollback()
-            return None
+            raise
     
     def _delegate_energy(self, rental):
         """代理能量给用户"""
@@ -192,109 +328,163 @@ class EnergyRentalService:
             # 代理能量
             txid = self.tron_client.delegate_resource(
                 rental.rental_address,
-                rental.energy_amount
+                rental.energy_amount,
+                owner_address=rental.owner_address
             )
             
             if txid:
                 # 更新租赁记录
                 rental.delegate_txid = txid
                 rental.status = 'active'
+                rental.release_claim()
                 db.session.commit()
+                self.event_bus.publish(DELEGATED, rental)
+                metrics.DELEGATIONS.labels('success').inc()
                 
                 logger.info(f"成功代理能量，租赁ID: {rental.id}, 交易ID: {txid}")
                 return True
             else:
                 # 代理失败
                 rental.status = 'failed'
+                rental.release_claim()
                 db.session.commit()
+                self.tron_client.release_pool_energy(rental.energy_amount, rental.owner_address)
+                self.event_bus.publish(FAILED, rental)
+                metrics.DELEGATIONS.labels('failed').inc()
                 
                 logger.error(f"代理能量失败，租赁ID: {rental.id}")
                 return False
                 
         except Exception as e:
+            metrics.DELEGATIONS.labels('error').inc()
             logger.error(f"代理能量时出错: {str(e)}")
+            self.tron_client.release_pool_energy(rental.energy_amount, rental.owner_address)
             if self.db_session:
                 self.db_session.rollback()
             return False
     
+    def _on_batch_delegated(self, rentals):
+        """批量代理完成后，为代理成功的租赁启动监控"""
+        for rental in rentals:
+            self._start_monitoring_user_tx(rental)
+    
     def _start_monitoring_user_tx(self, rental):
         """开始监控用户交易，若用户进行了TRC20转账，则回收能量"""
         if not rental or rental.status != 'active':
             return
+        
+        # 其他分片的租赁由所属进程收到代理事件后监视
+        if not self.shard.owns(rental.rental_address):
+            return
             
-        # 创建监控任务
-        task = threading.Thread(
-            target=self._monitor_user_transactions,
-            args=(rental,)
+        # 加入共享的使用监视器，由其统一调度检查
+        self.usage_watcher.watch(
+            rental.id,
+            rental.rental_address,
+            datetime.utcnow(),
+            rental.expiry_time
         )
-        task.daemon = True
-        task.start()
-        
-        # 记录任务
-        self.monitoring_tasks[rental.id] = task
+        self.expiry_scheduler.schedule(rental.id, rental.expiry_time)
         
         logger.info(f"已开始监控用户 {rental.rental_address} 的交易")
     
-    def _monitor_user_transactions(self, rental):
-        """监控用户交易"""
-        # 记录开始监控的时间
-        start_time = datetime.utcnow()
+    def _on_rental_delegated(self, event):
+        """收到代理成功事件，监视属于本分片且尚未监视的租赁并安排到期回收"""
+        rental_id = event.get('rental_id')
+        if not rental_id or not self.shard.owns(event.get('rental_address', '')):
+            return
+        if self.usage_watcher.is_watching(rental_id):
+            return
         
-        # 设置过期时间
-        timeout_time = start_time + timedelta(minutes=settings.RENTAL_TIME)
+        expiry_time = datetime.fromisoformat(event['expiry_time'])
+        self.usage_watcher.watch(rental_id, event['rental_address'], datetime.utcnow(), expiry_time)
+        self.expiry_scheduler.schedule(rental_id, expiry_time)
+    
+    def _resume_active_rentals(self):
+        """启动时为本分片的活跃租赁安排到期回收，分片模式下同时恢复使用监视"""
+        try:
+            with self.sessions.session_scope():
+                active_rentals = db.session.query(
+                    EnergyRental.id, EnergyRental.rental_address, EnergyRental.expiry_time
+                ).filter(EnergyRental.status == 'active').all()
+            
+            now = datetime.utcnow()
+            resumed = 0
+            for rental_id, address, expiry_time in active_rentals:
+                if not self.shard.owns(address):
+                    continue
+                # 已过期的租赁会被立即回收
+                self.expiry_scheduler.schedule(rental_id, expiry_time)
+                if self.shard.is_sharded and expiry_time > now:
+                    self.usage_watcher.watch(rental_id, address, now, expiry_time)
+                resumed += 1
+            
+            logger.info(f"已恢复 {resumed} 个活跃租赁的到期调度")
+        except Exception as e:
+            logger.error(f"恢复活跃租赁失败: {str(e)}")
+    
+    def _on_usage_detected(self, rental_id, tx_id):
+        """监视器检测到用户TRC20转账"""
+        rental = EnergyRental.query.get(rental_id)
+        if not rental or rental.status != 'active':
+            return
         
-        while datetime.utcnow() < timeout_time and rental.status == 'active':
-            try:
-                # 检查用户是否进行了TRC20转账
-                tx_id = self.tron_client.check_trc20_transfer(rental.rental_address, start_time)
-                
-                if tx_id:
-                    logger.info(f"检测到用户 {rental.rental_address} 进行了TRC20转账，交易ID: {tx_id}")
-                    
-                    # 更新租赁记录
-                    rental.actual_usage_txid = tx_id
-                    db.session.commit()
-                    
-                    # 回收能量
-                    self._recover_energy(rental)
-                    break
-                    
-                # 每3秒检查一次
-                time.sleep(3)
-                
-            except Exception as e:
-                logger.error(f"监控用户交易时出错: {str(e)}")
-                time.sleep(5)
+        # 更新租赁记录
+        rental.actual_usage_txid = tx_id
+        db.session.commit()
+        self.event_bus.publish(USAGE_DETECTED, rental, usage_txid=tx_id)
         
-        # 如果监控结束但未触发回收，则检查是否需要回收能量
-        if rental.status == 'active':
-            logger.info(f"用户 {rental.rental_address} 的能量租赁已到期，回收能量")
-            self._recover_energy(rental)
+        # 回收能量
+        self._recover_energy(rental)
+    
+    def _on_rentals_due(self, rental_ids, due_before=None):
+        """到期调度器触发，只读取并回收到期的租赁，失败的稍后重试，尚未到期的按到期时间重新安排"""
+        with self.sessions.session_scope():
+            # 以这批的截止时间判断到期，批处理窗口内稍后到期的租赁一并回收
+            failed, not_due = self.expiry_recovery.recover_ids(rental_ids, now=due_before)
+        
+        retry_at = datetime.utcnow() + timedelta(seconds=settings.EXPIRY_RETRY_SECONDS)
+        for rental_id in failed:
+            self.expiry_scheduler.schedule(rental_id, retry_at)
+        for rental_id, expiry_time in not_due.items():
+            self.expiry_scheduler.schedule(rental_id, expiry_time)
+    
+    def _on_rental_recovered(self, rental_id):
+        """租赁已回收，停止监视并取消到期调度"""
+        self.usage_watcher.unwatch(rental_id)
+        self.expiry_scheduler.cancel(rental_id)
     
-    def _recover_energy(self, rental):
-        """回收代理给用户的能量"""
+    def _recover_energy(self, rental, reason='usage'):
+        """回收代理给用户的能量，reason 为指标中的回收原因（usage 或 manual）"""
         if not rental or rental.status != 'active':
             return
             
         try:
             # 回收能量
-            txid = self.tron_client.undelegate_resource(rental.rental_address)
+            txid = self.tron_client.undelegate_resource(
+                rental.rental_address,
+                energy_amount=rental.energy_amount,
+                owner_address=rental.owner_address
+            )
             
             if txid:
                 # 更新租赁记录
                 rental.recover_txid = txid
                 rental.status = 'completed'
                 db.session.commit()
+                self.event_bus.publish(RECOVERED, rental)
+                metrics.RECOVERIES.labels(reason, 'success').inc()
                 
                 logger.info(f"成功回收能量，租赁ID: {rental.id}, 交易ID: {txid}")
                 
-                # 移除监控任务
-                if rental.id in self.monitoring_tasks:
-                    del self.monitoring_tasks[rental.id]
+                # 停止监视
+                self._on_rental_recovered(rental.id)
             else:
+                metrics.RECOVERIES.labels(reason, 'failed').inc()
                 logger.error(f"回收能量失败，租赁ID: {rental.id}")
                 
         except Exception as e:
+            metrics.RECOVERIES.labels(reason, 'error').inc()
             logger.error(f"回收能量时出错: {str(e)}")
             if self.db_session:
                 self.db_session.rollback()
@@ -309,18 +499,28 @@ class EnergyRentalService:
             if self.tron_client.check_enough_energy(address):
                 logger.info(f"用户 {address} 已有足够能量，不提供租赁服务")
                 return False, "用户已有足够能量"
-                
-            # 创建租赁记录（手动模式，无支付交易ID）
-            rental = EnergyRental(
-                rental_address=address,
-                energy_amount=energy_amount,
-                payment_txid="manual_operation",
-                status='pending',
-                expiry_time=datetime.utcnow() + timedelta(minutes=settings.RENTAL_TIME)
-            )
             
-            db.session.add(rental)
-            db.session.commit()
+            # 选择可出租能量最多的账户并占用其容量，代理失败时归还
+            owner = self.tron_client.reserve_pool_energy(energy_amount)
+            if not owner:
+                return False, "能量池余量不足，请稍后再试"
+                
+            # 创建租赁记录（手动模式，无支付交易ID，生成唯一的占位ID），失败时归还占用的容量
+            try:
+                rental = EnergyRental.claim_payment(
+                    f"manual_{uuid.uuid4().hex}",
+                    address,
+                    self.ingestion_lease.holder,
+                    energy_amount=energy_amount,
+                    owner_address=owner.owner_address
+                )
+            except Exception:
+                owner.capacity.release(energy_amount)
+                raise
+            if not rental:
+                owner.capacity.release(energy_amount)
+                return False, "创建租赁记录失败"
+            self.event_bus.publish(PAYMENT_SEEN, rental)
             
             # 代理能量
             success = self._delegate_energy(rental)
@@ -351,7 +551,7 @@ class EnergyRentalService:
                 return False, f"未找到地址 {address} 的活跃租赁"
                 
             # 回收能量
-            self._recover_energy(rental)
+            self._recover_energy(rental, reason='manual')
             return True, f"已回收代理给 {address} 的能量"
             
         except Exception as e:
@@ -374,10 +574,13 @@ def monitor_main():
     from ..app import create_app
     from ..database.models import db
     
-    app = create_app()
+    app = create_app(role='monitor')
     
     print("启动能量监控服务...")
     
+    # 独立的指标导出服务
+    metrics.start_exporter(settings.MONITOR_METRICS_PORT, settings.METRICS_HOST, settings.METRICS_TOKEN)
+    
     # 在应用上下文中运行能量服务
     with app.app_context():
         service = EnergyRentalService(db.session)
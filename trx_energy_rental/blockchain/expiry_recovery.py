@@ -0,0 +1,202 @@
+import logging
+import time
+from datetime import datetime
+
+import sqlalchemy as sa
+
+from ..database.models import db, EnergyRental
+from ..utils.event_bus import event_bus, RECOVERED
+from ..utils.metrics import EXPIRY_LAG, RECOVERIES
+from ..config import settings
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def expired_rentals_query(now):
+    """截至 now 已过期的活跃租赁，走 (status, expiry_time) 索引"""
+    table = EnergyRental.__table__
+    return (
+        sa.select(table.c.id, table.c.rental_address, table.c.owner_address, table.c.energy_amount,
+                  table.c.expiry_time)
+        .where(table.c.status == 'active', table.c.expiry_time <= now)
+        .order_by(table.c.id)
+    )
+
+
+class ExpiryRecovery:
+    """批量回收过期租赁
+
+    通过服务器端游标分块读取已过期的活跃租赁，每块共用一个引用区块，在租赁所属能量池账户的
+    交易队列中并行广播回收交易，
+    再用一条 UPDATE ... WHERE id IN (...) 写入整块的回收结果。每块结束后记录进度，
+    最近一次运行的统计保存在 stats 中。recover_ids 只回收指定的到期租赁，供到期调度器使用。
+    """
+
+    def __init__(self, tron_client, shard=None, on_recovered=None, engine=None,
+                 chunk_size=settings.EXPIRY_CHUNK_SIZE):
+        self.tron_client = tron_client
+        self.shard = shard
+        self.on_recovered = on_recovered  # on_recovered(rental_id)，例如停止监视
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.stats = {}
+
+    def _get_engine(self):
+        """获取数据库引擎（首次调用需在Flask应用上下文中）"""
+        if self.engine is None:
+            self.engine = db.engine
+        return self.engine
+
+    def run(self, now=None):
+        """回收截至 now 已过期的全部活跃租赁，返回本次运行的统计"""
+        now = now or datetime.utcnow()
+        stats = {
+            'started_at': now.isoformat(),
+            'scanned': 0,
+            'recovered': 0,
+            'failed': 0,
+            'chunks': 0,
+            'duration': 0.0,
+        }
+        started = time.monotonic()
+
+        query = expired_rentals_query(now)
+
+        # 读取使用单独的流式连接，写入在各自的事务中完成
+        with self._get_engine().connect() as conn:
+            for rows in self._iter_chunks(conn, query):
+                stats['scanned'] += len(rows)
+                if self.shard:
+                    rows = [row for row in rows if self.shard.owns(row.rental_address)]
+                if rows:
+                    recovered, failed = self._recover_chunk(rows)
+                    stats['recovered'] += len(recovered)
+                    stats['failed'] += len(failed)
+                stats['chunks'] += 1
+
+                elapsed = time.monotonic() - started
+                logger.info(
+                    f"过期租赁回收进度：已扫描 {stats['scanned']}，已回收 {stats['recovered']}，"
+                    f"失败 {stats['failed']}，耗时 {elapsed:.1f} 秒"
+                )
+
+        stats['duration'] = time.monotonic() - started
+        self.stats = stats
+        if stats['scanned']:
+            logger.info(
+                f"过期租赁回收完成：回收 {stats['recovered']} 个，失败 {stats['failed']} 个，"
+                f"耗时 {stats['duration']:.1f} 秒"
+            )
+        return stats
+
+    def recover_ids(self, rental_ids, now=None):
+        """回收指定ID中截至 now 已到期的活跃租赁
+
+        返回 (回收失败的租赁ID, {尚未到期的租赁ID: 到期时间})，后者（例如到期时间已被延长）
+        由调用方按新的到期时间重新安排。
+        """
+        now = now or datetime.utcnow()
+        table = EnergyRental.__table__
+        failed = []
+        not_due = {}
+
+        for i in range(0, len(rental_ids), self.chunk_size):
+            query = (
+                sa.select(table.c.id, table.c.rental_address, table.c.owner_address, table.c.energy_amount,
+                          table.c.expiry_time)
+                .where(
+                    table.c.id.in_(rental_ids[i:i + self.chunk_size]),
+                    table.c.status == 'active'
+                )
+            )
+            with self._get_engine().connect() as conn:
+                rows = conn.execute(query).fetchall()
+            not_due.update({row.id: row.expiry_time for row in rows if row.expiry_time > now})
+            rows = [row for row in rows if row.expiry_time <= now]
+            if not rows:
+                continue
+
+            recovered, chunk_failed = self._recover_chunk(rows)
+            failed.extend(chunk_failed)
+            logger.info(f"到期租赁回收：回收 {len(recovered)} 个，失败 {len(chunk_failed)} 个")
+
+        return failed, not_due
+
+    def _iter_chunks(self, conn, query):
+        """按块读取查询结果"""
+        result = conn.execution_options(stream_results=True).execute(query)
+        if conn.dialect.name == 'sqlite':
+            # SQLite未结束的读游标会阻塞其他连接写入，先读出全部结果
+            rows = result.fetchall()
+            for i in range(0, len(rows), self.chunk_size):
+                yield rows[i:i + self.chunk_size]
+            return
+
+        while True:
+            rows = result.fetchmany(self.chunk_size)
+            if not rows:
+                return
+            yield rows
+
+    def _recover_chunk(self, rows):
+        """并发回收一块租赁并批量写入结果，返回 (回收成功的ID, 回收失败的ID)"""
+        # 整块共用一个引用区块，获取失败时由每笔交易各自获取
+        try:
+            ref_block_id = self.tron_client.get_ref_block_id()
+        except Exception as e:
+            logger.error(f"获取引用区块失败: {str(e)}")
+            ref_block_id = None
+
+        def undelegate(row):
+            try:
+                return self.tron_client.undelegate_resource(
+                    row.rental_address, ref_block_id=ref_block_id,
+                    energy_amount=row.energy_amount, owner_address=row.owner_address
+                )
+            except Exception as e:
+                logger.error(f"回收能量时出错，租赁ID: {row.id}: {str(e)}")
+                return None
+
+        futures = [self.tron_client.submit(row.owner_address, undelegate, row) for row in rows]
+        txids = [future.result() for future in futures]
+        recovered = {row.id: txid for row, txid in zip(rows, txids) if txid}
+        failed = [row.id for row in rows if row.id not in recovered]
+        RECOVERIES.labels('expiry', 'failed').inc(len(failed))
+        if not recovered:
+            return [], failed
+
+        self._save_chunk(recovered)
+        RECOVERIES.labels('expiry', 'success').inc(len(recovered))
+
+        by_id = {row.id: row for row in rows}
+        now = datetime.utcnow()
+        for rental_id in recovered:
+            row = by_id[rental_id]
+            EXPIRY_LAG.observe(max(0.0, (now - row.expiry_time).total_seconds()))
+            event_bus.publish(RECOVERED, {
+                'rental_id': row.id,
+                'rental_address': row.rental_address,
+                'status': 'completed',
+                'energy_amount': row.energy_amount,
+                'expiry_time': row.expiry_time.isoformat(),
+                'remaining_minutes': 0,
+            })
+            if self.on_recovered:
+                self.on_recovered(rental_id)
+
+        return list(recovered), failed
+
+    def _save_chunk(self, recovered):
+        """一条UPDATE写入整块的回收交易ID和状态"""
+        table = EnergyRental.__table__
+        recover_txid = sa.case(recovered, value=table.c.id)
+        with self._get_engine().begin() as conn:
+            conn.execute(
+                table.update()
+                .where(table.c.id.in_(list(recovered)), table.c.status == 'active')
+                .values(status='completed', recover_txid=recover_txid, updated_at=datetime.utcnow())
+            )
@@ -0,0 +1,125 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from ..config import settings
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+class ExpiryScheduler:
+    """租赁到期调度器
+
+    活跃租赁的到期时间保存在内存堆中，调度线程睡眠到最近的到期时间，醒来后把已到期的
+    租赁ID（合并 batch_window 内同时到期的租赁）交给 on_due(rental_ids, due_before)，
+    due_before 为这批的截止时间（UTC），批内的租赁都在此之前到期，回收时以它为准。
+    只有到期的租赁才会访问数据库，不再按分钟轮询整张表。
+    """
+
+    def __init__(self, on_due,
+                 batch_window=settings.EXPIRY_BATCH_WINDOW,
+                 max_batch=settings.EXPIRY_CHUNK_SIZE):
+        self.on_due = on_due
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+
+        self._due = {}  # rental_id -> 到期时间戳
+        self._heap = []  # (到期时间戳, rental_id)
+        self._cond = threading.Condition()
+        self._thread = None
+        self.is_running = False
+
+    def start(self):
+        """启动调度线程"""
+        if self.is_running:
+            return
+
+        self.is_running = True
+        self._thread = threading.Thread(target=self._run, name='expiry-scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """停止调度线程"""
+        with self._cond:
+            self.is_running = False
+            self._cond.notify_all()
+
+    def schedule(self, rental_id, expiry_time):
+        """安排租赁在到期时间回收，重复安排时以最后一次为准"""
+        ts = _to_timestamp(expiry_time)
+        with self._cond:
+            self._due[rental_id] = ts
+            heapq.heappush(self._heap, (ts, rental_id))
+            # 新条目成为最早到期时唤醒调度线程
+            if self._heap[0][1] == rental_id:
+                self._cond.notify()
+
+    def cancel(self, rental_id):
+        """取消租赁的到期回收，堆中残留的条目在出堆时丢弃"""
+        with self._cond:
+            self._due.pop(rental_id, None)
+
+    def __len__(self):
+        return len(self._due)
+
+    def _run(self):
+        """调度循环"""
+        while self.is_running:
+            rental_ids, cutoff = self._take_due()
+            if not rental_ids:
+                continue
+
+            try:
+                self.on_due(rental_ids, _to_datetime(cutoff))
+            except Exception as e:
+                logger.error(f"回收到期租赁时出错: {str(e)}")
+
+    def _take_due(self):
+        """等待并取出一批到期的租赁ID，返回 (租赁ID列表, 截止时间戳)"""
+        with self._cond:
+            while self.is_running:
+                # 丢弃已取消或已重新安排的堆条目
+                while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)
+
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                delay = self._heap[0][0] - time.time()
+                if delay > 0:
+                    self._cond.wait(timeout=delay)
+                    continue
+
+                # 同一时间窗口内到期的租赁合并为一批
+                cutoff = time.time() + self.batch_window
+                rental_ids = []
+                while self._heap and len(rental_ids) < self.max_batch and self._heap[0][0] <= cutoff:
+                    ts, rental_id = heapq.heappop(self._heap)
+                    if self._due.get(rental_id) == ts:
+                        del self._due[rental_id]
+                        rental_ids.append(rental_id)
+
+                if rental_ids:
+                    return rental_ids, cutoff
+            return [], None
+
+
+def _to_timestamp(dt):
+    """将UTC datetime转换为时间戳（秒）"""
+    if isinstance(dt, (int, float)):
+        return float(dt)
+    return (dt - _EPOCH).total_seconds()
+
+
+def _to_datetime(ts):
+    """将时间戳（秒）转换为UTC datetime"""
+    return _EPOCH + timedelta(seconds=ts)
@@ -0,0 +1,293 @@
+import logging
+import threading
+import time
+from urllib.parse import urljoin
+
+import requests
+from tronpy.providers import HTTPProvider
+from urllib3.exceptions import ConnectTimeoutError, MaxRetryError
+
+from .rate_limiter import BROADCAST, USER, RateLimited, request_priority
+from ..config import settings
+from ..utils.metrics import TRON_REQUEST_SECONDS, TRON_REQUESTS
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# 广播类请求不在多个节点间重试（已送达的交易可能被重复广播）
+BROADCAST_METHODS = frozenset({
+    'wallet/broadcasttransaction',
+    'wallet/broadcasthex',
+})
+
+# 健康检查使用的请求
+HEALTH_CHECK_METHOD = 'wallet/getnowblock'
+
+def parse_endpoints(value):
+    """解析逗号分隔的节点地址列表"""
+    endpoints = []
+    for uri in (value or '').split(','):
+        uri = uri.strip()
+        if uri:
+            endpoints.append(uri if uri.endswith('/') else uri + '/')
+    return endpoints
+
+
+def metric_path(path):
+    """指标中使用的接口路径，TronGrid路径中的地址替换为占位符"""
+    parts = path.split('/')
+    if len(parts) > 2 and parts[0] == 'v1' and parts[1] in ('accounts', 'contracts'):
+        parts[2] = '{address}'
+        return '/'.join(parts)
+    return path
+
+
+class NodeError(Exception):
+    """节点返回了不应在其他节点重试的错误（例如请求参数错误）"""
+
+
+class Endpoint:
+    """单个节点的延迟和错误统计"""
+
+    # 指数移动平均的权重
+    ALPHA = 0.3
+
+    def __init__(self, uri):
+        self.uri = uri
+        self.latency = None  # 请求耗时的指数移动平均（秒），未请求过时为None
+        self.error_rate = 0.0  # 失败率的指数移动平均
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def record_success(self, latency):
+        """记录一次成功的请求"""
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.latency = latency if self.latency is None else (
+            self.ALPHA * latency + (1 - self.ALPHA) * self.latency
+        )
+        self.error_rate = (1 - self.ALPHA) * self.error_rate
+
+    def record_failure(self, threshold, cooldown):
+        """记录一次失败的请求，连续失败达到阈值时暂停使用该节点"""
+        self.requests += 1
+        self.errors += 1
+        self.consecutive_failures += 1
+        self.error_rate = self.ALPHA + (1 - self.ALPHA) * self.error_rate
+        if self.consecutive_failures >= threshold:
+            if not self.down_until:
+                logger.warning(f"节点 {self.uri} 连续失败 {self.consecutive_failures} 次，暂停使用 {cooldown} 秒")
+            self.down_until = time.monotonic() + cooldown
+
+    def is_healthy(self, now=None):
+        """节点是否可用（暂停期结束后重新参与选择）"""
+        return (now or time.monotonic()) >= self.down_until
+
+    def score(self, timeout):
+        """预期的请求代价，越小越优先；未请求过的节点优先试用"""
+        if self.latency is None:
+            return 0.0
+        return self.latency + self.error_rate * timeout
+
+    def stats(self):
+        """节点统计"""
+        return {
+            'uri': self.uri,
+            'healthy': self.is_healthy(),
+            'latency': self.latency,
+            'error_rate': self.error_rate,
+            'requests': self.requests,
+            'errors': self.errors,
+        }
+
+
+class NodePool(HTTPProvider):
+    """节点连接池
+
+    继承tronpy的HTTPProvider，可作为 Tron(provider=...) 使用。读请求发送到当前最快的
+    健康节点，失败时在其他节点重试（最多 max_attempts 个）；广播固定发送到一个节点，只在
+    连接未建立（请求肯定未送达）时换节点。连续失败的节点暂停 cooldown 秒，
+    期间由后台健康检查（或暂停期结束后的下一次请求）探测恢复。
+    传入 limiter 时每次发送前从限流器取得令牌，节点返回429或5xx时通知限流器退避。
+    """
+
+    def __init__(self, endpoint_uris, timeout=settings.TRON_REQUEST_TIMEOUT,
+                 max_attempts=settings.NODE_MAX_ATTEMPTS,
+                 failure_threshold=settings.NODE_FAILURE_THRESHOLD,
+                 cooldown=settings.NODE_COOLDOWN,
+                 health_interval=settings.NODE_HEALTH_INTERVAL,
+                 limiter=None):
+        # 不调用HTTPProvider.__init__：endpoint_uri 由当前最优的节点决定
+        if not endpoint_uris:
+            raise ValueError("节点连接池中没有节点")
+        self.endpoints = [Endpoint(uri) for uri in endpoint_uris]
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.health_interval = health_interval
+        self.limiter = limiter
+
+        self.sess = requests.session()
+        self.sess.headers["User-Agent"] = "Tronpy/0.2.0"
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def endpoint_uri(self):
+        """当前首选的节点地址"""
+        return self._ranked()[0].uri
+
+    def _ranked(self):
+        """按预期代价排序的节点，健康节点在前；全部暂停时仍按代价尝试"""
+        now = time.monotonic()
+        with self._lock:
+            ranked = sorted(self.endpoints, key=lambda endpoint: endpoint.score(self.timeout))
+            healthy = [endpoint for endpoint in ranked if endpoint.is_healthy(now)]
+        return healthy or ranked
+
+    def candidates(self):
+        """一次请求依次尝试的节点（最多 max_attempts 个）"""
+        return self._ranked()[:self.max_attempts]
+
+    def record(self, endpoint, latency=None, failed=False):
+        """更新节点统计"""
+        with self._lock:
+            if failed:
+                endpoint.record_failure(self.failure_threshold, self.cooldown)
+            else:
+                endpoint.record_success(latency)
+
+    def _send(self, endpoint, method, path, params):
+        """向单个节点发送请求并记录统计"""
+        url = urljoin(endpoint.uri, path)
+        if self.limiter:
+            # 广播总是最高优先级，其他请求使用调用方设置的优先级
+            self.limiter.acquire(BROADCAST if path in BROADCAST_METHODS else None)
+        label = metric_path(path)
+        started = time.monotonic()
+        result = 'error'
+        try:
+            if method == 'GET':
+                resp = self.sess.get(url, params=params, timeout=self.timeout)
+            else:
+                resp = self.sess.post(url, json=params, timeout=self.timeout)
+
+            if resp.status_code == 429 or resp.status_code >= 500:
+                # 限流或节点故障，降低请求速率后换节点重试
+                result = 'throttled' if resp.status_code == 429 else 'error'
+                if self.limiter:
+                    self.limiter.on_throttled(_retry_after(resp))
+                resp.raise_for_status()
+            if resp.status_code >= 400:
+                # 请求本身有误，其他节点也会拒绝
+                result = 'rejected'
+                self.record(endpoint, time.monotonic() - started)
+                raise NodeError(f"节点 {endpoint.uri} 拒绝请求 {path}: HTTP {resp.status_code}")
+            payload = resp.json()
+            result = 'ok'
+        except (requests.RequestException, ValueError):
+            self.record(endpoint, failed=True)
+            raise
+        finally:
+            TRON_REQUESTS.labels(label, result).inc()
+            TRON_REQUEST_SECONDS.labels(label).observe(time.monotonic() - started)
+
+        self.record(endpoint, time.monotonic() - started)
+        if self.limiter:
+            self.limiter.on_success()
+        return payload
+
+    def _request(self, method, path, params, idempotent=True):
+        """按节点排序发送请求，可重试的失败换下一个节点"""
+        last_error = None
+        for endpoint in self.candidates():
+            try:
+                return self._send(endpoint, method, path, params)
+            except requests.ConnectionError as e:
+                # 连接未建立，任何请求都可以换节点
+                if not idempotent and not _is_connect_error(e):
+                    raise
+                last_error = e
+            except (requests.RequestException, ValueError) as e:
+                if not idempotent:
+                    raise
+                last_error = e
+            logger.warning(f"节点 {endpoint.uri} 请求 {path} 失败，尝试其他节点: {str(last_error)}")
+        raise last_error
+
+    def make_request(self, method, params=None):
+        """发送全节点API请求（与HTTPProvider.make_request兼容）"""
+        if params is None:
+            params = {}
+        # tronpy的广播请求以斜杠开头，去掉后按相对路径拼接，并正确识别为广播
+        method = method.lstrip('/')
+        return self._request('POST', method, params, idempotent=method not in BROADCAST_METHODS)
+
+    def get_json(self, path, params=None):
+        """发送GET请求（TronGrid v1接口），返回解析后的JSON"""
+        return self._request('GET', path, params or {})
+
+    def check_health(self):
+        """探测所有节点，更新延迟和可用状态"""
+        for endpoint in list(self.endpoints):
+            try:
+                # 健康检查优先级最低，令牌不足时跳过本轮
+                with request_priority(USER):
+                    self._send(endpoint, 'POST', HEALTH_CHECK_METHOD, {})
+            except RateLimited:
+                return
+            except Exception as e:
+                logger.debug(f"节点 {endpoint.uri} 健康检查失败: {str(e)}")
+
+    def start(self):
+        """启动后台健康检查线程"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='node-health-check')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """停止后台健康检查"""
+        self._stop_event.set()
+
+    def _run(self):
+        """健康检查循环"""
+        while not self._stop_event.wait(self.health_interval):
+            self.check_health()
+
+    def stats(self):
+        """各节点的统计"""
+        with self._lock:
+            return [endpoint.stats() for endpoint in self.endpoints]
+
+
+def _retry_after(resp):
+    """解析Retry-After响应头（秒），没有或无法解析时返回None"""
+    try:
+        return float(resp.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_connect_error(error):
+    """连接是否未建立（请求肯定没有送达节点）"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    # urllib3 的 NewConnectionError（例如连接被拒绝）是 ConnectTimeoutError 的子类
+    return isinstance(reason, ConnectTimeoutError)
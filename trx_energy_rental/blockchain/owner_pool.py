@@ -0,0 +1,146 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tronpy.keys import PrivateKey
+from .capacity import get_capacity_tracker
+from .tx_signer import SigningPipeline, RefBlockCache
+from ..config import settings
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def parse_owner_pool(spec):
+    """解析 OWNER_POOL 配置，返回 (A地址, B地址, B地址私钥) 列表
+
+    格式为 A地址,B地址,B地址私钥;A地址,B地址,B地址私钥。未配置时使用
+    OWNER_ADDRESS、AGENT_ADDRESS 和 AGENT_PRIVATE_KEY 组成的单个账户。
+    """
+    entries = []
+    for item in (spec or '').split(';'):
+        item = item.strip()
+        if not item:
+            continue
+        parts = [part.strip() for part in item.split(',')]
+        if len(parts) != 3 or not all(parts):
+            # 错误信息中不包含私钥
+            raise ValueError(f"无效的能量池账户配置: {parts[0]}")
+        entries.append(tuple(parts))
+
+    if not entries:
+        entries.append((settings.OWNER_ADDRESS, settings.AGENT_ADDRESS, settings.AGENT_PRIVATE_KEY))
+    return entries
+
+
+class EnergyOwner:
+    """能量池中的一个账户：质押能量的A地址和代其签名的B地址
+
+    每个账户有独立的签名流水线、容量跟踪和交易队列，不同账户的交易并行签名和广播。
+    """
+
+    def __init__(self, owner_address, agent_address, agent_private_key, fetch_block_id=None,
+                 ref_blocks=None, max_parallel=settings.OWNER_MAX_PARALLEL):
+        self.owner_address = owner_address  # A地址
+        self.agent_address = agent_address  # B地址
+        self.max_parallel = max_parallel
+
+        # 加载B地址私钥
+        if agent_private_key:
+            self.agent_priv_key = PrivateKey(bytes.fromhex(agent_private_key))
+        else:
+            self.agent_priv_key = None
+            logger.warning("代理地址私钥未配置，无法进行签名操作")
+
+        self.capacity = get_capacity_tracker(owner_address)
+
+        # 本地签名流水线，同一池中的账户共用引用区块缓存
+        self.signing_pipeline = None
+        if self.agent_priv_key and agent_address and settings.LOCAL_SIGNING:
+            self.signing_pipeline = SigningPipeline(
+                fetch_block_id,
+                agent_address,  # 与tronpy构建方式一致，B地址作为交易发起者
+                self.agent_priv_key,
+                settings.AGENT_PERMISSION_ID,
+                ref_blocks=ref_blocks
+            )
+
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """在账户自己的交易队列中执行，返回Future"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_parallel,
+                    thread_name_prefix=f'owner-{(self.owner_address or "default")[:8]}'
+                )
+            return self._executor.submit(fn, *args, **kwargs)
+
+    def __repr__(self):
+        return f'<EnergyOwner {self.owner_address}>'
+
+
+class OwnerPool:
+    """能量池账户集合
+
+    为每笔租赁选择可出租能量最多的账户并占用其容量；链上余量未知的账户排在最后，
+    所有账户都未知时按配置顺序选择，保持单账户时的原有行为。
+    """
+
+    def __init__(self, owners, ref_blocks=None):
+        if not owners:
+            raise ValueError("能量池中没有账户")
+        self.owners = list(owners)
+        self.ref_blocks = ref_blocks
+        self._by_address = {owner.owner_address: owner for owner in self.owners}
+
+    @classmethod
+    def from_settings(cls, fetch_block_id):
+        """根据配置创建能量池"""
+        ref_blocks = RefBlockCache(fetch_block_id)
+        owners = [
+            EnergyOwner(owner_address, agent_address, private_key,
+                        fetch_block_id=fetch_block_id, ref_blocks=ref_blocks)
+            for owner_address, agent_address, private_key in parse_owner_pool(settings.OWNER_POOL)
+        ]
+        return cls(owners, ref_blocks)
+
+    @property
+    def primary(self):
+        """第一个账户，未记录账户的旧租赁由其处理"""
+        return self.owners[0]
+
+    def get(self, owner_address=None):
+        """按A地址获取账户，未指定时返回第一个账户，未配置的地址返回None"""
+        if not owner_address:
+            return self.primary
+        owner = self._by_address.get(owner_address)
+        if owner is None:
+            logger.error(f"A地址 {owner_address} 不在能量池配置中")
+        return owner
+
+    def __iter__(self):
+        return iter(self.owners)
+
+    def __len__(self):
+        return len(self.owners)
+
+    def select(self, energy_amount, load_energy):
+        """选择可出租能量最多的账户并占用容量，所有账户余量不足时返回None
+
+        load_energy(owner_address) 从链上读取账户可代理的能量。
+        """
+        candidates = []
+        for owner in self.owners:
+            available = owner.capacity.available(lambda: load_energy(owner.owner_address))
+            candidates.append((available is not None, available or 0, owner))
+        candidates.sort(key=lambda item: item[:2], reverse=True)
+
+        for _, _, owner in candidates:
+            if owner.capacity.reserve(energy_amount, lambda: load_energy(owner.owner_address)):
+                return owner
+        return None
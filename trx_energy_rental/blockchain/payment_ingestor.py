@@ -0,0 +1,149 @@
+import logging
+import time
+from ..database.models import db, MonitorCursor
+from ..config import settings
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+class PaymentIngestor:
+    """付款摄取引擎
+
+    以持久化游标（区块时间戳、区块号、最后交易ID）为起点，向前分页读取监听地址的
+    全部新交易，每笔付款交给处理函数直到处理成功。处理失败时游标不越过该付款，
+    之后的付款也等到下次轮询时从该付款开始重新处理（重复的付款在认领时被拒绝）。
+    """
+
+    def __init__(self, tron_client, handler, db_session=None):
+        self.tron_client = tron_client
+        self.handler = handler  # handler(sender_address, tx_id)，处理失败时返回False或抛出异常
+        self.db_session = db_session
+        self.address = tron_client.monitor_address
+        self.cursor_name = f"payments:{self.address}"
+
+        # 游标状态
+        self.block_number = 0
+        self.block_timestamp = 0
+        self.last_txid = None
+        self._seen_at_cursor = set()  # 游标所在时间戳已处理的交易，避免重复读取同一区块
+        self._loaded = False
+
+    def poll_once(self):
+        """拉取游标之后的全部新交易，返回交给处理函数的付款数量"""
+        if not self._loaded:
+            self._load_cursor()
+
+        handled = 0
+        fingerprint = None
+        # 翻页期间查询条件需保持不变，fingerprint才有效
+        min_timestamp = self.block_timestamp
+
+        while True:
+            transactions, fingerprint = self.tron_client.get_transactions_page(
+                self.address,
+                min_timestamp=min_timestamp,
+                fingerprint=fingerprint,
+                limit=settings.PAYMENT_PAGE_SIZE,
+                only_to=True
+            )
+
+            for tx in transactions:
+                if self._is_before_cursor(tx):
+                    continue
+
+                if self._is_valid_payment(tx):
+                    if not self._handle(tx):
+                        # 游标停在处理失败的付款之前，下次轮询从该付款重试
+                        self._save_cursor()
+                        return handled
+                    handled += 1
+
+                self._advance_cursor(tx)
+
+            # 每页处理完后保存游标，中途出错也不会重复处理已完成的页
+            self._save_cursor()
+
+            if not fingerprint or not transactions:
+                break
+
+        return handled
+
+    def _handle(self, tx):
+        """把付款交给处理函数，处理函数返回False或抛出异常时视为失败"""
+        try:
+            return self.handler(tx.get('from'), tx.get('txID')) is not False
+        except Exception as e:
+            logger.error(f"处理付款 {tx.get('txID')} 失败: {str(e)}")
+            return False
+
+    def _is_before_cursor(self, tx):
+        """检查交易是否位于游标之前（已处理过）"""
+        timestamp = tx.get('timestamp', 0)
+        if timestamp < self.block_timestamp:
+            return True
+        if timestamp == self.block_timestamp:
+            return tx.get('txID') in self._seen_at_cursor or tx.get('txID') == self.last_txid
+        return False
+
+    def _is_valid_payment(self, tx):
+        """检查交易是否是向监听地址支付租金的有效付款"""
+        if tx.get('type') != 'TransferContract':
+            return False
+        if tx.get('result') not in (None, 'SUCCESS'):
+            return False
+        return (tx.get('to') == self.address and
+                float(tx.get('amount', 0)) / 1e6 >= settings.RENTAL_PRICE)
+
+    def _advance_cursor(self, tx):
+        """将游标推进到该交易"""
+        timestamp = tx.get('timestamp', 0)
+        if timestamp > self.block_timestamp:
+            self.block_timestamp = timestamp
+            self._seen_at_cursor = set()
+
+        self.block_number = max(self.block_number, tx.get('block_number') or 0)
+        self.last_txid = tx.get('txID')
+        self._seen_at_cursor.add(self.last_txid)
+
+    def _load_cursor(self):
+        """从数据库加载游标，不存在时从回看窗口开始"""
+        cursor = None
+        if self.db_session:
+            try:
+                cursor = MonitorCursor.query.filter_by(name=self.cursor_name).first()
+            except Exception as e:
+                logger.error(f"加载付款游标失败: {str(e)}")
+
+        if cursor:
+            self.block_number = cursor.block_number
+            self.block_timestamp = cursor.block_timestamp
+            self.last_txid = cursor.last_txid
+            logger.info(f"付款游标已加载，区块: {self.block_number}, 交易ID: {self.last_txid}")
+        else:
+            self.block_timestamp = int((time.time() - settings.PAYMENT_LOOKBACK_MINUTES * 60) * 1000)
+            logger.info(f"未找到付款游标，从 {settings.PAYMENT_LOOKBACK_MINUTES} 分钟前开始监听")
+
+        self._loaded = True
+
+    def _save_cursor(self):
+        """保存游标到数据库"""
+        if not self.db_session:
+            return
+
+        try:
+            cursor = MonitorCursor.query.filter_by(name=self.cursor_name).first()
+            if not cursor:
+                cursor = MonitorCursor(name=self.cursor_name)
+                db.session.add(cursor)
+
+            cursor.block_number = self.block_number
+            cursor.block_timestamp = self.block_timestamp
+            cursor.last_txid = self.last_txid
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"保存付款游标失败: {str(e)}")
+            self.db_session.rollback()
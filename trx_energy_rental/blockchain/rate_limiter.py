@@ -0,0 +1,193 @@
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from ..config import settings
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# 请求优先级，数值越小越优先
+BROADCAST = 0  # 广播交易及其引用区块
+PAYMENT = 1  # 付款摄取和准入检查
+WATCH = 2  # 租赁使用监视
+USER = 3  # 面向用户的能量查询
+
+PRIORITY_NAMES = {
+    BROADCAST: 'broadcast',
+    PAYMENT: 'payment',
+    WATCH: 'watch',
+    USER: 'user',
+}
+
+_current_priority = contextvars.ContextVar('tron_request_priority', default=USER)
+
+@contextmanager
+def request_priority(priority):
+    """在代码块内发出的节点请求使用指定优先级"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority():
+    """当前的请求优先级"""
+    return _current_priority.get()
+
+
+class RateLimited(Exception):
+    """请求在允许的等待时间内没有取得令牌"""
+
+
+class RateLimiter:
+    """带优先级的令牌桶限流器
+
+    令牌以 rate 个每秒的速度补充，最多积累 burst 个。等待中的请求按优先级取得令牌，
+    低优先级请求超过各自的最长等待时间时放弃（RateLimited），由调用方按失败处理。
+    节点返回429或5xx时速率减半并暂停 backoff 秒（或按 Retry-After），暂停时间逐次加倍；
+    之后每次成功的请求逐步恢复速率。rate 为0时不限流。
+    """
+
+    MIN_RATE_RATIO = 0.1  # 退避后速率的下限（相对于配置速率）
+    RECOVER_RATIO = 0.05  # 每次成功请求恢复的速率（相对于配置速率）
+
+    def __init__(self, rate=settings.TRON_RATE_LIMIT, burst=settings.TRON_RATE_BURST,
+                 max_wait=None, backoff=1.0, max_backoff=60.0):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_wait = max_wait or {
+            BROADCAST: None,
+            PAYMENT: None,
+            WATCH: settings.TRON_RATE_WATCH_MAX_WAIT,
+            USER: settings.TRON_RATE_USER_MAX_WAIT,
+        }
+        self.initial_backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._rate = rate  # 当前速率，退避时降低
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._backoff = backoff
+        self._waiters = []  # (优先级, 序号)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stats = {
+            priority: {'requests': 0, 'rejected': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+            for priority in PRIORITY_NAMES
+        }
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def _refill(self, now):
+        """按经过的时间补充令牌（需持有锁）"""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def acquire(self, priority=None):
+        """取得一个令牌，返回等待的秒数；超过该优先级的最长等待时间时抛出 RateLimited"""
+        if not self.enabled:
+            return 0.0
+
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+        max_wait = self.max_wait.get(priority)
+        deadline = started + max_wait if max_wait is not None else None
+
+        with self._cond:
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiters, entry)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._waiters[0] == entry and now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    heapq.heappop(self._waiters)
+                    self._cond.notify_all()
+                    break
+
+                if deadline is not None and now >= deadline:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self._stats[priority]['rejected'] += 1
+                    self._cond.notify_all()
+                    raise RateLimited(f"{PRIORITY_NAMES.get(priority, priority)} 请求等待令牌超时")
+
+                if self._waiters[0] == entry:
+                    # 队首等到下一个令牌补充或暂停结束
+                    wait = max(self._paused_until - now, (1 - self._tokens) / self._rate, 0.001)
+                else:
+                    # 其他请求等待队首取得令牌后的通知
+                    wait = None
+                if deadline is not None:
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                self._cond.wait(wait)
+
+            waited = time.monotonic() - started
+            stats = self._stats[priority]
+            stats['requests'] += 1
+            stats['wait_total'] += waited
+            stats['wait_max'] = max(stats['wait_max'], waited)
+        return waited
+
+    def on_throttled(self, retry_after=None):
+        """节点返回429或5xx：降低速率并暂停"""
+        if not self.enabled:
+            return
+
+        with self._cond:
+            now = time.monotonic()
+            pause = retry_after if retry_after else self._backoff
+            self._backoff = min(self._backoff * 2, self.max_backoff)
+            self._rate = max(self.rate * self.MIN_RATE_RATIO, self._rate / 2)
+            self._paused_until = max(self._paused_until, now + pause)
+            self._tokens = 0.0
+            logger.warning(f"节点限流，暂停 {pause:.1f} 秒，速率降至 {self._rate:.1f} 次/秒")
+
+    def on_success(self):
+        """请求成功：逐步恢复速率"""
+        if not self.enabled:
+            return
+
+        with self._cond:
+            self._backoff = self.initial_backoff
+            if self._rate < self.rate:
+                self._rate = min(self.rate, self._rate + self.rate * self.RECOVER_RATIO)
+
+    def retry_after(self):
+        """距离暂停结束的秒数"""
+        return max(0.0, self._paused_until - time.monotonic())
+
+    def stats(self):
+        """当前速率、排队数量和各优先级的等待统计"""
+        with self._cond:
+            priorities = {}
+            for priority, stats in self._stats.items():
+                requests = stats['requests']
+                priorities[PRIORITY_NAMES[priority]] = {
+                    'requests': requests,
+                    'rejected': stats['rejected'],
+                    'wait_avg': stats['wait_total'] / requests if requests else 0.0,
+                    'wait_max': stats['wait_max'],
+                }
+            return {
+                'rate': self._rate,
+                'queued': len(self._waiters),
+                'paused_for': max(0.0, self._paused_until - time.monotonic()),
+                'priorities': priorities,
+            }
+
+
+# 同一进程内所有TronClient共享一个限流器（对应同一个API密钥的配额）
+rate_limiter = RateLimiter()
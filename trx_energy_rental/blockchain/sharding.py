@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+
+from ..config import settings
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def shard_of(address, shard_count):
+    """计算地址所属的分片，所有进程和主机上的结果一致"""
+    if shard_count <= 1:
+        return 0
+    digest = hashlib.sha1(address.encode()).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count
+
+
+class ShardAssignment:
+    """当前监控进程负责的分片"""
+
+    def __init__(self, index=settings.MONITOR_SHARD_INDEX, count=settings.MONITOR_SHARD_COUNT):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"无效的分片配置: {index}/{count}")
+        self.index = index
+        self.count = count
+
+    @property
+    def is_sharded(self):
+        """是否运行在分片模式"""
+        return self.count > 1
+
+    def owns(self, address):
+        """地址是否由当前进程负责"""
+        return shard_of(address, self.count) == self.index
+
+    def __repr__(self):
+        return f'<ShardAssignment {self.index}/{self.count}>'
+
+
+def default_worker_id():
+    """默认的租约持有者标识"""
+    return settings.MONITOR_WORKER_ID or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Lease:
+    """基于 service_leases 表的租约
+
+    acquire 在租约空闲、已过期或已由自己持有时取得（或续期）租约，返回是否持有。
+    持有者需在 ttl 内再次调用 acquire 续约，否则其他进程可以接管。
+    """
+
+    def __init__(self, name, holder=None, ttl=settings.LEASE_TTL, engine=None):
+        self.name = name
+        self.holder = holder or default_worker_id()
+        self.ttl = ttl
+        self.engine = engine
+        self.is_held = False
+
+    def _get_engine(self):
+        """获取数据库引擎（首次调用需在Flask应用上下文中）"""
+        if self.engine is None:
+            from ..database.models import db
+            self.engine = db.engine
+        return self.engine
+
+    def acquire(self):
+        """取得或续期租约，返回是否持有"""
+        from ..database.models import ServiceLease
+        table = ServiceLease.__table__
+
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        try:
+            engine = self._get_engine()
+            with engine.begin() as conn:
+                result = conn.execute(
+                    table.update()
+                    .where(
+                        table.c.name == self.name,
+                        sa.or_(table.c.holder == self.holder, table.c.expires_at < now)
+                    )
+                    .values(holder=self.holder, expires_at=expires_at, updated_at=now)
+                )
+                held = result.rowcount == 1
+
+            if not held:
+                # 租约还不存在时插入，并发插入由唯一约束保证只有一个成功
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(table.insert().values(
+                            name=self.name, holder=self.holder, expires_at=expires_at, updated_at=now
+                        ))
+                    held = True
+                except IntegrityError:
+                    held = False
+        except Exception as e:
+            logger.error(f"获取租约 {self.name} 失败: {str(e)}")
+            held = False
+
+        if held != self.is_held:
+            if held:
+                logger.info(f"{self.holder} 取得租约 {self.name}")
+            else:
+                logger.info(f"{self.holder} 未持有租约 {self.name}")
+        self.is_held = held
+        return held
+
+    def release(self):
+        """释放租约，其他进程可立即接管"""
+        if not self.is_held:
+            return
+
+        from ..database.models import ServiceLease
+        table = ServiceLease.__table__
+        try:
+            with self._get_engine().begin() as conn:
+                conn.execute(
+                    table.update()
+                    .where(table.c.name == self.name, table.c.holder == self.holder)
+                    .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+                )
+        except Exception as e:
+            logger.error(f"释放租约 {self.name} 失败: {str(e)}")
+        self.is_held = False
@@ -0,0 +1,189 @@
+import logging
+from collections import namedtuple
+from functools import lru_cache
+from tronpy.keys import to_base58check_address
+from ..config import settings
+
+try:
+    import numpy as np
+except ImportError:  # 可选依赖，未安装时使用纯Python解码
+    np = None
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+TRANSFER = 'transfer'
+TRANSFER_FROM = 'transferFrom'
+
+# TRC20 transfer(address,uint256) 和 transferFrom(address,address,uint256) 的函数选择器
+SELECTORS = {
+    'a9059cbb': TRANSFER,
+    '23b872dd': TRANSFER_FROM,
+}
+TRC20_TRANSFER_SELECTORS = frozenset(SELECTORS)
+
+# 调用数据的最小长度（十六进制字符）：4字节选择器 + 每个参数32字节
+_CALLDATA_LEN = {
+    TRANSFER: 8 + 64 * 2,
+    TRANSFER_FROM: 8 + 64 * 3,
+}
+
+# 参数中地址和金额的位置（十六进制字符偏移）
+_RECEIVER_OFFSET = {TRANSFER: 8, TRANSFER_FROM: 72}
+_AMOUNT_OFFSET = {TRANSFER: 72, TRANSFER_FROM: 136}
+_SENDER_OFFSET = 8  # transferFrom 的第一个参数
+
+# 同一方法的调用达到该数量时NumPy路径才比逐条切片快（转换字节矩阵有固定开销）
+NUMPY_MIN_BATCH = 1000
+
+Trc20Transfer = namedtuple('Trc20Transfer', 'txid caller contract method sender receiver amount')
+Trc20Transfer.__doc__ = """区块中的一笔TRC20转账调用，地址为base58check格式"""
+
+
+@lru_cache(maxsize=settings.TRC20_ADDRESS_CACHE_SIZE)
+def to_base58(hex_address):
+    """十六进制地址（41开头）转换为base58check地址，结果缓存"""
+    return to_base58check_address(hex_address)
+
+
+def selector_method(data):
+    """调用数据对应的TRC20转账方法名，不是转账时返回None"""
+    return SELECTORS.get((data or '')[:8].lower())
+
+
+def is_trc20_transfer(tx):
+    """统一格式的交易（normalize_transaction）是否为TRC20转账调用"""
+    return tx.get('type') == 'TriggerSmartContract' and selector_method(tx.get('data')) is not None
+
+
+def decode_calldata(datas, callers=None, use_numpy=None):
+    """批量解码 transfer/transferFrom 调用数据
+
+    datas 为十六进制调用数据列表，callers 为对应的调用者地址（transfer 的发送方）。
+    返回 (methods, senders, receivers, amounts) 四列，与输入等长；不是TRC20转账或数据过短的
+    位置为None，含有非十六进制字符的调用金额为None。地址为十六进制格式（41开头）。
+
+    同一方法的调用数据逐条按字符串切片；use_numpy 为None时，安装了NumPy且同一方法的调用
+    不少于 NUMPY_MIN_BATCH 笔时改为一次转换为字节矩阵后按列切片，True/False 强制选择路径。
+    """
+    n = len(datas)
+    methods = [None] * n
+    senders = [None] * n
+    receivers = [None] * n
+    amounts = [None] * n
+
+    # 按方法分组，只保留长度有效的调用
+    groups = {TRANSFER: [], TRANSFER_FROM: []}
+    for i, data in enumerate(datas):
+        method = SELECTORS.get(data[:8].lower()) if data else None
+        if method is None or len(data) < _CALLDATA_LEN[method]:
+            continue
+        methods[i] = method
+        groups[method].append(i)
+
+    for method, indexes in groups.items():
+        if not indexes:
+            continue
+        if use_numpy is None:
+            vectorized = settings.TRC20_DECODER_NUMPY and len(indexes) >= NUMPY_MIN_BATCH
+        else:
+            vectorized = use_numpy
+        decode = _decode_group_numpy if vectorized and np is not None else _decode_group
+        decode(method, indexes, datas, senders, receivers, amounts)
+        if method == TRANSFER and callers is not None:
+            for i in indexes:
+                senders[i] = callers[i]
+
+    return methods, senders, receivers, amounts
+
+
+def _decode_group(method, indexes, datas, senders, receivers, amounts):
+    """逐条解码同一方法的调用数据"""
+    receiver_at = _RECEIVER_OFFSET[method] + 24
+    amount_at = _AMOUNT_OFFSET[method]
+    for i in indexes:
+        data = datas[i]
+        try:
+            amounts[i] = int(data[amount_at:amount_at + 64], 16)
+        except ValueError:
+            # 含有非十六进制字符的调用数据
+            continue
+        if method == TRANSFER_FROM:
+            senders[i] = '41' + data[_SENDER_OFFSET + 24:_SENDER_OFFSET + 64].lower()
+        receivers[i] = '41' + data[receiver_at:receiver_at + 40].lower()
+
+
+def _decode_group_numpy(method, indexes, datas, senders, receivers, amounts):
+    """把同一方法的调用数据转换为字节矩阵后按列解码"""
+    length = _CALLDATA_LEN[method]
+    try:
+        raw = bytes.fromhex(''.join([datas[i][:length] for i in indexes]))
+    except ValueError:
+        # 含有非十六进制字符的调用数据逐条处理
+        return _decode_group(method, indexes, datas, senders, receivers, amounts)
+    matrix = np.frombuffer(raw, dtype=np.uint8).reshape(len(indexes), length // 2)
+
+    def address_column(offset):
+        # 参数中地址为32字节的后20字节
+        start = offset // 2 + 12
+        column = matrix[:, start:start + 20].tobytes().hex()
+        return ['41' + column[k:k + 40] for k in range(0, len(column), 40)]
+
+    if method == TRANSFER_FROM:
+        for i, address in zip(indexes, address_column(_SENDER_OFFSET)):
+            senders[i] = address
+    for i, address in zip(indexes, address_column(_RECEIVER_OFFSET[method])):
+        receivers[i] = address
+
+    # 金额为uint256，高24字节为0时直接取低8字节，否则逐条转换
+    start = _AMOUNT_OFFSET[method] // 2
+    high = matrix[:, start:start + 24].any(axis=1)
+    low = matrix[:, start + 24:start + 32].copy().view('>u8').ravel().tolist()
+    for i, amount in zip(indexes, low):
+        amounts[i] = amount
+    for k in np.flatnonzero(high).tolist():
+        amounts[indexes[k]] = int.from_bytes(matrix[k, start:start + 32].tobytes(), 'big')
+
+
+def decode_block(block, use_numpy=None):
+    """一次解码区块（visible=False）中所有TRC20转账调用，返回 Trc20Transfer 列表"""
+    txids = []
+    callers = []
+    contracts = []
+    datas = []
+    for tx in block.get('transactions', []):
+        contract = (tx.get('raw_data', {}).get('contract') or [{}])[0]
+        if contract.get('type') != 'TriggerSmartContract':
+            continue
+        value = contract.get('parameter', {}).get('value', {})
+        data = value.get('data')
+        if not data or data[:8].lower() not in TRC20_TRANSFER_SELECTORS:
+            continue
+        txids.append(tx.get('txID'))
+        callers.append(value.get('owner_address'))
+        contracts.append(value.get('contract_address'))
+        datas.append(data)
+
+    methods, senders, receivers, amounts = decode_calldata(datas, callers, use_numpy)
+
+    transfers = []
+    for k, method in enumerate(methods):
+        if method is None or amounts[k] is None:
+            continue
+        try:
+            transfers.append(Trc20Transfer(
+                txids[k],
+                to_base58(callers[k]),
+                to_base58(contracts[k]),
+                method,
+                to_base58(senders[k]),
+                to_base58(receivers[k]),
+                amounts[k],
+            ))
+        except Exception as e:
+            logger.debug(f"跳过无效的TRC20调用 {txids[k]}: {str(e)}")
+    return transfers
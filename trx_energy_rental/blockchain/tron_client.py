@@ -1,10 +1,19 @@
 import time
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from tronpy import Tron
-from tronpy.keys import PrivateKey
+from tronpy.defaults import conf_for_name
+from tronpy.tron import Transaction
 from tronpy.exceptions import TransactionError
 from datetime import datetime, timedelta
+from .owner_pool import OwnerPool
+from .node_pool import NodePool, parse_endpoints
+from .trc20_decoder import is_trc20_transfer, to_base58
+from .rate_limiter import BROADCAST, PAYMENT, WATCH, current_priority, rate_limiter, request_priority
 from ..config import settings
+from ..utils.metrics import TRON_CLIENT_CALLS, TRON_CLIENT_SECONDS, timed
 
 # 配置日志
 logging.basicConfig(
@@ -13,28 +22,197 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# TronClient 方法的调用次数和耗时
+instrumented = timed(TRON_CLIENT_CALLS, TRON_CLIENT_SECONDS)
+
+class _PendingLoad:
+    """正在进行中的资源查询，同一地址的并发请求共享其结果"""
+    
+    __slots__ = ('event', 'value', 'error', 'stale')
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+        self.stale = False  # 查询期间地址被失效，结果不写入缓存
+
+
+class ResourceCache:
+    """账户资源缓存
+    
+    按地址缓存 get_account_resource 的结果，条目在TTL后过期，超过容量时按LRU淘汰。
+    同一地址的并发未命中只发起一次RPC，其余请求等待并共享结果。
+    """
+    
+    def __init__(self, ttl=settings.ENERGY_CACHE_TTL, max_size=settings.ENERGY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = OrderedDict()  # address -> (过期时间, 资源信息)
+        self._inflight = {}  # address -> _PendingLoad
+        self._lock = threading.Lock()
+        
+        # 统计计数
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+    
+    def get_or_load(self, address, loader):
+        """获取地址的资源信息，未命中时调用 loader(address) 加载"""
+        if self.ttl <= 0:
+            return loader(address)
+        
+        with self._lock:
+            item = self._data.get(address)
+            if item and item[0] > time.monotonic():
+                self._data.move_to_end(address)
+                self.hits += 1
+                return item[1]
+            
+            pending = self._inflight.get(address)
+            if pending:
+                self.coalesced += 1
+                is_owner = False
+            else:
+                self.misses += 1
+                pending = _PendingLoad()
+                self._inflight[address] = pending
+                is_owner = True
+        
+        if not is_owner:
+            pending.event.wait()
+            if pending.error:
+                raise pending.error
+            return pending.value
+        
+        try:
+            pending.value = loader(address)
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(address, None)
+                if pending.error is None and pending.value is not None and not pending.stale:
+                    self._store(address, pending.value)
+            pending.event.set()
+        
+        return pending.value
+    
+    def _store(self, address, value):
+        """写入缓存并按LRU淘汰（需持有锁）"""
+        self._data[address] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(address)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+    
+    def put(self, address, value):
+        """写入直接从节点读取的最新资源信息"""
+        if self.ttl <= 0 or value is None:
+            return
+        with self._lock:
+            self._store(address, value)
+    
+    def invalidate(self, address):
+        """使地址的缓存失效，例如代理或回收能量之后"""
+        with self._lock:
+            self._data.pop(address, None)
+            pending = self._inflight.get(address)
+            if pending:
+                pending.stale = True
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+    
+    def stats(self):
+        """返回命中统计，用于调整TTL和容量"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'size': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
+
+
+# 同一进程内的Web、机器人和监控服务共享一个缓存
+resource_cache = ResourceCache()
+
 class TronClient:
     """TRON区块链客户端"""
     
     def __init__(self):
         # 初始化TRON客户端，根据配置选择主网或测试网
-        if settings.TRON_NETWORK.lower() == 'mainnet':
-            self.client = Tron()
-        else:
-            self.client = Tron(network='nile')
+        network = 'mainnet' if settings.TRON_NETWORK.lower() == 'mainnet' else 'nile'
+        
+        # 请求限流器，全节点和TronGrid共用同一个API密钥的配额
+        self.rate_limiter = rate_limiter
+        
+        # 全节点连接池：读请求发往最快的健康节点并在失败时换节点重试，广播固定发往一个节点
+        full_nodes = parse_endpoints(settings.TRON_FULL_NODE_API) or parse_endpoints(conf_for_name(network)['fullnode'])
+        self.node_pool = NodePool(full_nodes, limiter=self.rate_limiter)
+        self.client = Tron(provider=self.node_pool, network=network)
+        
+        # TronGrid v1接口的连接池，未配置时使用全节点连接池
+        grid_nodes = parse_endpoints(settings.TRON_GRID_API)
+        self.grid_pool = NodePool(grid_nodes, limiter=self.rate_limiter) if grid_nodes else self.node_pool
         
-        # 设置地址
-        self.owner_address = settings.OWNER_ADDRESS  # A地址
-        self.agent_address = settings.AGENT_ADDRESS  # B地址
+        # 能量池账户（A地址/B地址对），每个账户有独立的签名流水线、容量跟踪和交易队列；
+        # 本地签名流水线缓存引用区块、预编码交易模板，代理/回收时只需一次广播RPC
+        self.owner_pool = OwnerPool.from_settings(self._fetch_ref_block_id)
+        
+        # 设置地址，owner_address/agent_address 为能量池的第一个账户
+        primary = self.owner_pool.primary
+        self.owner_address = primary.owner_address  # A地址
+        self.agent_address = primary.agent_address  # B地址
+        self.agent_priv_key = primary.agent_priv_key
         self.monitor_address = settings.MONITOR_ADDRESS  # C地址
         
-        # 加载B地址私钥
-        if settings.AGENT_PRIVATE_KEY:
-            self.agent_priv_key = PrivateKey(bytes.fromhex(settings.AGENT_PRIVATE_KEY))
-        else:
-            self.agent_priv_key = None
-            logger.warning("代理地址私钥未配置，无法进行签名操作")
+        # 账户资源缓存
+        self.resource_cache = resource_cache
+        
+        # 批量能量查询的线程池，首次使用时创建
+        self._batch_executor = None
+        self._batch_lock = threading.Lock()
+    
+    def start_health_checks(self):
+        """启动节点连接池的后台健康检查"""
+        self.node_pool.start()
+        if self.grid_pool is not self.node_pool:
+            self.grid_pool.start()
+    
+    def stop_health_checks(self):
+        """停止节点连接池的后台健康检查"""
+        self.node_pool.stop()
+        self.grid_pool.stop()
+    
+    def get_node_stats(self):
+        """获取各节点的延迟和错误统计"""
+        stats = {'full_node': self.node_pool.stats()}
+        if self.grid_pool is not self.node_pool:
+            stats['grid'] = self.grid_pool.stats()
+        return stats
     
+    def get_rate_limiter_stats(self):
+        """获取请求限流器的速率和各优先级的排队统计"""
+        return self.rate_limiter.stats()
+    
+    def start_signing_pipeline(self):
+        """启动签名流水线的引用区块后台刷新"""
+        if any(owner.signing_pipeline for owner in self.owner_pool):
+            self.owner_pool.ref_blocks.start()
+    
+    def stop_signing_pipeline(self):
+        """停止签名流水线的后台刷新"""
+        self.owner_pool.ref_blocks.stop()
+    
+    @instrumented
     def get_account_info(self, address):
         """获取账户信息"""
         try:
@@ -44,58 +222,200 @@ class TronClient:
             logger.error(f"获取账户 {address} 信息失败: {str(e)}")
             return None
     
+    @instrumented
     def get_account_resource(self, address):
         """获取账户资源信息"""
         try:
-            account_resource = self.client.get_account_resource(address)
+            account_resource = self.resource_cache.get_or_load(address, self.client.get_account_resource)
             return account_resource
         except Exception as e:
             logger.error(f"获取账户 {address} 资源信息失败: {str(e)}")
             return None
     
+    def _load_account_energy(self, address, fresh=False):
+        """读取账户可用能量（经过缓存，fresh 为True时直接读取节点并更新缓存），失败时抛出异常"""
+        if fresh:
+            account_resource = self.client.get_account_resource(address)
+            self.resource_cache.put(address, account_resource)
+        else:
+            account_resource = self.resource_cache.get_or_load(address, self.client.get_account_resource)
+        return available_energy(account_resource)
+    
+    @instrumented
     def get_account_energy(self, address):
         """获取账户可用能量"""
         try:
-            account_resource = self.client.get_account_resource(address)
-            
-            # 获取能量信息
-            energy_limit = account_resource.get('energy_limit', 0)
-            energy_used = account_resource.get('energy_used', 0)
-            
-            # 计算可用能量
-            available_energy = max(0, energy_limit - energy_used)
-            return available_energy
+            return self._load_account_energy(address)
         except Exception as e:
             logger.error(f"获取账户 {address} 能量信息失败: {str(e)}")
             return 0
     
+    @instrumented
+    def get_accounts_energy(self, addresses, fresh=False):
+        """批量获取多个账户的可用能量
+        
+        返回与 addresses 顺序一致的列表，查询失败的地址为None。重复的地址只查询一次，
+        查询在共享的有界线程池（ENERGY_BATCH_WORKERS）中并发进行，仍经过资源缓存和请求限流，
+        使用调用方设置的请求优先级。fresh 为True时不使用缓存中的旧值。
+        """
+        unique = list(dict.fromkeys(addresses))
+        if not unique:
+            return []
+        
+        priority = current_priority()
+        
+        def load(address):
+            try:
+                with request_priority(priority):
+                    return self._load_account_energy(address, fresh)
+            except Exception as e:
+                logger.error(f"获取账户 {address} 能量信息失败: {str(e)}")
+                return None
+        
+        if len(unique) == 1:
+            energies = {unique[0]: load(unique[0])}
+        else:
+            energies = dict(zip(unique, self._get_batch_executor().map(load, unique)))
+        return [energies[address] for address in addresses]
+    
+    def _get_batch_executor(self):
+        """获取（必要时创建）批量查询的线程池"""
+        with self._batch_lock:
+            if self._batch_executor is None:
+                self._batch_executor = ThreadPoolExecutor(
+                    max_workers=settings.ENERGY_BATCH_WORKERS,
+                    thread_name_prefix='energy-batch'
+                )
+            return self._batch_executor
+    
+    @instrumented
     def check_enough_energy(self, address, required_energy=settings.MIN_USER_ENERGY):
         """检查账户是否有足够的能量"""
         available_energy = self.get_account_energy(address)
         return available_energy >= required_energy
     
-    def delegate_resource(self, receiver_address, energy_amount=settings.RENTAL_ENERGY):
-        """代理资源给接收者地址"""
-        if not self.agent_priv_key:
+    def _load_owner_energy(self, owner_address):
+        """从链上读取A地址可代理的能量（不经过缓存），读取失败时返回None"""
+        if not owner_address:
+            return None
+        with request_priority(PAYMENT):
+            account_resource = self.client.get_account_resource(owner_address)
+        return available_energy(account_resource)
+    
+    def _owner_loader(self, owner):
+        """账户容量的链上读取函数"""
+        return lambda: self._load_owner_energy(owner.owner_address)
+    
+    @instrumented
+    def refresh_pool_capacity(self):
+        """立即从链上刷新所有账户的容量，返回能量池可出租的能量"""
+        for owner in self.owner_pool:
+            owner.capacity.refresh(self._owner_loader(owner))
+        return self.get_pool_energy()
+    
+    def get_pool_energy(self):
+        """获取能量池可出租的能量（各账户之和），都未知时返回None"""
+        known = [
+            available for available in
+            (owner.capacity.available(self._owner_loader(owner)) for owner in self.owner_pool)
+            if available is not None
+        ]
+        return sum(known) if known else None
+    
+    def has_pool_capacity(self, energy_amount=settings.RENTAL_ENERGY):
+        """能量池中是否有账户足够接受一笔租赁"""
+        return any(
+            owner.capacity.has_capacity(energy_amount, self._owner_loader(owner))
+            for owner in self.owner_pool
+        )
+    
+    def reserve_pool_energy(self, energy_amount=settings.RENTAL_ENERGY):
+        """代理前选择可出租能量最多的账户并占用其容量，返回该账户（EnergyOwner），余量不足时返回None"""
+        return self.owner_pool.select(energy_amount, self._load_owner_energy)
+    
+    def release_pool_energy(self, energy_amount, owner_address=None):
+        """代理失败或回收成功后归还账户容量"""
+        owner = self.owner_pool.get(owner_address)
+        if owner:
+            owner.capacity.release(energy_amount)
+    
+    def submit(self, owner_address, fn, *args, **kwargs):
+        """在账户的交易队列中执行，不同账户的交易并行签名和广播，返回Future"""
+        owner = self.owner_pool.get(owner_address) or self.owner_pool.primary
+        return owner.submit(fn, *args, **kwargs)
+    
+    def get_cache_stats(self):
+        """获取账户资源缓存的命中统计"""
+        return self.resource_cache.stats()
+    
+    def _invalidate_resources(self, receiver_address, owner_address=None):
+        """代理或回收后使相关地址的资源缓存失效"""
+        self.resource_cache.invalidate(receiver_address)
+        if owner_address:
+            self.resource_cache.invalidate(owner_address)
+    
+    def _fetch_ref_block_id(self):
+        """从链上读取最新固化区块ID，作为广播的一部分使用最高优先级"""
+        with request_priority(BROADCAST):
+            return self.client.get_latest_solid_block_id()
+    
+    @instrumented
+    def get_ref_block_id(self):
+        """获取交易引用的区块ID，批量构建交易时只需获取一次"""
+        if any(owner.signing_pipeline for owner in self.owner_pool):
+            return self.owner_pool.ref_blocks.get_block_id()
+        return self._fetch_ref_block_id()
+    
+    def _build_and_sign(self, builder, priv_key, ref_block_id=None):
+        """构建并用B地址私钥签名交易，传入ref_block_id时不再单独查询引用区块"""
+        if ref_block_id is None:
+            txn = builder.build()
+        else:
+            raw_data = builder._raw_data
+            # 与tronpy一致：区块号的后2字节和区块哈希的后半部分
+            raw_data["ref_block_bytes"] = ref_block_id[12:16]
+            raw_data["ref_block_hash"] = ref_block_id[16:32]
+            txn = Transaction(raw_data, client=self.client)
+        return txn.sign(priv_key)
+    
+    def _broadcast_hex(self, txid, tx_hex):
+        """广播本地签名的交易，返回与tronpy广播一致的结果格式"""
+        result = self.client.provider.make_request('wallet/broadcasthex', {'transaction': tx_hex})
+        result.setdefault('txid', txid)
+        return result
+    
+    @instrumented
+    def delegate_resource(self, receiver_address, energy_amount=settings.RENTAL_ENERGY, ref_block_id=None,
+                          owner_address=None):
+        """由能量池账户（未指定时为第一个账户）代理资源给接收者地址"""
+        owner = self.owner_pool.get(owner_address)
+        if not owner or not owner.agent_priv_key:
             logger.error("代理地址私钥未配置，无法进行签名操作")
             return None
             
         try:
-            # 使用B地址签名，使A地址代理资源给D地址
-            txn = (
-                self.client.trx.freeze_balance(
-                    self.owner_address,  # A地址
-                    energy_amount,  # 能量数量
-                    "ENERGY",  # 资源类型
-                    receiver_address  # D地址
+            if owner.signing_pipeline:
+                # 本地签名后直接广播
+                txid, tx_hex = owner.signing_pipeline.sign_delegate(receiver_address, energy_amount)
+                result = self._broadcast_hex(txid, tx_hex)
+            else:
+                # 使用B地址签名，使A地址代理资源给D地址
+                builder = (
+                    self.client.trx.freeze_balance(
+                        owner.owner_address,  # A地址
+                        energy_amount,  # 能量数量
+                        "ENERGY",  # 资源类型
+                        receiver=receiver_address  # D地址
+                    )
+                    .with_owner(owner.agent_address)  # B地址作为交易发起者
                 )
-                .with_owner(self.agent_address)  # B地址作为交易发起者
-                .build()
-                .sign(self.agent_priv_key)
-            )
-            
-            # 广播交易
-            result = txn.broadcast()
+                # 构建时读取的引用区块与广播同为最高优先级
+                with request_priority(BROADCAST):
+                    txn = self._build_and_sign(builder, owner.agent_priv_key, ref_block_id)
+                    
+                    # 广播交易
+                    result = txn.broadcast()
+            self._invalidate_resources(receiver_address, owner.owner_address)
             
             # 检查交易结果
             if result.get("result", False):
@@ -112,31 +432,42 @@ class TronClient:
             logger.error(f"代理能量异常: {str(e)}")
             return None
     
-    def undelegate_resource(self, receiver_address):
-        """收回代理给接收者的资源"""
-        if not self.agent_priv_key:
+    @instrumented
+    def undelegate_resource(self, receiver_address, ref_block_id=None, energy_amount=None, owner_address=None):
+        """收回能量池账户（未指定时为第一个账户）代理给接收者的资源，
+        传入energy_amount时回收成功后归还该账户的容量"""
+        owner = self.owner_pool.get(owner_address)
+        if not owner or not owner.agent_priv_key:
             logger.error("代理地址私钥未配置，无法进行签名操作")
             return None
             
         try:
-            # 使用B地址签名，收回A地址代理给D地址的资源
-            txn = (
-                self.client.trx.unfreeze_balance(
-                    self.owner_address,  # A地址
-                    "ENERGY",  # 资源类型
-                    receiver_address  # D地址
+            if owner.signing_pipeline:
+                # 本地签名后直接广播
+                txid, tx_hex = owner.signing_pipeline.sign_undelegate(receiver_address)
+                result = self._broadcast_hex(txid, tx_hex)
+            else:
+                # 使用B地址签名，收回A地址代理给D地址的资源
+                builder = (
+                    self.client.trx.unfreeze_balance(
+                        owner.owner_address,  # A地址
+                        "ENERGY",  # 资源类型
+                        receiver_address  # D地址
+                    )
+                    .with_owner(owner.agent_address)  # B地址作为交易发起者
                 )
-                .with_owner(self.agent_address)  # B地址作为交易发起者
-                .build()
-                .sign(self.agent_priv_key)
-            )
-            
-            # 广播交易
-            result = txn.broadcast()
+                # 构建时读取的引用区块与广播同为最高优先级
+                with request_priority(BROADCAST):
+                    txn = self._build_and_sign(builder, owner.agent_priv_key, ref_block_id)
+                    
+                    # 广播交易
+                    result = txn.broadcast()
+            self._invalidate_resources(receiver_address, owner.owner_address)
             
             # 检查交易结果
             if result.get("result", False):
                 logger.info(f"成功回收代理给 {receiver_address} 的能量")
+                owner.capacity.release(energy_amount)
                 return result.get("txid")
             else:
                 logger.error(f"回收代理能量失败: {result}")
@@ -149,30 +480,80 @@ class TronClient:
             logger.error(f"回收代理能量异常: {str(e)}")
             return None
     
+    @instrumented
     def get_transactions(self, address, only_trc20=False, limit=10):
         """获取地址的交易历史"""
         try:
-            # 调用TRON API获取交易历史
-            transactions = self.client.get_account_transactions(address, limit=limit)
+            # 调用TronGrid接口获取交易历史（最新的在前）
+            payload = self.grid_pool.get_json(f'v1/accounts/{address}/transactions', {'limit': limit})
+            transactions = [tx for tx in map(normalize_transaction, payload.get('data', [])) if tx]
             
-            # 如果只需要TRC20交易
+            # 如果只需要TRC20交易：按调用数据的函数选择器识别 transfer/transferFrom
             if only_trc20:
-                trc20_txs = []
-                for tx in transactions:
-                    # 检查是否为TRC20交易
-                    if 'contract_address' in tx and tx.get('type') == 'TransferContract':
-                        trc20_txs.append(tx)
-                return trc20_txs
+                return [tx for tx in transactions if is_trc20_transfer(tx)]
             
             return transactions
         except Exception as e:
             logger.error(f"获取地址 {address} 交易历史失败: {str(e)}")
             return []
     
+    @instrumented
+    def get_transactions_page(self, address, min_timestamp=None, fingerprint=None,
+                              limit=settings.PAYMENT_PAGE_SIZE, only_to=False):
+        """按区块时间正序分页获取地址的已确认交易
+        
+        返回 (交易列表, 下一页fingerprint)，没有下一页时fingerprint为None。
+        请求失败时抛出异常，由调用方决定是否重试，避免把失败误当成"没有新交易"。
+        """
+        params = {
+            'only_confirmed': 'true',
+            'order_by': 'block_timestamp,asc',
+            'limit': limit,
+        }
+        if only_to:
+            params['only_to'] = 'true'
+        if min_timestamp:
+            params['min_timestamp'] = int(min_timestamp)
+        if fingerprint:
+            params['fingerprint'] = fingerprint
+        
+        with request_priority(PAYMENT):
+            payload = self.grid_pool.get_json(f'v1/accounts/{address}/transactions', params)
+        
+        transactions = []
+        for raw_tx in payload.get('data', []):
+            tx = normalize_transaction(raw_tx)
+            if tx:
+                transactions.append(tx)
+        
+        next_fingerprint = payload.get('meta', {}).get('fingerprint')
+        return transactions, next_fingerprint
+    
+    @instrumented
+    def get_latest_block_number(self):
+        """获取最新区块号（未固化），请求失败时抛出异常"""
+        return self.client.get_latest_block_number()
+    
+    @instrumented
+    def get_blocks(self, start_num, end_num):
+        """一次请求获取区块号在 [start_num, end_num) 内的区块（最多100个），按区块号升序
+        
+        地址为十六进制格式（visible=False），请求失败时抛出异常。
+        """
+        payload = self.node_pool.make_request('wallet/getblockbylimitnext', {
+            'startNum': start_num,
+            'endNum': end_num,
+            'visible': False,
+        })
+        blocks = payload.get('block', [])
+        return sorted(blocks, key=lambda block: block['block_header']['raw_data'].get('number', 0))
+    
+    @instrumented
     def check_trc20_transfer(self, address, start_time):
         """检查地址在起始时间后是否有TRC20转账交易"""
         try:
-            transactions = self.get_transactions(address, only_trc20=True, limit=20)
+            with request_priority(WATCH):
+                transactions = self.get_transactions(address, only_trc20=True, limit=20)
             
             for tx in transactions:
                 # 获取交易时间
@@ -195,7 +576,8 @@ class TronClient:
         while datetime.now() < end_time:
             try:
                 # 获取监听地址收到的交易
-                transactions = self.client.get_account_transactions(self.monitor_address, limit=10)
+                with request_priority(PAYMENT):
+                    transactions = self.get_transactions(self.monitor_address, limit=10)
                 
                 for tx in transactions:
                     # 检查是否是从sender_address转账到monitor_address的交易
@@ -210,10 +592,51 @@ class TronClient:
                         if tx_time > start_time - timedelta(minutes=2):  # 允许2分钟的时间误差
                             return tx.get('txID')  # 返回交易ID
                 
-                # 休眠一段时间再查询
-                time.sleep(3)
+                # 休眠一段时间再查询，节点限流时等到暂停结束
+                time.sleep(max(3, self.rate_limiter.retry_after()))
             except Exception as e:
                 logger.error(f"检查支付失败: {str(e)}")
-                time.sleep(3)
+                time.sleep(max(3, self.rate_limiter.retry_after()))
+        
+        return None  # 超时未检测到支付 
+
+
+def available_energy(account_resource):
+    """计算账户资源信息中的可用能量
+    
+    全节点返回 EnergyLimit/EnergyUsed 并省略值为0的字段，同时兼容小写下划线格式。
+    """
+    energy_limit = account_resource.get('EnergyLimit', account_resource.get('energy_limit', 0))
+    energy_used = account_resource.get('EnergyUsed', account_resource.get('energy_used', 0))
+    return max(0, energy_limit - energy_used)
+
+
+def normalize_transaction(raw_tx):
+    """将TronGrid返回的原始交易转换为统一格式"""
+    try:
+        raw_data = raw_tx.get('raw_data', {})
+        contract = raw_data.get('contract', [{}])[0]
+        value = contract.get('parameter', {}).get('value', {})
+        ret = raw_tx.get('ret') or [{}]
         
-        return None  # 超时未检测到支付 
\ No newline at end of file
+        tx = {
+            'txID': raw_tx.get('txID'),
+            'block_number': raw_tx.get('blockNumber', 0),
+            'timestamp': raw_tx.get('block_timestamp', raw_data.get('timestamp', 0)),
+            'type': contract.get('type'),
+            'from': None,
+            'to': None,
+            'amount': value.get('amount', 0),
+            'result': ret[0].get('contractRet'),
+        }
+        if value.get('owner_address'):
+            tx['from'] = to_base58(value['owner_address'])
+        if value.get('to_address'):
+            tx['to'] = to_base58(value['to_address'])
+        if value.get('contract_address'):
+            tx['contract_address'] = to_base58(value['contract_address'])
+            tx['data'] = value.get('data')
+        return tx
+    except Exception as e:
+        logger.error(f"解析交易 {raw_tx.get('txID')} 失败: {str(e)}")
+        return None
\ No newline at end of file
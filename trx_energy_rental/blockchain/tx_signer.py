@@ -0,0 +1,219 @@
+import hashlib
+import logging
+import threading
+import time
+from tronpy import keys
+from ..config import settings
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# protobuf线格式类型
+_WIRE_VARINT = 0
+_WIRE_BYTES = 2
+
+# protocol.Transaction.Contract.ContractType
+_CONTRACT_TYPES = {
+    'FreezeBalanceContract': 11,
+    'UnfreezeBalanceContract': 12,
+}
+
+# 合约中 receiver_address 的字段号
+_RECEIVER_FIELDS = {
+    'FreezeBalanceContract': 15,
+    'UnfreezeBalanceContract': 13,
+}
+
+# protocol.ResourceCode
+_RESOURCE_ENERGY = 1
+
+# 交易有效期（毫秒），与tronpy一致
+_EXPIRATION_MS = 60_000
+
+
+def _varint(value):
+    """编码protobuf varint"""
+    out = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _field_varint(field, value):
+    """编码varint字段，默认值0按proto3规则省略"""
+    if not value:
+        return b''
+    return _varint(field << 3 | _WIRE_VARINT) + _varint(value)
+
+
+def _field_bytes(field, data):
+    """编码长度前缀字段（bytes/string/嵌套消息）"""
+    if not data:
+        return b''
+    return _varint(field << 3 | _WIRE_BYTES) + _varint(len(data)) + data
+
+
+class RefBlockCache:
+    """引用区块缓存
+
+    在后台线程中定期刷新交易引用的区块，签名时直接使用缓存值，不再占用一次RPC。
+    缓存超过 max_age 仍未刷新成功时，在调用线程中同步获取。
+    """
+
+    def __init__(self, fetch_block_id,
+                 refresh_interval=settings.REF_BLOCK_REFRESH_INTERVAL,
+                 max_age=settings.REF_BLOCK_MAX_AGE):
+        self.fetch_block_id = fetch_block_id
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+
+        self._block_id = None
+        self._encoded = b''
+        self._fetched_at = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动后台刷新线程"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='ref-block-refresher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """停止后台刷新线程"""
+        self._stop_event.set()
+
+    def _run(self):
+        """后台刷新循环"""
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"刷新引用区块失败: {str(e)}")
+            self._stop_event.wait(self.refresh_interval)
+
+    def refresh(self):
+        """获取最新的引用区块并预先编码"""
+        block_id = self.fetch_block_id()
+        # 区块号的后2字节和区块哈希的后半部分
+        encoded = (
+            _field_bytes(1, bytes.fromhex(block_id[12:16])) +
+            _field_bytes(4, bytes.fromhex(block_id[16:32]))
+        )
+        with self._lock:
+            self._block_id = block_id
+            self._encoded = encoded
+            self._fetched_at = time.monotonic()
+
+    def get_block_id(self):
+        """获取缓存的引用区块ID"""
+        self._ensure_fresh()
+        return self._block_id
+
+    def get_encoded(self):
+        """获取已编码的 ref_block_bytes/ref_block_hash 字段"""
+        self._ensure_fresh()
+        return self._encoded
+
+    def _ensure_fresh(self):
+        """缓存缺失或过旧时同步刷新"""
+        if not self._block_id or time.monotonic() - self._fetched_at > self.max_age:
+            self.refresh()
+
+
+class TransactionTemplate:
+    """预编码的交易模板
+
+    合约类型、type_url、发起地址、资源类型和权限ID在创建时编码好，
+    请求时只需填入接收者地址和数量。
+    """
+
+    def __init__(self, contract_type, owner_address, permission_id=0):
+        self.contract_type = contract_type
+        self._type_part = _field_varint(1, _CONTRACT_TYPES[contract_type])
+        self._type_url_part = _field_bytes(1, f"type.googleapis.com/protocol.{contract_type}".encode())
+        self._owner_part = _field_bytes(1, keys.to_raw_address(owner_address))
+        self._permission_part = _field_varint(5, permission_id)
+        self._receiver_field = _RECEIVER_FIELDS[contract_type]
+
+        if contract_type == 'FreezeBalanceContract':
+            # frozen_duration = 3天, resource = ENERGY
+            self._tail_part = _field_varint(3, 3) + _field_varint(10, _RESOURCE_ENERGY)
+        else:
+            self._tail_part = _field_varint(10, _RESOURCE_ENERGY)
+
+    def encode_raw(self, ref_part, receiver_address, amount=0, now_ms=None):
+        """编码 Transaction.raw，返回序列化后的字节"""
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+
+        # 合约参数按字段号顺序拼接
+        value = (
+            self._owner_part +
+            _field_varint(2, amount) +
+            self._tail_part +
+            _field_bytes(self._receiver_field, keys.to_raw_address(receiver_address))
+        )
+        parameter = self._type_url_part + _field_bytes(2, value)
+        contract = self._type_part + _field_bytes(2, parameter) + self._permission_part
+
+        return (
+            ref_part +
+            _field_varint(8, now_ms + _EXPIRATION_MS) +
+            _field_bytes(11, contract) +
+            _field_varint(14, now_ms)
+        )
+
+
+class SigningPipeline:
+    """本地交易签名流水线
+
+    使用后台刷新的引用区块和预编码的交易模板，在本地完成编码、计算交易ID和签名，
+    代理/回收能量时只需一次广播RPC（wallet/broadcasthex）。
+    """
+
+    def __init__(self, fetch_block_id, owner_address, priv_key, permission_id=0, ref_blocks=None):
+        # 多个签名流水线可以共用一个引用区块缓存
+        self.ref_blocks = ref_blocks or RefBlockCache(fetch_block_id)
+        self.priv_key = priv_key
+        self._freeze = TransactionTemplate('FreezeBalanceContract', owner_address, permission_id)
+        self._unfreeze = TransactionTemplate('UnfreezeBalanceContract', owner_address, permission_id)
+
+    def start(self):
+        """启动引用区块的后台刷新"""
+        self.ref_blocks.start()
+
+    def stop(self):
+        """停止后台刷新"""
+        self.ref_blocks.stop()
+
+    def sign_delegate(self, receiver_address, energy_amount):
+        """生成代理能量的已签名交易，返回 (交易ID, 交易hex)"""
+        raw = self._freeze.encode_raw(self.ref_blocks.get_encoded(), receiver_address, energy_amount)
+        return self._sign(raw)
+
+    def sign_undelegate(self, receiver_address):
+        """生成回收能量的已签名交易，返回 (交易ID, 交易hex)"""
+        raw = self._unfreeze.encode_raw(self.ref_blocks.get_encoded(), receiver_address)
+        return self._sign(raw)
+
+    def _sign(self, raw):
+        """计算交易ID并签名，编码为完整的 Transaction"""
+        txid = hashlib.sha256(raw).digest()
+        signature = self.priv_key.sign_msg_hash(txid).to_bytes()
+        transaction = _field_bytes(1, raw) + _field_bytes(2, signature)
+        return txid.hex(), transaction.hex()
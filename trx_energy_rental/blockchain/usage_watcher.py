@@ -0,0 +1,251 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from .rate_limiter import WATCH, rate_limiter, request_priority
+from ..config import settings
+from ..utils.metrics import WATCHER_LAG
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+class WatchEntry:
+    """单个租赁的监视状态"""
+
+    __slots__ = ('rental_id', 'address', 'start_time', 'expiry_ts', 'next_check_ts', 'in_flight', 'energy')
+
+    def __init__(self, rental_id, address, start_time, expiry_ts):
+        self.rental_id = rental_id
+        self.address = address
+        self.start_time = start_time  # 开始监视的时间（UTC），早于该时间的交易不计入
+        self.expiry_ts = expiry_ts  # 到期时间戳（秒）
+        self.next_check_ts = 0
+        self.in_flight = False
+        self.energy = None  # 上次读取的可用能量，用于判断地址是否消耗了能量
+
+
+class UsageWatcher:
+    """租赁使用监视器
+
+    所有活跃租赁保存在一个按下次检查时间排序的堆中，由单个调度线程按批次取出到期的条目，
+    交给有界线程池调用 check_trc20_transfer。检测到使用或租赁到期时分别回调
+    on_usage(rental_id, tx_id) 和 on_expired(rental_id)；到期回收由其他组件负责时
+    on_expired 可以为None，到期后只停止监视。
+
+    开启 energy_prefilter 时，每批检查前先用一次批量查询直接从节点读取这些地址的可用能量
+    （不使用资源缓存，缓存有效期内的使用不会被旧值掩盖）：TRC20转账会消耗代理的能量，
+    可用能量没有低于上次读取值的地址跳过交易历史查询。每次读取后都以新值作为下次比较的基准。
+    """
+
+    def __init__(self, tron_client, on_usage, on_expired=None,
+                 check_interval=settings.WATCHER_CHECK_INTERVAL,
+                 max_workers=settings.WATCHER_MAX_WORKERS,
+                 batch_size=settings.WATCHER_BATCH_SIZE,
+                 energy_prefilter=settings.WATCHER_ENERGY_PREFILTER):
+        self.tron_client = tron_client
+        self.on_usage = on_usage
+        self.on_expired = on_expired
+        self.check_interval = check_interval
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.energy_prefilter = energy_prefilter
+
+        self._entries = {}  # rental_id -> WatchEntry
+        self._heap = []  # (next_check_ts, seq, rental_id)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        # 限制同时进行的检查数量，线程池繁忙时调度线程等待，而不是无限堆积任务
+        self._slots = threading.BoundedSemaphore(max_workers * 2)
+        self._executor = None
+        self._thread = None
+        self.is_running = False
+
+    def start(self):
+        """启动调度线程和工作线程池"""
+        if self.is_running:
+            return
+
+        self.is_running = True
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix='usage-watcher')
+        self._thread = threading.Thread(target=self._run, name='usage-watcher-scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """停止调度线程"""
+        with self._cond:
+            self.is_running = False
+            self._cond.notify_all()
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+    def watch(self, rental_id, address, start_time, expiry_time):
+        """开始监视一个租赁"""
+        entry = WatchEntry(rental_id, address, start_time, _to_timestamp(expiry_time))
+        with self._cond:
+            self._entries[rental_id] = entry
+            self._schedule(entry, time.time())
+            self._cond.notify()
+
+    def unwatch(self, rental_id):
+        """停止监视一个租赁，堆中残留的条目在出堆时丢弃"""
+        with self._cond:
+            self._entries.pop(rental_id, None)
+
+    def is_watching(self, rental_id):
+        """检查租赁是否在监视中"""
+        return rental_id in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _schedule(self, entry, when):
+        """安排下次检查，不晚于到期时间（需持有锁）"""
+        entry.next_check_ts = min(when, entry.expiry_ts)
+        heapq.heappush(self._heap, (entry.next_check_ts, next(self._seq), entry.rental_id))
+
+    def _run(self):
+        """调度循环"""
+        while self.is_running:
+            batch = self._take_due_batch()
+            now = time.time()
+            if batch:
+                # 本批中最早的计划检查时间落后了多久
+                WATCHER_LAG.set(max(0.0, now - min(entry.next_check_ts for entry in batch)))
+
+            checks = []
+            for entry in batch:
+                if now >= entry.expiry_ts:
+                    self._dispatch(self._expire, entry)
+                else:
+                    checks.append(entry)
+
+            if self.energy_prefilter and checks:
+                checks = self._filter_unchanged(checks)
+            for entry in checks:
+                self._dispatch(self._check, entry)
+
+    def _filter_unchanged(self, entries):
+        """批量读取可用能量，返回需要查询交易历史的条目，其余条目直接安排下次检查"""
+        try:
+            with request_priority(WATCH):
+                energies = self.tron_client.get_accounts_energy([entry.address for entry in entries], fresh=True)
+        except Exception as e:
+            logger.error(f"批量查询租赁地址能量时出错: {str(e)}")
+            return entries
+
+        pending = []
+        for entry, energy in zip(entries, energies):
+            previous = entry.energy
+            if energy is not None:
+                # 能量减少后也更新基准，之后只有再次减少才查询交易历史
+                entry.energy = energy
+            if energy is not None and previous is not None and energy >= previous:
+                # 没有消耗能量，不会有新的TRC20转账
+                self._reschedule(entry)
+                continue
+            pending.append(entry)
+        return pending
+
+    def _reschedule(self, entry):
+        """检查结束，安排下次检查"""
+        with self._cond:
+            entry.in_flight = False
+            if self._entries.get(entry.rental_id) is entry:
+                # 节点限流时推迟到暂停结束后再检查
+                delay = max(self.check_interval, rate_limiter.retry_after())
+                self._schedule(entry, time.time() + delay)
+                self._cond.notify()
+
+    def _take_due_batch(self):
+        """等待并取出一批到期的条目"""
+        with self._cond:
+            while self.is_running:
+                # 丢弃已取消或已被重新安排的堆条目
+                while self._heap:
+                    ts, _, rental_id = self._heap[0]
+                    entry = self._entries.get(rental_id)
+                    if entry is None or entry.in_flight or entry.next_check_ts != ts:
+                        heapq.heappop(self._heap)
+                        continue
+                    break
+
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                delay = self._heap[0][0] - time.time()
+                if delay > 0:
+                    self._cond.wait(timeout=delay)
+                    continue
+
+                now = time.time()
+                batch = []
+                while self._heap and len(batch) < self.batch_size and self._heap[0][0] <= now:
+                    _, _, rental_id = heapq.heappop(self._heap)
+                    entry = self._entries.get(rental_id)
+                    if entry is None or entry.in_flight:
+                        continue
+                    entry.in_flight = True
+                    batch.append(entry)
+
+                if batch:
+                    return batch
+            return []
+
+    def _dispatch(self, func, entry):
+        """在线程池中执行任务，池满时阻塞等待空位"""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(func, entry)
+        except RuntimeError:
+            # 线程池已关闭
+            self._slots.release()
+            return
+        future.add_done_callback(lambda _: self._slots.release())
+
+    def _check(self, entry):
+        """检查租赁地址是否进行了TRC20转账"""
+        tx_id = None
+        try:
+            tx_id = self.tron_client.check_trc20_transfer(entry.address, entry.start_time)
+        except Exception as e:
+            logger.error(f"监控用户 {entry.address} 交易时出错: {str(e)}")
+
+        if tx_id:
+            logger.info(f"检测到用户 {entry.address} 进行了TRC20转账，交易ID: {tx_id}")
+            self.unwatch(entry.rental_id)
+            try:
+                self.on_usage(entry.rental_id, tx_id)
+            except Exception as e:
+                logger.error(f"处理租赁 {entry.rental_id} 的使用事件时出错: {str(e)}")
+            return
+
+        self._reschedule(entry)
+
+    def _expire(self, entry):
+        """租赁到期，停止监视并回调"""
+        self.unwatch(entry.rental_id)
+        if self.on_expired is None:
+            return
+        try:
+            self.on_expired(entry.rental_id)
+        except Exception as e:
+            logger.error(f"处理租赁 {entry.rental_id} 的到期事件时出错: {str(e)}")
+
+
+def _to_timestamp(dt):
+    """将UTC datetime转换为时间戳（秒）"""
+    if isinstance(dt, (int, float)):
+        return float(dt)
+    return (dt - _EPOCH).total_seconds()
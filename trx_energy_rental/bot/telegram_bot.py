@@ -1,10 +1,15 @@
 import logging
 import re
+import threading
+import time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Updater, CommandHandler, MessageHandler, Filters, CallbackContext, CallbackQueryHandler
 from ..blockchain.energy_service import EnergyRentalService
 from ..blockchain.tron_client import TronClient
 from ..database.models import EnergyRental, User, db
+from ..database.session import SessionManager
+from ..utils.event_bus import event_bus, PAYMENT_SEEN, DELEGATED, FAILED
+from ..utils.metrics import start_exporter
 from ..config import settings
 
 # 配置日志
@@ -20,8 +25,15 @@ class TelegramBot:
     def __init__(self, db_session=None):
         self.token = settings.TELEGRAM_BOT_TOKEN
         self.db_session = db_session
+        # 处理函数运行在机器人的工作线程中，各自使用独立的会话
+        self.sessions = SessionManager()
         self.energy_service = EnergyRentalService(db_session)
         self.tron_client = TronClient()
+        self.updater = None
+        
+        # 等待付款的消息：地址 -> [(chat_id, message_id, 截止时间)]，收到租赁事件后直接更新
+        self._payment_watches = {}
+        self._watch_lock = threading.Lock()
         
         # 检查Token是否设置
         if not self.token:
@@ -32,27 +44,35 @@ class TelegramBot:
         """启动机器人"""
         # 创建Updater并传入Token
         updater = Updater(self.token)
+        self.updater = updater
         
         # 获取调度程序注册处理程序
         dp = updater.dispatcher
         
+        # 所有处理函数都在各自的会话范围内执行，结束时提交或回滚并归还连接
+        scoped = self.sessions.scoped
+        
         # 注册命令处理程序
-        dp.add_handler(CommandHandler("start", self.start_command))
-        dp.add_handler(CommandHandler("help", self.help_command))
-        dp.add_handler(CommandHandler("rent", self.rent_command))
-        dp.add_handler(CommandHandler("status", self.status_command))
-        dp.add_handler(CommandHandler("address", self.address_command))
-        dp.add_handler(CommandHandler("recover", self.recover_command))
+        dp.add_handler(CommandHandler("start", scoped(self.start_command)))
+        dp.add_handler(CommandHandler("help", scoped(self.help_command)))
+        dp.add_handler(CommandHandler("rent", scoped(self.rent_command)))
+        dp.add_handler(CommandHandler("status", scoped(self.status_command)))
+        dp.add_handler(CommandHandler("address", scoped(self.address_command)))
+        dp.add_handler(CommandHandler("recover", scoped(self.recover_command)))
         
         # 注册消息处理程序
-        dp.add_handler(MessageHandler(Filters.text & ~Filters.command, self.handle_message))
+        dp.add_handler(MessageHandler(Filters.text & ~Filters.command, scoped(self.handle_message)))
         
         # 注册回调查询处理程序
-        dp.add_handler(CallbackQueryHandler(self.button_callback))
+        dp.add_handler(CallbackQueryHandler(scoped(self.button_callback)))
         
         # 注册错误处理程序
         dp.add_error_handler(self.error_handler)
         
+        # 订阅租赁事件，付款状态变化时主动更新消息
+        for event_type in (PAYMENT_SEEN, DELEGATED, FAILED):
+            event_bus.subscribe(event_type, self._on_rental_event)
+        
         # 启动机器人
         updater.start_polling()
         logger.info("Telegram机器人已启动")
@@ -112,6 +132,11 @@ class TelegramBot:
             update.message.reply_text("请提供有效的TRON地址")
             return
         
+        # 能量池余量不足时不接受新的租赁，避免用户付款后无法代理
+        if not self.tron_client.has_pool_capacity():
+            update.message.reply_text("当前可出租的能量不足，请稍后再试")
+            return
+        
         # 检查用户是否已有足够能量
         if self.tron_client.check_enough_energy(tron_address):
             update.message.reply_text(f"地址 {tron_address} 已有足够能量，不需要租赁")
@@ -133,7 +158,8 @@ class TelegramBot:
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        update.message.reply_text(payment_info, parse_mode='Markdown', reply_markup=reply_markup)
+        message = update.message.reply_text(payment_info, parse_mode='Markdown', reply_markup=reply_markup)
+        self._watch_payment(tron_address, message.chat_id, message.message_id)
     
     def status_command(self, update: Update, context: CallbackContext):
         """处理/status命令"""
@@ -245,58 +271,97 @@ class TelegramBot:
             # 检查支付状态
             tron_address = callback_data.split(":")[1]
             
-            # 查询该地址的活跃租赁
-            rental = EnergyRental.query.filter_by(
-                rental_address=tron_address,
-                status='active'
-            ).first()
+            # 一次查询获取该地址最相关的租赁
+            rental = EnergyRental.resolve_latest(tron_address)
+            status = rental.status if rental else None
             
-            if rental:
-                query.edit_message_text(
-                    f"您的支付已确认，能量已成功租赁给地址 {tron_address}\n"
-                    f"租赁能量：{rental.energy_amount}\n"
-                    f"租赁时间：{settings.RENTAL_TIME} 分钟\n\n"
-                    "注意：\n"
-                    "1. 如果您在此期间进行TRC20转账，系统将立即回收剩余能量\n"
-                    "2. 租赁将在10分钟后自动过期"
-                )
-            else:
-                # 查询该地址的待处理租赁
-                pending_rental = EnergyRental.query.filter_by(
-                    rental_address=tron_address,
-                    status='pending'
-                ).first()
-                
-                if pending_rental:
-                    query.edit_message_text(
-                        "您的支付已收到，系统正在处理中...\n"
-                        "请稍后再次检查状态"
-                    )
+            text, reply_markup = self._payment_reply(
+                tron_address, status, rental.energy_amount if rental else None
+            )
+            query.edit_message_text(text=text, reply_markup=reply_markup)
+            
+            # 尚未完成时等待租赁事件，状态变化后自动更新这条消息
+            if status not in ('active', 'failed'):
+                self._watch_payment(tron_address, query.message.chat_id, query.message.message_id)
+    
+    def _payment_reply(self, tron_address, status, energy_amount=None):
+        """根据租赁状态生成付款状态消息，返回 (文本, 键盘)"""
+        if status == 'active':
+            return (
+                f"您的支付已确认，能量已成功租赁给地址 {tron_address}\n"
+                f"租赁能量：{energy_amount}\n"
+                f"租赁时间：{settings.RENTAL_TIME} 分钟\n\n"
+                "注意：\n"
+                "1. 如果您在此期间进行TRC20转账，系统将立即回收剩余能量\n"
+                "2. 租赁将在10分钟后自动过期"
+            ), None
+        
+        if status == 'pending':
+            return (
+                "您的支付已收到，系统正在处理中...\n"
+                "请稍后再次检查状态"
+            ), None
+        
+        if status == 'failed':
+            return (
+                "租赁处理失败，请联系管理员解决\n"
+                "或使用 /rent 命令重新尝试"
+            ), None
+        
+        # 未检测到支付或租赁记录
+        keyboard = [
+            [InlineKeyboardButton("再次检查", callback_data=f"check_payment:{tron_address}")]
+        ]
+        msg_text = (
+            f"尚未检测到您的支付\n"
+            f"请向地址 {self.tron_client.monitor_address} 支付 {settings.RENTAL_PRICE} TRX\n"
+            f"支付完成后点击\"再次检查\"按钮"
+        )
+        return msg_text, InlineKeyboardMarkup(keyboard)
+    
+    def _watch_payment(self, tron_address, chat_id, message_id):
+        """记录等待付款的消息，收到该地址的租赁事件时更新"""
+        now = time.monotonic()
+        deadline = now + settings.BOT_PAYMENT_WATCH_MINUTES * 60
+        
+        with self._watch_lock:
+            # 清理超时的记录
+            for address in list(self._payment_watches):
+                watches = [w for w in self._payment_watches[address] if w[2] > now]
+                if watches:
+                    self._payment_watches[address] = watches
                 else:
-                    # 查询是否有失败的租赁
-                    failed_rental = EnergyRental.query.filter_by(
-                        rental_address=tron_address,
-                        status='failed'
-                    ).order_by(EnergyRental.updated_at.desc()).first()
-                    
-                    if failed_rental:
-                        query.edit_message_text(
-                            "租赁处理失败，请联系管理员解决\n"
-                            "或使用 /rent 命令重新尝试"
-                        )
-                    else:
-                        # 未检测到支付或租赁记录
-                        keyboard = [
-                            [InlineKeyboardButton("再次检查", callback_data=f"check_payment:{tron_address}")]
-                        ]
-                        reply_markup = InlineKeyboardMarkup(keyboard)
-                        
-                        msg_text = (
-                            f"尚未检测到您的支付\n"
-                            f"请向地址 {self.tron_client.monitor_address} 支付 {settings.RENTAL_PRICE} TRX\n"
-                            f"支付完成后点击\"再次检查\"按钮"
-                        )
-                        query.edit_message_text(text=msg_text, reply_markup=reply_markup)
+                    del self._payment_watches[address]
+            
+            watches = self._payment_watches.setdefault(tron_address, [])
+            if not any(w[0] == chat_id and w[1] == message_id for w in watches):
+                watches.append((chat_id, message_id, deadline))
+    
+    def _on_rental_event(self, event):
+        """收到租赁事件，更新等待该地址付款的消息"""
+        tron_address = event.get('rental_address')
+        finished = event['type'] in (DELEGATED, FAILED)
+        
+        with self._watch_lock:
+            if finished:
+                watches = self._payment_watches.pop(tron_address, [])
+            else:
+                watches = list(self._payment_watches.get(tron_address, []))
+        
+        if not watches or not self.updater:
+            return
+        
+        text, reply_markup = self._payment_reply(tron_address, event.get('status'), event.get('energy_amount'))
+        for chat_id, message_id, _ in watches:
+            try:
+                self.updater.bot.edit_message_text(
+                    text=text,
+                    chat_id=chat_id,
+                    message_id=message_id,
+                    reply_markup=reply_markup
+                )
+            except Exception as e:
+                logger.error(f"更新付款状态消息失败: {str(e)}")
     
     def error_handler(self, update: Update, context: CallbackContext):
         """处理错误"""
@@ -350,7 +415,10 @@ def main():
     from ..app import create_app
     from ..database.models import db
     
-    app = create_app()
+    app = create_app(role='bot')
+    
+    # 独立的指标导出服务
+    start_exporter(settings.BOT_METRICS_PORT, settings.METRICS_HOST, settings.METRICS_TOKEN)
     
     # 在应用上下文中运行机器人
     with app.app_context():
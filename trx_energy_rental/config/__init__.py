@@ -2,4 +2,8 @@
 配置模块
 
 管理系统配置，加载环境变量和设置参数。
-""" 
\ No newline at end of file
+"""
+
+from .settings import validate_config
+
+__all__ = ['validate_config']
@@ -6,6 +6,10 @@ from pathlib import Path
 env_path = Path(__file__).parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
+# 布尔配置：true、1、t、yes（不区分大小写）为真
+def env_bool(name, default):
+    return os.getenv(name, str(default)).strip().lower() in ('true', '1', 't', 'yes')
+
 # Flask配置
 SECRET_KEY = os.getenv('SECRET_KEY', 'default-secret-key')
 FLASK_APP = os.getenv('FLASK_APP', 'app.py')
@@ -13,11 +17,47 @@ FLASK_ENV = os.getenv('FLASK_ENV', 'development')
 
 # 数据库配置
 DATABASE_URL = os.getenv('DATABASE_URL')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))  # 连接池大小
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))  # 连接池满时允许额外创建的连接数
 
 # TRON网络配置
 TRON_NETWORK = os.getenv('TRON_NETWORK', 'nile')
-TRON_GRID_API = os.getenv('TRON_GRID_API')
-TRON_FULL_NODE_API = os.getenv('TRON_FULL_NODE_API')
+TRON_GRID_API = os.getenv('TRON_GRID_API')  # TronGrid接口地址，多个用逗号分隔，未配置时使用全节点
+TRON_FULL_NODE_API = os.getenv('TRON_FULL_NODE_API')  # 全节点地址，多个用逗号分隔，未配置时使用网络的默认节点
+TRON_REQUEST_TIMEOUT = float(os.getenv('TRON_REQUEST_TIMEOUT', 10))  # 单次请求超时（秒）
+NODE_MAX_ATTEMPTS = int(os.getenv('NODE_MAX_ATTEMPTS', 3))  # 读请求失败时最多尝试的节点数
+NODE_FAILURE_THRESHOLD = int(os.getenv('NODE_FAILURE_THRESHOLD', 3))  # 节点连续失败多少次后暂停使用
+NODE_COOLDOWN = float(os.getenv('NODE_COOLDOWN', 30))  # 节点暂停使用的时间（秒）
+NODE_HEALTH_INTERVAL = float(os.getenv('NODE_HEALTH_INTERVAL', 15))  # 后台健康检查的间隔（秒）
+TRON_RATE_LIMIT = float(os.getenv('TRON_RATE_LIMIT', 15))  # 每秒最多发出的节点请求数（API密钥配额），0为不限流
+TRON_RATE_BURST = int(os.getenv('TRON_RATE_BURST', 30))  # 允许的突发请求数
+TRON_RATE_WATCH_MAX_WAIT = float(os.getenv('TRON_RATE_WATCH_MAX_WAIT', 5))  # 使用监视请求最长排队时间（秒）
+TRON_RATE_USER_MAX_WAIT = float(os.getenv('TRON_RATE_USER_MAX_WAIT', 2))  # 用户能量查询最长排队时间（秒）
+
+# 批量代理配置
+DELEGATION_BATCH_SIZE = int(os.getenv('DELEGATION_BATCH_SIZE', 50))  # 每批最多代理的租赁数量
+DELEGATION_BATCH_WAIT = float(os.getenv('DELEGATION_BATCH_WAIT', 0.2))  # 凑批的最长等待时间（秒）
+
+# 本地签名配置
+LOCAL_SIGNING = env_bool('LOCAL_SIGNING', True)  # 本地编码并签名代理/回收交易
+AGENT_PERMISSION_ID = int(os.getenv('AGENT_PERMISSION_ID', 0))  # B地址使用的权限ID，0表示owner权限
+REF_BLOCK_REFRESH_INTERVAL = float(os.getenv('REF_BLOCK_REFRESH_INTERVAL', 30))  # 引用区块刷新间隔（秒）
+REF_BLOCK_MAX_AGE = float(os.getenv('REF_BLOCK_MAX_AGE', 600))  # 引用区块最长使用时间（秒）
+
+# 账户资源缓存配置
+ENERGY_CACHE_TTL = float(os.getenv('ENERGY_CACHE_TTL', 5))  # 缓存有效期（秒），0表示不缓存
+ENERGY_CACHE_SIZE = int(os.getenv('ENERGY_CACHE_SIZE', 10000))  # 最多缓存的地址数量
+ENERGY_BATCH_WORKERS = int(os.getenv('ENERGY_BATCH_WORKERS', 32))  # 批量查询能量的并发数
+ENERGY_BATCH_MAX_ADDRESSES = int(os.getenv('ENERGY_BATCH_MAX_ADDRESSES', 1000))  # 批量查询接口每次最多的地址数量
+
+# 能量池容量配置
+CAPACITY_REFRESH_INTERVAL = float(os.getenv('CAPACITY_REFRESH_INTERVAL', 30))  # 从链上刷新A地址可代理能量的间隔（秒）
+CAPACITY_RESERVE_ENERGY = int(os.getenv('CAPACITY_RESERVE_ENERGY', 0))  # A地址保留不出租的能量
+CAPACITY_QUEUE_MINUTES = int(os.getenv('CAPACITY_QUEUE_MINUTES', 30))  # 已付款租赁等待能量池容量的最长时间（分钟）
+
+# 异步客户端配置
+ASYNC_TRON_MAX_CONNECTIONS = int(os.getenv('ASYNC_TRON_MAX_CONNECTIONS', 100))  # 连接池大小
+ASYNC_TRON_MAX_CONCURRENCY = int(os.getenv('ASYNC_TRON_MAX_CONCURRENCY', 200))  # 同时进行的请求上限
 
 # 地址配置
 OWNER_ADDRESS = os.getenv('OWNER_ADDRESS')
@@ -27,6 +67,10 @@ MONITOR_ADDRESS = os.getenv('MONITOR_ADDRESS')
 # 私钥配置
 AGENT_PRIVATE_KEY = os.getenv('AGENT_PRIVATE_KEY')
 
+# 能量池账户配置
+OWNER_POOL = os.getenv('OWNER_POOL', '')  # 多个账户，格式：A地址,B地址,B地址私钥;A地址,B地址,B地址私钥。未配置时使用上面的单个账户
+OWNER_MAX_PARALLEL = int(os.getenv('OWNER_MAX_PARALLEL', 10))  # 每个账户同时签名和广播的交易数量
+
 # Telegram机器人配置
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 
@@ -36,6 +80,54 @@ RENTAL_ENERGY = int(os.getenv('RENTAL_ENERGY', 11800))
 RENTAL_TIME = int(os.getenv('RENTAL_TIME', 10))
 MIN_USER_ENERGY = int(os.getenv('MIN_USER_ENERGY', 60000))
 
+# 付款监听配置
+PAYMENT_POLL_INTERVAL = float(os.getenv('PAYMENT_POLL_INTERVAL', 3))  # 轮询间隔（秒）
+PAYMENT_PAGE_SIZE = int(os.getenv('PAYMENT_PAGE_SIZE', 200))  # 每页交易数量（TronGrid上限200）
+PAYMENT_LOOKBACK_MINUTES = int(os.getenv('PAYMENT_LOOKBACK_MINUTES', 5))  # 首次启动时回看的时间
+
+# 租赁使用监视配置
+WATCHER_CHECK_INTERVAL = float(os.getenv('WATCHER_CHECK_INTERVAL', 3))  # 每个租赁的检查间隔（秒）
+WATCHER_MAX_WORKERS = int(os.getenv('WATCHER_MAX_WORKERS', 16))  # 检查线程池大小
+WATCHER_BATCH_SIZE = int(os.getenv('WATCHER_BATCH_SIZE', 100))  # 每批取出的最大检查数量
+WATCHER_ENERGY_PREFILTER = env_bool('WATCHER_ENERGY_PREFILTER', True)  # 能量未减少的地址跳过交易历史查询
+USAGE_BLOCK_SCANNER = env_bool('USAGE_BLOCK_SCANNER', True)  # 扫描新区块检测使用，关闭时逐个地址查询交易历史
+BLOCK_SCAN_INTERVAL = float(os.getenv('BLOCK_SCAN_INTERVAL', 3))  # 区块扫描间隔（秒），与出块间隔一致
+BLOCK_SCAN_MAX_BLOCKS = int(os.getenv('BLOCK_SCAN_MAX_BLOCKS', 100))  # 每次请求读取的最大区块数（节点上限100）
+TRC20_DECODER_NUMPY = env_bool('TRC20_DECODER_NUMPY', True)  # 安装了NumPy时批量解码TRC20调用数据
+TRC20_ADDRESS_CACHE_SIZE = int(os.getenv('TRC20_ADDRESS_CACHE_SIZE', 65536))  # 缓存的地址格式转换结果数量
+
+# 过期回收配置
+EXPIRY_CHUNK_SIZE = int(os.getenv('EXPIRY_CHUNK_SIZE', 500))  # 每块读取和更新的过期租赁数量
+EXPIRY_BATCH_WINDOW = float(os.getenv('EXPIRY_BATCH_WINDOW', 0.2))  # 合并为一批回收的到期时间窗口（秒）
+EXPIRY_RETRY_SECONDS = int(os.getenv('EXPIRY_RETRY_SECONDS', 30))  # 到期回收失败后重试的间隔（秒）
+EXPIRY_SWEEP_MINUTES = int(os.getenv('EXPIRY_SWEEP_MINUTES', 10))  # 全表扫描过期租赁的兜底间隔（分钟）
+
+# 监控分片配置
+MONITOR_SHARD_COUNT = int(os.getenv('MONITOR_SHARD_COUNT', 1))  # 监控进程总数，按地址哈希分配租赁
+MONITOR_SHARD_INDEX = int(os.getenv('MONITOR_SHARD_INDEX', 0))  # 当前进程的分片编号（0 到 MONITOR_SHARD_COUNT-1）
+MONITOR_WORKER_ID = os.getenv('MONITOR_WORKER_ID')  # 租约持有者标识，默认为 主机名:进程号
+LEASE_TTL = float(os.getenv('LEASE_TTL', 15))  # 付款摄取租约的有效期（秒）
+CLAIM_LEASE_SECONDS = int(os.getenv('CLAIM_LEASE_SECONDS', 120))  # 认领付款后完成代理的租约时长（秒）
+
+# 支付状态推送配置
+PAYMENT_EVENTS_TIMEOUT = float(os.getenv('PAYMENT_EVENTS_TIMEOUT', 300))  # 单个推送连接的最长保持时间（秒）
+PAYMENT_EVENTS_RECHECK = float(os.getenv('PAYMENT_EVENTS_RECHECK', 15))  # 无通知时复查数据库并发送心跳的间隔（秒）
+PAYMENT_EVENTS_MAX_STREAMS = int(os.getenv('PAYMENT_EVENTS_MAX_STREAMS', 50))  # 每个Web进程同时保持的推送连接数上限，每个连接占用一个工作线程，需小于工作线程数
+
+# 事件总线配置
+EVENT_BUS_BACKEND = os.getenv('EVENT_BUS_BACKEND', 'database')  # memory: 仅进程内; database: 通过数据库在进程间传递
+EVENT_BUS_POLL_INTERVAL = float(os.getenv('EVENT_BUS_POLL_INTERVAL', 0.1))  # 拉取其他进程事件的间隔（秒）
+EVENT_BUS_RETENTION_MINUTES = int(os.getenv('EVENT_BUS_RETENTION_MINUTES', 60))  # 事件在数据库中的保留时间
+EVENT_BUS_LOOKBACK_SECONDS = float(os.getenv('EVENT_BUS_LOOKBACK_SECONDS', 30))  # 等待较小ID的事件晚提交的时间（秒）
+BOT_PAYMENT_WATCH_MINUTES = int(os.getenv('BOT_PAYMENT_WATCH_MINUTES', 30))  # 机器人自动更新付款消息的最长时间
+
+# 监控指标配置
+METRICS_ENABLED = env_bool('METRICS_ENABLED', False)  # Web应用提供 /metrics 接口
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # 设置后 /metrics 需携带 Authorization: Bearer <令牌>（Web应用和独立导出服务）
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')  # 独立指标导出服务的监听地址，默认只允许本机访问
+MONITOR_METRICS_PORT = int(os.getenv('MONITOR_METRICS_PORT', 0))  # trx-monitor 的指标导出端口，0为不启动
+BOT_METRICS_PORT = int(os.getenv('BOT_METRICS_PORT', 0))  # trx-bot 的指标导出端口，0为不启动
+
 # 检查必需的配置
 def validate_config():
     required_configs = [
@@ -44,6 +136,11 @@ def validate_config():
         'TELEGRAM_BOT_TOKEN'
     ]
     
+    # 配置了能量池账户时不再需要单个账户的配置
+    if OWNER_POOL:
+        required_configs = [config for config in required_configs
+                            if config not in ('OWNER_ADDRESS', 'AGENT_ADDRESS', 'AGENT_PRIVATE_KEY')]
+    
     missing_configs = []
     for config in required_configs:
         if not globals().get(config):
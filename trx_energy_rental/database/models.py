@@ -1,5 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+from ..config import settings
 
 db = SQLAlchemy()
 
@@ -26,6 +28,14 @@ class User(db.Model):
 class EnergyRental(db.Model):
     """能量租赁记录模型"""
     __tablename__ = 'energy_rentals'
+    __table_args__ = (
+        # 支付交易ID唯一，在数据库层面保证同一笔付款只生成一条租赁
+        db.UniqueConstraint('payment_txid', name='uq_energy_rentals_payment_txid'),
+        # 按地址和状态查询：支付状态检查、机器人状态查询、手动回收
+        db.Index('ix_energy_rentals_address_status', 'rental_address', 'status'),
+        # 按状态和到期时间查询：过期租赁检查
+        db.Index('ix_energy_rentals_status_expiry', 'status', 'expiry_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
@@ -37,6 +47,9 @@ class EnergyRental(db.Model):
     status = db.Column(db.String(20), nullable=False, default='pending')  # pending, active, completed, failed
     expiry_time = db.Column(db.DateTime, nullable=False)  # 到期时间
     actual_usage_txid = db.Column(db.String(64), nullable=True)  # 实际使用能量的交易ID
+    owner_address = db.Column(db.String(34), nullable=True)  # 代理能量的能量池账户（A地址），为空表示第一个账户
+    claimed_by = db.Column(db.String(128), nullable=True)  # 正在处理该付款的工作进程
+    claim_expires_at = db.Column(db.DateTime, nullable=True)  # 处理租约到期时间，过期后可被其他进程接管
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -56,6 +69,167 @@ class EnergyRental(db.Model):
         
         delta = self.expiry_time - datetime.utcnow()
         return max(0, int(delta.total_seconds() / 60))
+    
+    # 支付状态查询时的优先级：活跃 > 处理中 > 失败
+    STATUS_PRIORITY = ('active', 'pending', 'failed')
+    
+    @classmethod
+    def latest_query(cls, rental_address):
+        """按支付状态优先级排序的地址租赁查询，走 (rental_address, status) 索引"""
+        priority = db.case(
+            {status: rank for rank, status in enumerate(cls.STATUS_PRIORITY)},
+            value=cls.status
+        )
+        return cls.query.filter(
+            cls.rental_address == rental_address,
+            cls.status.in_(cls.STATUS_PRIORITY)
+        ).order_by(priority, cls.updated_at.desc())
+    
+    @classmethod
+    def resolve_latest(cls, rental_address):
+        """获取地址当前最相关的租赁（活跃优先，其次处理中，最后是最近失败的）
+        
+        一次查询完成；没有相关租赁时返回None。
+        """
+        return cls.latest_query(rental_address).first()
+    
+    @classmethod
+    def claim_payment(cls, payment_txid, rental_address, holder, energy_amount=None,
+                      expiry_time=None, lease_seconds=None, session=None, owner_address=None):
+        """认领一笔付款并取得处理租约
+        
+        以插入 payment_txid 唯一的租赁记录完成认领，并发认领同一付款时只有一个成功。
+        若记录已存在，但仍处于待处理、尚未代理且租约已过期（原处理进程中断），则接管该租约。
+        成功返回处于 pending 状态、由 holder 持有租约的租赁记录，付款已被认领时返回None。
+        """
+        session = session or db.session
+        now = datetime.utcnow()
+        lease_expires_at = now + timedelta(seconds=lease_seconds or settings.CLAIM_LEASE_SECONDS)
+        
+        rental = cls(
+            rental_address=rental_address,
+            energy_amount=energy_amount or settings.RENTAL_ENERGY,
+            payment_txid=payment_txid,
+            status='pending',
+            expiry_time=expiry_time or now + timedelta(minutes=settings.RENTAL_TIME),
+            claimed_by=holder,
+            claim_expires_at=lease_expires_at,
+            owner_address=owner_address
+        )
+        try:
+            session.add(rental)
+            session.commit()
+            return rental
+        except IntegrityError:
+            session.rollback()
+        
+        # 付款已有记录，尝试接管中断的处理
+        taken = session.query(cls).filter(
+            cls.payment_txid == payment_txid,
+            cls.status == 'pending',
+            cls.delegate_txid.is_(None),
+            cls.claim_available(now)
+        ).update({
+            cls.claimed_by: holder,
+            cls.claim_expires_at: lease_expires_at
+        }, synchronize_session=False)
+        session.commit()
+        
+        if taken != 1:
+            return None
+        return session.query(cls).filter_by(payment_txid=payment_txid).first()
+    
+    @classmethod
+    def claim_available(cls, now=None):
+        """无人持有处理租约（从未认领、已释放或租约已过期）的查询条件"""
+        now = now or datetime.utcnow()
+        return db.or_(cls.claim_expires_at.is_(None), cls.claim_expires_at < now)
+    
+    def claim(self, holder, lease_seconds=None, session=None):
+        """认领一个待处理、尚未代理且无人持有租约的租赁（例如等待能量池容量的租赁）"""
+        session = session or db.session
+        now = datetime.utcnow()
+        claimed = session.query(EnergyRental).filter(
+            EnergyRental.id == self.id,
+            EnergyRental.status == 'pending',
+            EnergyRental.delegate_txid.is_(None),
+            EnergyRental.claim_available(now)
+        ).update({
+            EnergyRental.claimed_by: holder,
+            EnergyRental.claim_expires_at: now + timedelta(seconds=lease_seconds or settings.CLAIM_LEASE_SECONDS)
+        }, synchronize_session=False)
+        session.commit()
+        return claimed == 1
+    
+    @classmethod
+    def renew_claims(cls, rental_ids, holder, lease_seconds=None, session=None):
+        """延长 holder 持有的一批处理租约，返回续约成功（仍由 holder 持有）的租赁ID集合
+        
+        租约已被其他进程接管或已释放的租赁不在返回结果中。
+        """
+        session = session or db.session
+        rental_ids = list(rental_ids)
+        if not rental_ids:
+            return set()
+        lease_expires_at = datetime.utcnow() + timedelta(seconds=lease_seconds or settings.CLAIM_LEASE_SECONDS)
+        session.query(cls).filter(
+            cls.id.in_(rental_ids),
+            cls.claimed_by == holder
+        ).update({cls.claim_expires_at: lease_expires_at}, synchronize_session=False)
+        session.commit()
+        return {rental_id for (rental_id,) in session.query(cls.id).filter(
+            cls.id.in_(rental_ids),
+            cls.claimed_by == holder
+        )}
+    
+    def release_claim(self):
+        """处理完成后释放租约，随租赁状态一起提交"""
+        self.claimed_by = None
+        self.claim_expires_at = None
+
+
+class MonitorCursor(db.Model):
+    """监听游标模型，记录付款摄取已处理到的位置"""
+    __tablename__ = 'monitor_cursors'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), unique=True, nullable=False)  # 游标名称，例如 payments:<监听地址>
+    block_number = db.Column(db.BigInteger, nullable=False, default=0)  # 最后处理的区块号
+    block_timestamp = db.Column(db.BigInteger, nullable=False, default=0)  # 最后处理的区块时间（毫秒）
+    last_txid = db.Column(db.String(64), nullable=True)  # 最后处理的交易ID
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<MonitorCursor {self.name} @ {self.block_number}>'
+
+
+class ServiceLease(db.Model):
+    """服务租约模型，多个监控进程通过租约选出付款摄取的执行者"""
+    __tablename__ = 'service_leases'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), unique=True, nullable=False)  # 租约名称，例如 payment_ingestion
+    holder = db.Column(db.String(128), nullable=False)  # 持有者标识
+    expires_at = db.Column(db.DateTime, nullable=False)  # 到期时间，持有者需在此之前续约
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ServiceLease {self.name} - {self.holder}>'
+
+
+class RentalEvent(db.Model):
+    """租赁生命周期事件，供Web、机器人和监控进程之间通过事件总线传递"""
+    __tablename__ = 'rental_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(32), nullable=False)  # payment_seen, delegated, usage_detected, recovered, failed
+    rental_id = db.Column(db.Integer, nullable=True)
+    rental_address = db.Column(db.String(34), nullable=True)
+    payload = db.Column(db.Text, nullable=False)  # JSON格式的事件内容
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<RentalEvent {self.id} {self.event_type}>'
 
 
 class SystemStatus(db.Model):
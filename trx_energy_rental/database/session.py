@@ -0,0 +1,71 @@
+import logging
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, has_app_context
+
+from .models import db
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def engine_options(database_uri, pool_size=10, max_overflow=20, pool_recycle=3600):
+    """生成连接池配置，SQLite使用SQLAlchemy的默认连接池"""
+    options = {'pool_pre_ping': True}
+    if database_uri and not database_uri.startswith('sqlite'):
+        options.update(pool_size=pool_size, max_overflow=max_overflow, pool_recycle=pool_recycle)
+    return options
+
+
+class SessionManager:
+    """后台线程的数据库会话管理
+
+    Flask-SQLAlchemy 的会话按线程隔离，但只能在应用上下文中使用。session_scope 为没有
+    应用上下文的工作线程临时推入一个上下文，得到该线程独立的短生命周期会话（连接来自
+    共享的连接池），正常结束时提交、出错时回滚，退出时关闭会话并归还连接。
+    已处于应用上下文中时直接使用当前会话，只负责提交或回滚。
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        if app is None and has_app_context():
+            self.app = current_app._get_current_object()
+
+    def init_app(self, app):
+        """绑定Flask应用"""
+        self.app = app
+
+    @contextmanager
+    def session_scope(self):
+        """提供一个事务范围内的会话"""
+        if has_app_context():
+            yield from self._run_in_session()
+            return
+
+        if self.app is None:
+            raise RuntimeError("会话管理器未绑定Flask应用")
+
+        with self.app.app_context():
+            # 应用上下文结束时 Flask-SQLAlchemy 会关闭本线程的会话
+            yield from self._run_in_session()
+
+    def _run_in_session(self):
+        """提交或回滚当前会话"""
+        try:
+            yield db.session
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def scoped(self, func):
+        """包装函数，使其在 session_scope 中执行（用于线程池回调和机器人处理函数）"""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.session_scope():
+                return func(*args, **kwargs)
+        return wrapper
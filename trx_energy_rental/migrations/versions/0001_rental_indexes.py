@@ -0,0 +1,82 @@
+"""energy_rentals 热点查询索引及 payment_txid 唯一约束
+
+Revision ID: 0001_rental_indexes
+Revises: 
+Create Date: 2026-10-17 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_rental_indexes'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _existing_names(inspector):
+    """已存在的索引和唯一约束名称（新库可能已由 db.create_all 创建）"""
+    names = {ix['name'] for ix in inspector.get_indexes('energy_rentals')}
+    names.update(uc['name'] for uc in inspector.get_unique_constraints('energy_rentals'))
+    return names
+
+
+def upgrade():
+    bind = op.get_bind()
+    existing = _existing_names(sa.inspect(bind))
+
+    # 旧版本手动代理统一使用 manual_operation 作为支付交易ID，先改为唯一值
+    rentals = sa.table(
+        'energy_rentals',
+        sa.column('id', sa.Integer),
+        sa.column('payment_txid', sa.String),
+        sa.column('delegate_txid', sa.String),
+        sa.column('status', sa.String)
+    )
+    duplicated = bind.execute(
+        sa.select(rentals.c.id).where(rentals.c.payment_txid == 'manual_operation')
+    ).fetchall()
+    for (rental_id,) in duplicated:
+        op.execute(
+            rentals.update()
+            .where(rentals.c.id == rental_id)
+            .values(payment_txid=f'manual_{rental_id}')
+        )
+
+    # 摄取竞争可能为同一付款创建了多条租赁：每笔付款保留一条（优先已代理的，其次ID最小的），
+    # 其余改用唯一的支付交易ID；尚未代理的标记为失败，不再被接纳代理
+    groups = bind.execute(
+        sa.select(rentals.c.payment_txid)
+        .group_by(rentals.c.payment_txid)
+        .having(sa.func.count() > 1)
+    ).fetchall()
+    for (payment_txid,) in groups:
+        duplicates = bind.execute(
+            sa.select(rentals.c.id, rentals.c.status)
+            .where(rentals.c.payment_txid == payment_txid)
+            .order_by(sa.case((rentals.c.delegate_txid.is_(None), 1), else_=0), rentals.c.id)
+        ).fetchall()
+        for rental_id, status in duplicates[1:]:
+            values = {'payment_txid': f'dup_{rental_id}_{payment_txid}'[:64]}
+            if status == 'pending':
+                values['status'] = 'failed'
+            op.execute(rentals.update().where(rentals.c.id == rental_id).values(**values))
+
+    if 'uq_energy_rentals_payment_txid' not in existing:
+        with op.batch_alter_table('energy_rentals') as batch_op:
+            batch_op.create_unique_constraint('uq_energy_rentals_payment_txid', ['payment_txid'])
+
+    if 'ix_energy_rentals_address_status' not in existing:
+        op.create_index('ix_energy_rentals_address_status', 'energy_rentals', ['rental_address', 'status'])
+
+    if 'ix_energy_rentals_status_expiry' not in existing:
+        op.create_index('ix_energy_rentals_status_expiry', 'energy_rentals', ['status', 'expiry_time'])
+
+
+def downgrade():
+    op.drop_index('ix_energy_rentals_status_expiry', table_name='energy_rentals')
+    op.drop_index('ix_energy_rentals_address_status', table_name='energy_rentals')
+    with op.batch_alter_table('energy_rentals') as batch_op:
+        batch_op.drop_constraint('uq_energy_rentals_payment_txid', type_='unique')
@@ -0,0 +1,39 @@
+"""rental_events 事件总线表
+
+Revision ID: 0002_rental_events
+Revises: 0001_rental_indexes
+Create Date: 2026-10-17 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_rental_events'
+down_revision = '0001_rental_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 新库可能已由 db.create_all 创建
+    if 'rental_events' in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        'rental_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event_type', sa.String(length=32), nullable=False),
+        sa.Column('rental_id', sa.Integer(), nullable=True),
+        sa.Column('rental_address', sa.String(length=34), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_rental_events_created_at', 'rental_events', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_rental_events_created_at', table_name='rental_events')
+    op.drop_table('rental_events')
@@ -0,0 +1,37 @@
+"""service_leases 服务租约表
+
+Revision ID: 0003_service_leases
+Revises: 0002_rental_events
+Create Date: 2026-10-17 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_service_leases'
+down_revision = '0002_rental_events'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 新库可能已由 db.create_all 创建
+    if 'service_leases' in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        'service_leases',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('holder', sa.String(length=128), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('service_leases')
@@ -0,0 +1,33 @@
+"""energy_rentals 付款认领租约字段
+
+Revision ID: 0004_rental_claims
+Revises: 0003_service_leases
+Create Date: 2026-10-17 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_rental_claims'
+down_revision = '0003_service_leases'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 新库可能已由 db.create_all 创建
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('energy_rentals')}
+    if 'claimed_by' in columns:
+        return
+
+    with op.batch_alter_table('energy_rentals') as batch_op:
+        batch_op.add_column(sa.Column('claimed_by', sa.String(length=128), nullable=True))
+        batch_op.add_column(sa.Column('claim_expires_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('energy_rentals') as batch_op:
+        batch_op.drop_column('claim_expires_at')
+        batch_op.drop_column('claimed_by')
@@ -0,0 +1,31 @@
+"""energy_rentals 能量池账户字段
+
+Revision ID: 0005_rental_owner
+Revises: 0004_rental_claims
+Create Date: 2026-10-17 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_rental_owner'
+down_revision = '0004_rental_claims'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 新库可能已由 db.create_all 创建
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('energy_rentals')}
+    if 'owner_address' in columns:
+        return
+
+    with op.batch_alter_table('energy_rentals') as batch_op:
+        batch_op.add_column(sa.Column('owner_address', sa.String(length=34), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('energy_rentals') as batch_op:
+        batch_op.drop_column('owner_address')
@@ -0,0 +1,38 @@
+"""monitor_cursors 付款摄取游标表
+
+Revision ID: 0006_monitor_cursors
+Revises: 0005_rental_owner
+Create Date: 2026-10-17 20:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_monitor_cursors'
+down_revision = '0005_rental_owner'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 新库可能已由 db.create_all 创建
+    if 'monitor_cursors' in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        'monitor_cursors',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('block_number', sa.BigInteger(), nullable=False),
+        sa.Column('block_timestamp', sa.BigInteger(), nullable=False),
+        sa.Column('last_txid', sa.String(length=64), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('monitor_cursors')
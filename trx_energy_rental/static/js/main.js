@@ -9,6 +9,40 @@ function copyToClipboard(text) {
     });
 }
 
+// 显示支付状态，返回是否已是最终状态（成功或失败）
+function renderPaymentStatus(statusElement, data) {
+    if (data.status === 'success') {
+        statusElement.innerHTML = '<span class="badge bg-success">支付成功</span> 能量已代理';
+        
+        // 显示租赁详情
+        const detailsElement = document.getElementById('rental-details');
+        if (detailsElement) {
+            detailsElement.classList.remove('d-none');
+            document.getElementById('rental-address').textContent = data.data.rental_address;
+            document.getElementById('rental-energy').textContent = data.data.energy_amount;
+            document.getElementById('rental-time').textContent = data.data.remaining_minutes + ' 分钟';
+        }
+        
+        // 移除检查按钮
+        const checkButton = document.getElementById('check-payment-btn');
+        if (checkButton) {
+            checkButton.classList.add('d-none');
+        }
+        
+        // 启动倒计时
+        startCountdown(data.data.remaining_minutes);
+        return true;
+    } else if (data.status === 'pending') {
+        statusElement.innerHTML = '<span class="badge bg-warning">处理中</span> 支付已收到，系统正在处理';
+    } else if (data.status === 'failed') {
+        statusElement.innerHTML = '<span class="badge bg-danger">失败</span> 租赁处理失败，请联系管理员';
+        return true;
+    } else {
+        statusElement.innerHTML = '<span class="badge bg-secondary">等待支付</span> 未检测到支付';
+    }
+    return false;
+}
+
 // 检查支付状态
 function checkPaymentStatus(tronAddress) {
     const statusElement = document.getElementById('payment-status');
@@ -16,28 +50,55 @@ function checkPaymentStatus(tronAddress) {
     
     statusElement.innerHTML = '<div class="spinner-border spinner-border-sm text-primary" role="status"></div> 检查支付状态...';
     
+    // 浏览器支持时使用服务器推送，状态变化后立即更新
+    if (window.EventSource) {
+        watchPaymentStatus(tronAddress, statusElement);
+        return;
+    }
+    
+    pollPaymentStatus(tronAddress, statusElement);
+}
+
+// 通过服务器推送（SSE）等待支付状态变化
+function watchPaymentStatus(tronAddress, statusElement) {
+    const source = new EventSource(`/api/payment_events/${tronAddress}`);
+    let finished = false;
+    
+    source.onmessage = function(event) {
+        if (renderPaymentStatus(statusElement, JSON.parse(event.data))) {
+            finished = true;
+            source.close();
+        }
+    };
+    
+    source.onerror = function() {
+        // 服务器结束连接后浏览器会自动重连，最终状态下不再重连
+        if (finished) {
+            source.close();
+        } else if (source.readyState === EventSource.CLOSED) {
+            // 推送连接已满（503）等情况浏览器不再重连，改为轮询
+            pollPaymentStatus(tronAddress, statusElement);
+        }
+    };
+}
+
+// 定时轮询支付状态（不支持服务器推送的浏览器）
+function pollPaymentStatus(tronAddress, statusElement) {
     fetch(`/api/check_payment/${tronAddress}`)
         .then(response => response.json())
         .then(data => {
-            if (data.status === 'success') {
-                statusElement.innerHTML = '<span class="badge bg-success">支付成功</span> 能量已代理';
-                
-                // 显示租赁详情
-                const detailsElement = document.getElementById('rental-details');
-                if (detailsElement) {
-                    detailsElement.classList.remove('d-none');
-                    document.getElementById('rental-address').textContent = data.data.rental_address;
-                    document.getElementById('rental-energy').textContent = data.data.energy_amount;
-                    document.getElementById('rental-time').textContent = data.data.remaining_minutes + ' 分钟';
-                }
-                
-                // 移除检查按钮
-                const checkButton = document.getElementById('check-payment-btn');
-                if (checkButton) {
-                    checkButton.classList.add('d-none');
-                }
-                
-                // 启动倒计时
+            if (renderPaymentStatus(statusElement, data)) return;
+            
+            const delay = data.status === 'pending' ? 5000 : 10000;
+            setTimeout(() => pollPaymentStatus(tronAddress, statusElement), delay);
+        })
+        .catch(error => {
+            console.error('检查支付状态出错:', error);
+            statusElement.innerHTML = '<span class="badge bg-danger">错误</span> 检查支付状态时出错';
+        });
+}
+
+// 启动倒计时
                 startCountdown(data.data.remaining_minutes);
             } else if (data.status === 'pending') {
                 statusElement.innerHTML = '<span class="badge bg-warning">处理中</span> 支付已收到，系统正在处理';
@@ -0,0 +1,321 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+from ..blockchain.sharding import Lease
+from ..config import settings
+from .rental_notifier import rental_snapshot
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# 租赁生命周期事件
+PAYMENT_SEEN = 'payment_seen'      # 收到付款，已创建待处理租赁
+DELEGATED = 'delegated'            # 能量代理成功，租赁已激活
+USAGE_DETECTED = 'usage_detected'  # 检测到用户使用能量进行TRC20转账
+RECOVERED = 'recovered'            # 能量已回收，租赁完成
+FAILED = 'failed'                  # 代理失败
+
+EVENT_TYPES = (PAYMENT_SEEN, DELEGATED, USAGE_DETECTED, RECOVERED, FAILED)
+
+# 订阅所有事件
+ALL_EVENTS = '*'
+
+
+class MemoryBackend:
+    """进程内后端，事件只投递给本进程的订阅者"""
+
+    def start(self, deliver):
+        pass
+
+    def stop(self):
+        pass
+
+    def send(self, event):
+        pass
+
+
+class DatabaseBackend:
+    """数据库后端
+
+    发布的事件先放入发送缓冲区，由发送线程成批写入 rental_events 表（每批一次插入和提交），
+    发布者不等待数据库。拉取线程按自增ID拉取其他进程写入的事件并投递给本进程的订阅者，
+    每个进程每个拉取间隔只执行一次主键查询，与订阅者数量无关。事件带有写入进程的 origin，
+    本进程写入的事件拉取时跳过。过期事件每 purge_interval 秒清理一次，只由持有
+    event_bus_purge 租约的进程执行。
+
+    并发写入时自增ID的提交顺序与分配顺序不一定一致：较小的ID可能在较大的ID之后才提交。
+    拉取时跳过的ID记为空缺，在 lookback 秒内每次一并查询，出现后补发；超过 lookback
+    仍未出现的空缺（插入已回滚）不再等待。每个ID只投递一次。
+    """
+
+    def __init__(self, engine=None,
+                 poll_interval=settings.EVENT_BUS_POLL_INTERVAL,
+                 retention_minutes=settings.EVENT_BUS_RETENTION_MINUTES,
+                 lookback=settings.EVENT_BUS_LOOKBACK_SECONDS,
+                 batch_size=500, max_gaps=1000, purge_interval=60):
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.retention = timedelta(minutes=retention_minutes)
+        self.lookback = lookback
+        self.batch_size = batch_size
+        self.max_gaps = max_gaps
+        self.purge_interval = purge_interval
+        # 持有者每个清理间隔续约一次，有效期留出一倍余量
+        self.purge_lease = Lease('event_bus_purge', ttl=purge_interval * 2, engine=engine)
+
+        self._table = None
+        self._origin = uuid.uuid4().hex
+        self._last_id = 0
+        self._gaps = {}  # 尚未出现的较小ID -> 发现空缺的时间
+        self._outbox = queue.Queue()
+        self._deliver = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._publisher = None
+
+    def start(self, deliver):
+        """从当前最新事件之后开始拉取"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        if self.engine is None:
+            # 需在Flask应用上下文中调用
+            from ..database.models import db
+            self.engine = db.engine
+            self.purge_lease.engine = db.engine
+
+        from ..database.models import RentalEvent
+        self._table = RentalEvent.__table__
+        self._deliver = deliver
+
+        with self.engine.connect() as conn:
+            self._last_id = conn.execute(sa.select(sa.func.max(self._table.c.id))).scalar() or 0
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='event-bus-poller')
+        self._thread.daemon = True
+        self._thread.start()
+        self._publisher = threading.Thread(target=self._publish_loop, name='event-bus-publisher')
+        self._publisher.daemon = True
+        self._publisher.start()
+        # 进程退出前写入缓冲区中的事件
+        atexit.unregister(self.stop)
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5):
+        """停止拉取和发送线程，缓冲区中的事件写入后返回（最多等待 timeout 秒）"""
+        self._stop_event.set()
+        if self._publisher and self._publisher.is_alive():
+            self._publisher.join(timeout)
+        self.purge_lease.release()
+
+    def send(self, event):
+        """放入发送缓冲区，由发送线程写入数据库"""
+        if self._table is None:
+            logger.warning(f"事件总线数据库后端未启动，事件 {event['type']} 只在本进程内投递")
+            return
+        self._outbox.put(event)
+
+    def _publish_loop(self):
+        """发送循环：取出缓冲区中已有的事件（最多 batch_size 个）一次写入"""
+        while not (self._stop_event.is_set() and self._outbox.empty()):
+            try:
+                events = [self._outbox.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            while len(events) < self.batch_size:
+                try:
+                    events.append(self._outbox.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.flush(events)
+            except Exception as e:
+                logger.error(f"写入 {len(events)} 个事件失败，这些事件只在本进程内投递: {str(e)}")
+
+    def flush(self, events):
+        """一次插入和提交写入一批事件"""
+        now = datetime.utcnow()
+        rows = [{
+            'event_type': event['type'],
+            'rental_id': event.get('rental_id'),
+            'rental_address': event.get('rental_address'),
+            'payload': json.dumps(dict(event, origin=self._origin)),
+            'created_at': now
+        } for event in events]
+        with self.engine.begin() as conn:
+            conn.execute(self._table.insert(), rows)
+
+    def _run(self):
+        """拉取循环"""
+        purged_at = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                if not self.poll_once():
+                    self._stop_event.wait(self.poll_interval)
+
+                if time.monotonic() - purged_at >= self.purge_interval:
+                    purged_at = time.monotonic()
+                    self._purge_if_held()
+            except Exception as e:
+                logger.error(f"拉取事件失败: {str(e)}")
+                self._stop_event.wait(1)
+
+    def poll_once(self):
+        """拉取一批新事件，返回拉取到的数量"""
+        table = self._table
+        condition = table.c.id > self._last_id
+        if self._gaps:
+            condition = sa.or_(condition, table.c.id.in_(list(self._gaps)))
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                sa.select(table.c.id, table.c.payload)
+                .where(condition)
+                .order_by(table.c.id)
+                .limit(self.batch_size)
+            ).fetchall()
+
+        now = time.monotonic()
+        for event_id, payload in rows:
+            if event_id > self._last_id:
+                # 跳过的ID可能属于尚未提交的事务
+                for missing in range(max(self._last_id + 1, event_id - self.max_gaps), event_id):
+                    self._gaps[missing] = now
+                self._last_id = event_id
+            elif self._gaps.pop(event_id, None) is None:
+                continue
+            event = json.loads(payload)
+            if event.get('origin') != self._origin:
+                self._deliver(event)
+
+        expired = [event_id for event_id, found_at in self._gaps.items() if now - found_at > self.lookback]
+        for event_id in expired:
+            del self._gaps[event_id]
+        return len(rows)
+
+    def _purge_if_held(self):
+        """取得或续期清理租约，持有时清理过期事件，返回是否执行了清理"""
+        if not self.purge_lease.acquire():
+            return False
+        self.purge()
+        return True
+
+    def purge(self):
+        """删除超过保留时间的事件"""
+        cutoff = datetime.utcnow() - self.retention
+        with self.engine.begin() as conn:
+            conn.execute(self._table.delete().where(self._table.c.created_at < cutoff))
+
+
+def create_backend(name):
+    """根据名称创建事件总线后端"""
+    if name == 'database':
+        return DatabaseBackend()
+    if name == 'memory':
+        return MemoryBackend()
+    raise ValueError(f"未知的事件总线后端: {name}")
+
+
+class EventBus:
+    """租赁事件总线
+
+    发布者调用 publish 后立即返回；事件先投递给本进程的订阅者（由分发线程调用处理函数，
+    慢处理函数不会阻塞发布者），再交给后端传递给其他进程。
+    处理函数接收一个事件字典：type、rental_id、rental_address、created_at 及发布时附带的数据。
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """启动分发线程和后端（Web进程在每个请求前调用，只有第一次生效）"""
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+            self._ensure_dispatcher()
+            try:
+                self.backend.start(self._queue.put)
+            except Exception as e:
+                logger.error(f"启动事件总线后端失败: {str(e)}")
+
+    def stop(self):
+        """停止后端"""
+        self._started = False
+        self.backend.stop()
+
+    def subscribe(self, event_type, handler):
+        """订阅事件，event_type 为 ALL_EVENTS 时接收所有事件"""
+        with self._lock:
+            self._handlers.setdefault(event_type, []).append(handler)
+        self._ensure_dispatcher()
+
+    def unsubscribe(self, event_type, handler):
+        """取消订阅"""
+        with self._lock:
+            handlers = self._handlers.get(event_type, [])
+            if handler in handlers:
+                handlers.remove(handler)
+
+    def publish(self, event_type, rental=None, **data):
+        """发布事件，rental 为租赁记录或状态快照"""
+        event = {'type': event_type, 'created_at': datetime.utcnow().isoformat()}
+        if rental is not None:
+            event.update(rental if isinstance(rental, dict) else rental_snapshot(rental))
+        event.update(data)
+
+        self._ensure_dispatcher()
+        self._queue.put(event)
+        try:
+            self.backend.send(event)
+        except Exception as e:
+            logger.error(f"发送事件 {event_type} 失败: {str(e)}")
+        return event
+
+    def _ensure_dispatcher(self):
+        """按需启动分发线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._dispatch_loop, name='event-bus-dispatcher')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _dispatch_loop(self):
+        """分发循环"""
+        while True:
+            event = self._queue.get()
+            with self._lock:
+                handlers = self._handlers.get(event['type'], []) + self._handlers.get(ALL_EVENTS, [])
+
+            for handler in handlers:
+                try:
+                    handler(event)
+                except Exception as e:
+                    logger.error(f"处理事件 {event['type']} 时出错: {str(e)}")
+
+
+# 进程内共享的事件总线
+event_bus = EventBus(create_backend(settings.EVENT_BUS_BACKEND))
@@ -0,0 +1,412 @@
+import bisect
+import hmac
+import logging
+import threading
+import time
+import weakref
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 默认的耗时分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 到期回收延迟的分桶（秒）
+LAG_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+class _ThreadToken:
+    """随线程的 threading.local 一起释放，用于在线程退出时合并其分片"""
+    __slots__ = ('__weakref__',)
+
+
+class _Shards:
+    """按线程分片的累加数组
+
+    每个线程只写自己的分片，写入不需要锁；读取时把各线程的分片求和。
+    线程退出时其分片合并到 retired 中，锁只在线程首次写入、线程退出和读取时使用。
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._live = {}  # id(分片) -> 分片
+        self._retired = [0] * size
+        self._lock = threading.Lock()
+
+    def values(self):
+        """当前线程的分片"""
+        try:
+            return self._local.values
+        except AttributeError:
+            return self._register()
+
+    def _register(self):
+        values = [0] * self.size
+        key = id(values)
+        with self._lock:
+            self._live[key] = values
+        token = _ThreadToken()
+        weakref.finalize(token, self._retire, key)
+        self._local.values = values
+        self._local.token = token
+        return values
+
+    def _retire(self, key):
+        with self._lock:
+            values = self._live.pop(key, None)
+            if values is not None:
+                for i, value in enumerate(values):
+                    self._retired[i] += value
+
+    def totals(self):
+        """各线程分片之和"""
+        with self._lock:
+            totals = list(self._retired)
+            shards = list(self._live.values())
+        for values in shards:
+            for i, value in enumerate(values):
+                totals[i] += value
+        return totals
+
+
+class _CounterChild:
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount=1):
+        self._shards.values()[0] += amount
+
+    def samples(self):
+        yield '', {}, self._shards.totals()[0]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = None  # 尚未取得值时不输出
+        self._function = None
+
+    def set(self, value):
+        self._value = value
+
+    def set_function(self, function):
+        """读取指标时调用 function() 取值（队列长度等）"""
+        self._function = function
+
+    def samples(self):
+        value = self._value
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception as e:
+                logger.debug(f"读取指标值失败: {str(e)}")
+                return
+        if value is not None:
+            yield '', {}, value
+
+
+class _Timer:
+    """记录代码块耗时的上下文管理器"""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # 各分桶（最后一个为+Inf）的计数和观测值之和
+        self._shards = _Shards(len(buckets) + 2)
+
+    def observe(self, value):
+        values = self._shards.values()
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def time(self):
+        return _Timer(self)
+
+    def samples(self):
+        totals = self._shards.totals()
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), totals):
+            cumulative += count
+            yield '_bucket', {'le': _format_value(bound)}, cumulative
+        yield '_sum', {}, totals[-1]
+        yield '_count', {}, cumulative
+
+
+class _Metric:
+    """指标基类，labelnames 非空时通过 labels(...) 取得各标签组合的子指标"""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}")
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            for suffix, extra, value in child.samples():
+                yield self.name + suffix, dict(labels, **extra), value
+
+
+class Counter(_Metric):
+    """只增不减的计数"""
+
+    type = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+
+class Gauge(_Metric):
+    """可任意设置的当前值"""
+
+    type = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._children[()].set(value)
+
+    def set_function(self, function):
+        self._children[()].set_function(function)
+
+
+class Histogram(_Metric):
+    """按分桶统计的分布（耗时、延迟）"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._children[()].observe(value)
+
+    def time(self):
+        return self._children[()].time()
+
+
+class Registry:
+    """指标注册表，以Prometheus文本格式输出"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """注册指标，同名指标已存在时返回已有的指标"""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        """Prometheus文本格式（0.0.4）"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    label_text = ','.join(f'{key}="{_escape_label(label)}"' for key, label in labels.items())
+                    lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{name} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return str(value)
+
+
+def _escape_help(text):
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+
+
+def timed(counter, histogram):
+    """装饰器：按函数名记录调用次数（result 为 ok 或 error）和耗时"""
+    def decorator(func):
+        ok = counter.labels(func.__name__, 'ok')
+        error = counter.labels(func.__name__, 'error')
+        seconds = histogram.labels(func.__name__)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                error.inc()
+                raise
+            finally:
+                seconds.observe(time.perf_counter() - started)
+            ok.inc()
+            return result
+        return wrapper
+    return decorator
+
+
+def counter(name, documentation, labelnames=()):
+    return registry.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()):
+    return registry.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return registry.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# 节点请求（NodePool，按接口路径）
+TRON_REQUESTS = counter('trx_tron_requests_total', '发往TRON节点的请求数', ['path', 'result'])
+TRON_REQUEST_SECONDS = histogram('trx_tron_request_seconds', 'TRON节点请求耗时（秒）', ['path'])
+
+# TronClient 方法
+TRON_CLIENT_CALLS = counter('trx_tron_client_calls_total', 'TronClient 方法调用次数', ['method', 'result'])
+TRON_CLIENT_SECONDS = histogram('trx_tron_client_seconds', 'TronClient 方法耗时（秒）', ['method'])
+
+# 能量租赁服务
+PAYMENTS_SEEN = counter('trx_payments_seen_total', '摄取到的付款数')
+PAYMENTS_CLAIMED = counter('trx_payments_claimed_total', '认领成功并创建租赁的付款数')
+DELEGATIONS = counter('trx_delegations_total', '代理能量的次数', ['result'])
+RECOVERIES = counter('trx_recoveries_total', '回收能量的次数', ['reason', 'result'])
+ACTIVE_RENTALS = gauge('trx_active_rentals', '活跃租赁数')
+POOL_ENERGY_AVAILABLE = gauge('trx_pool_energy_available', '能量池可出租的能量')
+DELEGATION_QUEUE_DEPTH = gauge('trx_delegation_queue_depth', '批量代理队列中等待的租赁数')
+WATCHED_RENTALS = gauge('trx_watched_rentals', '使用检测中的租赁数')
+SCHEDULED_EXPIRIES = gauge('trx_scheduled_expiries', '到期调度器中的租赁数')
+RATE_LIMITER_QUEUED = gauge('trx_rate_limiter_queued', '等待限流令牌的节点请求数')
+WATCHER_LAG = gauge('trx_usage_watcher_lag_seconds', '使用检测落后的时间（秒）：轮询晚于计划的时间或最近扫描区块的时间差')
+EXPIRY_LAG = histogram('trx_expiry_lag_seconds', '租赁回收时距到期时间的延迟（秒）', buckets=LAG_BUCKETS)
+
+# Web API
+API_REQUESTS = counter('trx_api_requests_total', 'API请求数', ['endpoint', 'status'])
+API_REQUEST_SECONDS = histogram('trx_api_request_seconds', 'API请求耗时（秒）', ['endpoint'])
+
+
+def authorized(authorization, token):
+    """检查请求的 Authorization 头，未设置令牌时不校验"""
+    if not token:
+        return True
+    return hmac.compare_digest((authorization or '').encode('utf-8'), f'Bearer {token}'.encode('utf-8'))
+
+
+class MetricsExporter:
+    """独立的指标HTTP服务，供没有Web服务的 trx-monitor、trx-bot 进程使用
+
+    设置 token 时请求需携带 Authorization: Bearer <token>，否则返回401。
+    """
+
+    def __init__(self, port, host='127.0.0.1', registry=registry, token=None):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.token = token
+        self.server = None
+        self._thread = None
+
+    def start(self):
+        """启动HTTP服务，端口无法监听时记录错误并返回False"""
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                if not authorized(self.headers.get('Authorization'), exporter.token):
+                    self.send_response(401)
+                    self.send_header('WWW-Authenticate', 'Bearer')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                data = exporter.registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            logger.error(f"指标导出服务无法监听 {self.host}:{self.port}: {str(e)}")
+            return False
+
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name='metrics-exporter')
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"指标导出服务已启动: http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        """停止HTTP服务"""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def start_exporter(port, host='127.0.0.1', token=None):
+    """端口非0时启动指标导出服务，返回 MetricsExporter 或None"""
+    if not port:
+        return None
+    exporter = MetricsExporter(port, host, token=token)
+    return exporter if exporter.start() else None
@@ -0,0 +1,111 @@
+import logging
+import queue
+import threading
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def rental_snapshot(rental):
+    """把租赁记录转换为可跨线程传递的状态快照"""
+    return {
+        'rental_id': rental.id,
+        'rental_address': rental.rental_address,
+        'payment_txid': rental.payment_txid,
+        'status': rental.status,
+        'energy_amount': rental.energy_amount,
+        'expiry_time': rental.expiry_time.isoformat() if rental.expiry_time else None,
+        'remaining_minutes': rental.remaining_time if rental.expiry_time else 0,
+    }
+
+
+class Subscription:
+    """单个地址的状态订阅，可作为上下文管理器使用"""
+
+    def __init__(self, notifier, address):
+        self.notifier = notifier
+        self.address = address
+        self._queue = queue.Queue()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def put(self, snapshot):
+        """由通知器调用，投递一条状态快照"""
+        self._queue.put(snapshot)
+
+    def get(self, timeout=None):
+        """等待下一条状态快照，超时返回None"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        """取消订阅"""
+        self.notifier.unsubscribe(self)
+
+
+class RentalNotifier:
+    """租赁状态通知器
+
+    订阅事件总线（handle_event），收到租赁事件后把状态快照投递给订阅了该地址的
+    所有等待者（例如支付状态推送连接）。也可以直接调用 publish 发布租赁记录。
+    没有订阅者的地址不占用任何内存。
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, address):
+        """订阅地址的状态变化"""
+        subscription = Subscription(self, address)
+        with self._lock:
+            self._subscribers.setdefault(address, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """取消订阅"""
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.address)
+            if not subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.address]
+
+    def publish(self, rental):
+        """发布租赁的最新状态"""
+        try:
+            self.publish_snapshot(rental_snapshot(rental))
+        except Exception as e:
+            logger.error(f"发布租赁状态失败: {str(e)}")
+
+    def handle_event(self, event):
+        """事件总线的处理函数，把租赁事件转为状态快照发布"""
+        if event.get('rental_address') and event.get('status'):
+            self.publish_snapshot(event)
+
+    def publish_snapshot(self, snapshot):
+        """发布状态快照"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(snapshot['rental_address'], ()))
+
+        for subscription in subscribers:
+            subscription.put(snapshot)
+
+    def subscriber_count(self):
+        """当前的订阅数量"""
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+# 进程内共享的通知器
+rental_notifier = RentalNotifier()